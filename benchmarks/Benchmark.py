@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from src import NumpyBackend
+from src.HuffmanCoding import HuffmanCoding
+
+from .Corpus import CORPORA, corpus_path, format_size, parse_size
+
+DEFAULT_SIZES = ("1K", "64K", "1M")
+DEFAULT_THRESHOLD = 0.2
+
+# Metrics compared against the baseline: name -> True when larger is better.
+METRICS = {
+    "compress_mb_s": True,
+    "decompress_mb_s": True,
+    "ratio": False,
+    "compress_peak_bytes": False,
+    "decompress_peak_bytes": False,
+}
+
+
+def _best_time(function, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(function) -> int:
+    """
+    Returns the peak of Python allocations made by `function`. It runs apart
+    from the timed runs since tracing allocations slows everything down.
+    """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(path: str, mode: str, repeats: int = 3, measure_memory: bool = True, pipeline: str = None) -> dict:
+    """
+    Measures compression and decompression of one file with `HuffmanCoding`.
+
+    Args:
+        pipeline: Transform stages to compress with, like "bwt,mtf,rle"; the plain path when empty
+
+    Returns:
+        Throughputs in MB/s (10^6 bytes of original data per second), the
+        compression ratio (compressed / original size) and peak memory in bytes
+    """
+    huffman = HuffmanCoding()
+    size = os.path.getsize(path)
+
+    with tempfile.TemporaryDirectory() as directory:
+        compressed = os.path.join(directory, "case.huff")
+        compress = lambda: huffman.compress_data(path, compressed, mode=mode, pipeline=pipeline or None)
+        decompress = lambda: huffman.decompress_data(compressed, os.devnull)
+
+        result = {
+            "compress_mb_s": size / 1e6 / _best_time(compress, repeats),
+            "decompress_mb_s": size / 1e6 / _best_time(decompress, repeats),
+            "ratio": os.path.getsize(compressed) / size,
+        }
+        if measure_memory:
+            result["compress_peak_bytes"] = _peak_memory(compress)
+            result["decompress_peak_bytes"] = _peak_memory(decompress)
+    return result
+
+
+def run_suite(corpora, sizes, corpus_dir: str, repeats: int = 3, measure_memory: bool = True,
+              log=None, pipelines=("",)) -> dict:
+    """
+    Runs every corpus at every size, with every pipeline.
+
+    Args:
+        corpora: Names from `CORPORA`
+        sizes: Sizes in bytes
+        corpus_dir: Where generated corpora are cached between runs
+        log: Called with a line of text after each case
+        pipelines: Transform stages of every variant, "" being the plain path
+
+    Returns:
+        A JSON-serializable dict with the environment and one entry per case
+    """
+    cases = []
+    for name in corpora:
+        for size in sizes:
+            path = corpus_path(corpus_dir, name, size)
+            mode = CORPORA[name][0]
+            for pipeline in pipelines:
+                case = {"corpus": name, "size": size, "mode": mode, "pipeline": pipeline}
+                case.update(run_case(path, mode, repeats, measure_memory, pipeline))
+                cases.append(case)
+                if log:
+                    log(f"{name:>14} {format_size(size):>5} {pipeline or 'plain':>14}  ratio {case['ratio']:.3f}  "
+                        f"compress {case['compress_mb_s']:7.2f} MB/s  "
+                        f"decompress {case['decompress_mb_s']:7.2f} MB/s")
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": NumpyBackend.available(),
+        "cases": cases,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Compares results with a baseline from an earlier run. Cases or metrics
+    missing from either side are skipped.
+
+    Args:
+        threshold: Allowed relative change in the bad direction, 0.2 for 20%
+
+    Returns:
+        A message for every metric that regressed beyond the threshold
+    """
+    key = lambda case: (case["corpus"], case["size"], case.get("pipeline", ""))
+    previous = {key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(key(case))
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in case or metric not in old or not old[metric]:
+                continue
+            change = (case[metric] - old[metric]) / old[metric]
+            if (-change if higher_is_better else change) > threshold:
+                variant = f" {case['pipeline']}" if case.get("pipeline") else ""
+                regressions.append(f"{case['corpus']} {format_size(case['size'])}{variant}: {metric} "
+                                   f"{old[metric]:.4g} -> {case[metric]:.4g} ({change:+.1%})")
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark HuffmanCoding on generated corpora.")
+    parser.add_argument("--corpus", action="append", choices=sorted(CORPORA),
+                        help="corpus to run, may be repeated (default: all)")
+    parser.add_argument("--size", action="append", type=parse_size,
+                        help=f"corpus size like 1K, 64M or 1G, may be repeated (default: {' '.join(DEFAULT_SIZES)})")
+    parser.add_argument("--pipeline", action="append", default=[],
+                        help="also run every case with these transform stages, like bwt,mtf,rle; may be repeated")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per case, the best one is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory runs")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "huffman-corpora"))
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative regression that fails the run (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.corpus or sorted(CORPORA),
+                        args.size or [parse_size(size) for size in DEFAULT_SIZES],
+                        args.corpus_dir, args.repeats, not args.no_memory,
+                        log=lambda line: print(line, file=sys.stderr), pipelines=[""] + args.pipeline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
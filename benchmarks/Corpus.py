@@ -0,0 +1,120 @@
+import os
+import random
+
+from src.Container import MODE_BYTES, MODE_TEXT
+
+# Data generated per step; bounds memory when writing corpora of several GB.
+CHUNK_SIZE = 1 << 20
+
+_WORDS = ("the of and to in a is that for it as was with be by on not he I this are or his from at which "
+          "but have an they you were her she there been one all we their has would when if so no will "
+          "compression symbol frequency table stream block decoder encoder archive payload").split()
+
+_LEVELS = ("INFO", "INFO", "INFO", "DEBUG", "WARN", "ERROR")
+_PATHS = ("/", "/index.html", "/api/v1/items", "/api/v1/users", "/static/app.js", "/login")
+
+
+def parse_size(text: str) -> int:
+    """
+    Parses sizes like "1K", "64M" or "1G" (powers of 1024) into a number of bytes.
+    """
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size: int) -> str:
+    for unit, scale in (("G", 1 << 30), ("M", 1 << 20), ("K", 1 << 10)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return str(size)
+
+
+def _english(rng: random.Random) -> str:
+    weights = [1 / rank for rank in range(1, len(_WORDS) + 1)]
+    words = rng.choices(_WORDS, weights, k=CHUNK_SIZE // 5)
+    for index in range(0, len(words), 12):
+        words[index] += ".\n" if rng.random() < 0.2 else ","
+    return " ".join(words)
+
+
+def _logs(rng: random.Random) -> str:
+    lines = []
+    size = 0
+    while size < CHUNK_SIZE:
+        line = (f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+                f"{rng.choice(_LEVELS)} 10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)} "
+                f"GET {rng.choice(_PATHS)} {rng.choice((200, 200, 200, 304, 404, 500))} "
+                f"{rng.randint(100, 99999)}\n")
+        lines.append(line)
+        size += len(line)
+    return "".join(lines)
+
+
+def _unicode(rng: random.Random) -> str:
+    # About 20000 CJK ideographs with Zipf-like frequencies, 3 UTF-8 bytes each.
+    alphabet = [chr(code) for code in range(0x4E00, 0x9FA5)]
+    weights = [1 / rank for rank in range(1, len(alphabet) + 1)]
+    return "".join(rng.choices(alphabet, weights, k=CHUNK_SIZE // 3))
+
+
+def _skewed_bytes(rng: random.Random) -> bytes:
+    weights = [0.7 ** value for value in range(256)]
+    return bytes(rng.choices(range(256), weights, k=CHUNK_SIZE))
+
+
+def _uniform_bytes(rng: random.Random) -> bytes:
+    return rng.randbytes(CHUNK_SIZE)
+
+
+# Corpus name -> (symbol mode, generator of one chunk)
+CORPORA = {
+    "english": (MODE_TEXT, _english),
+    "logs": (MODE_TEXT, _logs),
+    "unicode": (MODE_TEXT, _unicode),
+    "skewed-bytes": (MODE_BYTES, _skewed_bytes),
+    "uniform-bytes": (MODE_BYTES, _uniform_bytes),
+}
+
+
+def write_corpus(name: str, size: int, path: str, seed: int = 0) -> str:
+    """
+    Writes `size` bytes of the named corpus to `path`. The same name, size and
+    seed always give the same file. Text corpora are cut on a character boundary,
+    so they may be a few bytes shorter than `size`.
+
+    Returns:
+        The symbol mode to compress the corpus with
+    """
+    mode, generate = CORPORA[name]
+    rng = random.Random(f"{name}-{seed}")
+    written = 0
+
+    with open(path, "wb") as f:
+        while written < size:
+            chunk = generate(rng)
+            if mode == MODE_TEXT:
+                data = chunk.encode("utf-8")[:size - written]
+                data = data.decode("utf-8", errors="ignore").encode("utf-8")
+            else:
+                data = chunk[:size - written]
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+    return mode
+
+
+def corpus_path(directory: str, name: str, size: int, seed: int = 0) -> str:
+    """
+    Returns the path of a cached corpus in `directory`, generating it on first use.
+    """
+    path = os.path.join(directory, f"{name}-{format_size(size)}-{seed}.dat")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_corpus(name, size, path + ".tmp", seed)
+        os.replace(path + ".tmp", path)
+    return path
@@ -0,0 +1,5 @@
+import sys
+
+from .Benchmark import main
+
+sys.exit(main())
@@ -0,0 +1,341 @@
+import asyncio
+import codecs
+import io
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .Codebook import write_varint
+from .Container import (BLOCK_END, BLOCK_HUFFMAN, BLOCK_REPEAT, BLOCK_TYPES, DEFAULT_BLOCK_SIZE, FLAG_PIPELINE, MAGIC,
+                        MODE_BYTES, MODE_TEXT, STREAM_VERSION, AdaptiveEncoder, StreamWriter, check_encoding_options,
+                        check_stream_checksum, codebook_end, decode_frame, decode_frame_with_stats, encode_frame,
+                        encode_frame_with_stats, encode_planned, encode_planned_with_stats, read_stream_info)
+from .Checksum import CRC_SIZE
+from .ParallelCoding import default_workers
+from .Stats import CodingStats
+
+# Bytes requested from a source with a `read` coroutine at a time.
+READ_SIZE = 1 << 16
+
+_shared_executor = None
+_shared_lock = threading.Lock()
+
+
+def shared_executor() -> ProcessPoolExecutor:
+    """
+    Returns the process pool used by the async functions when no executor is
+    given, created on first use with one process per CPU. Every request of
+    the process shares it, so many concurrent requests never start more
+    processes than there are CPUs.
+    """
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = ProcessPoolExecutor(max_workers=default_workers())
+        return _shared_executor
+
+
+def shutdown_shared_executor() -> None:
+    """
+    Shuts the shared process pool down; the next request starts a new one.
+    """
+    global _shared_executor
+    with _shared_lock:
+        executor, _shared_executor = _shared_executor, None
+    if executor is not None:
+        executor.shutdown()
+
+
+async def _chunks(source):
+    """
+    Yields the byte chunks of an async source: an object with a `read(n)`
+    coroutine (like `asyncio.StreamReader`) or an async iterable of bytes.
+    """
+    if hasattr(source, "read"):
+        while True:
+            chunk = await source.read(READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        async for chunk in source:
+            if chunk:
+                yield chunk
+
+
+async def _blocks(source, block_size: int, mode: str):
+    """
+    Cuts an async byte source into blocks of `block_size` characters (text
+    mode, decoded as UTF-8) or bytes, as `read_blocks` does for a file.
+    """
+    if block_size < 1:
+        raise ValueError("Block size must be positive")
+
+    if mode == MODE_BYTES:
+        buffer = bytearray()
+        async for chunk in _chunks(source):
+            buffer += chunk
+            while len(buffer) >= block_size:
+                yield bytes(buffer[:block_size])
+                del buffer[:block_size]
+        if buffer:
+            yield bytes(buffer)
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    text = ""
+    async for chunk in _chunks(source):
+        text += decoder.decode(chunk)
+        while len(text) >= block_size:
+            yield text[:block_size]
+            text = text[block_size:]
+    text += decoder.decode(b"", final=True)
+    for start in range(0, len(text), block_size):
+        yield text[start:start + block_size]
+
+
+class _PendingJobs:
+    """
+    Runs block jobs on an executor while keeping their results in order.
+    At most `max_pending` jobs are in flight; submitting one more first waits
+    for the oldest, so a fast producer never queues more work than that.
+    """
+
+    def __init__(self, executor, max_pending: int):
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive")
+        self.loop = asyncio.get_running_loop()
+        self.executor = executor
+        self.max_pending = max_pending
+        self.pending = deque()
+
+
+    async def submit(self, function):
+        """
+        Queues `function()` and returns the results that became due, oldest first.
+        """
+        self.pending.append(self.loop.run_in_executor(self.executor, function))
+        if len(self.pending) >= self.max_pending:
+            return [await self.pending.popleft()]
+        return []
+
+
+    async def drain(self):
+        results = []
+        while self.pending:
+            results.append(await self.pending.popleft())
+        return results
+
+
+    def cancel(self) -> None:
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+
+
+def _add_stats(stats: CodingStats, hook, block_stats: CodingStats) -> None:
+    if stats is not None:
+        stats.merge(block_stats)
+    if hook is not None:
+        hook.on_block(block_stats)
+
+
+async def compress_async(source, block_size: int = DEFAULT_BLOCK_SIZE, mode: str = MODE_TEXT, executor=None,
+                         max_pending: int = None, stats: CodingStats = None, hook=None, dictionary=None,
+                         adaptive: bool = False, max_code_length: int = None, checksums: bool = False,
+                         pipeline=None):
+    """
+    Compresses an async byte source, yielding the stream as it is produced.
+    The output is identical to `compress_stream` on the same data.
+
+    Blocks are encoded on `executor`, so the event loop only cuts the input
+    into blocks and frames the results. Reading stops while `max_pending`
+    blocks are being encoded, which bounds the memory of every request.
+
+    Args:
+        source: Object with a `read(n)` coroutine, or an async iterable of bytes
+        block_size: Characters (or bytes) per block
+        mode: MODE_TEXT to code the characters of UTF-8 input, or MODE_BYTES
+        executor: `concurrent.futures` executor for the block work, `shared_executor()` by default
+        max_pending: Most blocks in flight at once, twice the number of CPUs by default
+        stats: Totals to add the stats of every block to
+        hook: Optional `StatsHook` told about every block
+        dictionary: Shared `Dictionary` to code the blocks with instead of their own codebooks
+        adaptive: Let `AdaptiveEncoder` choose how to code every block, see `compress_stream`
+        max_code_length: Longest code allowed, see `compress_stream`
+        checksums: Store the CRC-32 of every block and of the whole data, see `compress_stream`
+        pipeline: Transform stages to run every block through, see `compress_stream`
+
+    Yields:
+        The stream header, one frame per block and the end marker with the block index, as bytes
+    """
+    check_encoding_options(dictionary, adaptive, max_code_length, pipeline)
+
+    collect = stats is not None or hook is not None
+    jobs = _PendingJobs(executor or shared_executor(), max_pending or 2 * default_workers())
+    encoder = AdaptiveEncoder(mode, max_code_length) if adaptive else None
+    writer = StreamWriter(mode, checksums, pipeline)
+    yield writer.header()
+
+    def frames(results):
+        for result in results:
+            if collect:
+                _add_stats(stats, hook, result[3])
+            yield writer.frame(*result[:3])
+
+    try:
+        async for data in _blocks(source, block_size, mode):
+            if encoder is not None:
+                # Plans depend on the previous block, so they are made in order; a
+                # plan only needs the histogram, the payload is packed on the executor.
+                plan = await asyncio.to_thread(encoder.plan, data, stats)
+                encode = encode_planned_with_stats if collect else encode_planned
+                job = partial(encode, data, plan, mode, checksum=checksums)
+            else:
+                encode = encode_frame_with_stats if collect else encode_frame
+                job = partial(encode, data, mode, dictionary, max_code_length=max_code_length, checksum=checksums,
+                              pipeline=pipeline)
+
+            for frame in frames(await jobs.submit(job)):
+                yield frame
+
+        for frame in frames(await jobs.drain()):
+            yield frame
+    finally:
+        jobs.cancel()
+
+    yield writer.end()
+
+
+class _AsyncReader:
+    """
+    Reads exact byte counts from an async byte source.
+    """
+
+    def __init__(self, source):
+        self._chunks = _chunks(source)
+        self._buffer = bytearray()
+
+
+    async def read(self, size: int) -> bytes:
+        """
+        Returns the next `size` bytes, or fewer at the end of the source.
+        """
+        while len(self._buffer) < size:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                break
+            self._buffer += chunk
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+    async def read_varint(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            byte = await self.read(1)
+            if not byte:
+                raise ValueError("Invalid compressed data: Truncated frame header.")
+            value |= (byte[0] & 0x7F) << shift
+            if byte[0] < 0x80:
+                return value
+            shift += 7
+
+
+async def _read_frames(reader: _AsyncReader):
+    """
+    Like `read_frames`, reading the frames of an async source up to the end marker.
+    """
+    while True:
+        block_type = await reader.read(1)
+        if not block_type:
+            raise ValueError("Invalid compressed data: Missing end of stream marker.")
+        if block_type[0] == BLOCK_END:
+            return
+        if block_type[0] not in BLOCK_TYPES:
+            raise ValueError(f"Invalid compressed data: Unknown block type {block_type[0]}.")
+
+        body_length = await reader.read_varint()
+        body = await reader.read(body_length)
+        if len(body) != body_length:
+            raise ValueError("Invalid compressed data: Truncated block.")
+        yield block_type[0], body
+
+
+async def decompress_async(source, executor=None, max_pending: int = None, stats: CodingStats = None, hook=None,
+                           dictionaries: dict = None):
+    """
+    Decompresses a stream written by `compress_stream` or `compress_async`
+    from an async byte source, yielding every block as soon as it is decoded.
+    Blocks are decoded on `executor` with the same backpressure as `compress_async`.
+    Checksums are checked as in `decompress_stream`.
+
+    Args:
+        source: Object with a `read(n)` coroutine, or an async iterable of bytes
+        executor: `concurrent.futures` executor for the block work, `shared_executor()` by default
+        max_pending: Most blocks in flight at once, twice the number of CPUs by default
+        stats: Totals to add the stats of every block to
+        hook: Optional `StatsHook` told about every block
+        dictionaries: Mapping of dictionary ID -> `Dictionary` for blocks coded with one
+
+    Yields:
+        The bytes of every block, UTF-8 encoded for text streams
+    """
+    reader = _AsyncReader(source)
+    header = await reader.read(len(MAGIC) + 1)
+    if header[len(MAGIC):] == bytes([STREAM_VERSION]):
+        header += await reader.read(1)
+        if len(header) > len(MAGIC) + 1 and header[-1] & FLAG_PIPELINE:
+            count = await reader.read_varint()
+            header += write_varint(count)
+            for _ in range(count):
+                header += write_varint(await reader.read_varint())
+    mode, checksums, pipeline = read_stream_info(io.BytesIO(header))
+
+    collect = stats is not None or hook is not None
+    jobs = _PendingJobs(executor or shared_executor(), max_pending or 2 * default_workers())
+
+    crc = 0
+
+    def blocks(results):
+        nonlocal crc
+        for result in results:
+            if collect:
+                result, block_stats = result
+                _add_stats(stats, hook, block_stats)
+            if checksums:
+                crc = zlib.crc32(result, crc)
+            yield result
+
+    last_body = None
+    codebook = None
+    try:
+        async for block_type, body in _read_frames(reader):
+            # Same pairing as `link_codebooks`: repeated blocks reuse the last code lengths.
+            if block_type == BLOCK_HUFFMAN:
+                last_body = body
+                codebook = None
+            elif block_type == BLOCK_REPEAT and codebook is None and last_body is not None:
+                codebook = last_body[:codebook_end(last_body)]
+            frame = (block_type, body, codebook if block_type == BLOCK_REPEAT else None)
+
+            if collect:
+                job = partial(decode_frame_with_stats, frame, mode, dictionaries, checksums, pipeline)
+            else:
+                job = partial(decode_frame, block_type, body, mode, dictionaries, codebook=frame[2], checksum=checksums,
+                              pipeline=pipeline)
+            for block in blocks(await jobs.submit(job)):
+                yield block
+
+        for block in blocks(await jobs.drain()):
+            yield block
+    finally:
+        jobs.cancel()
+
+    if checksums:
+        check_stream_checksum(io.BytesIO(await reader.read(CRC_SIZE)), crc)
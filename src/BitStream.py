@@ -0,0 +1,118 @@
+# Bits buffered in the accumulator before whole bytes are moved to the output.
+FLUSH_BITS = 480
+
+
+class BitWriter:
+    """
+    Packs variable-length codes MSB-first into a bytearray through an integer accumulator.
+
+    Attributes:
+        bit_count: Number of bits written so far
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._acc = 0
+        self._acc_bits = 0
+        self.bit_count = 0
+
+
+    def write(self, value: int, length: int) -> None:
+        """
+        Appends the `length` low bits of `value`.
+        """
+        self._acc = (self._acc << length) | value
+        self._acc_bits += length
+        self.bit_count += length
+        if self._acc_bits >= FLUSH_BITS:
+            self._flush_bytes()
+
+
+    def write_symbols(self, symbols, codes) -> None:
+        """
+        Appends the code of every symbol.
+
+        Args:
+            symbols: Iterable of symbols
+            codes: Mapping (or sequence indexed by symbol) of symbol -> (code, length)
+        """
+        out = self._buffer
+        acc = self._acc
+        acc_bits = self._acc_bits
+        written = 0
+
+        for code, length in map(codes.__getitem__, symbols):
+            acc = (acc << length) | code
+            acc_bits += length
+            if acc_bits >= FLUSH_BITS:
+                rest = acc_bits & 7
+                out += (acc >> rest).to_bytes(acc_bits >> 3, "big")
+                written += acc_bits - rest
+                acc &= (1 << rest) - 1
+                acc_bits = rest
+
+        self.bit_count += written + acc_bits - self._acc_bits
+        self._acc = acc
+        self._acc_bits = acc_bits
+
+
+    def _flush_bytes(self) -> None:
+        rest = self._acc_bits & 7
+        self._buffer += (self._acc >> rest).to_bytes(self._acc_bits >> 3, "big")
+        self._acc &= (1 << rest) - 1
+        self._acc_bits = rest
+
+
+    def getvalue(self) -> bytearray:
+        """
+        Returns the written bits, with the last byte padded with 0 bits.
+        The writer must not be used afterwards.
+        """
+        self._flush_bytes()
+        if self._acc_bits:
+            self._buffer.append(self._acc << (8 - self._acc_bits))
+            self._acc = 0
+            self._acc_bits = 0
+        return self._buffer
+
+
+class BitReader:
+    """
+    Reads MSB-first bit fields from a bytes-like object without copying it.
+
+    Attributes:
+        position: Index of the next bit to read
+    """
+
+    def __init__(self, data, bit_count: int = None):
+        """
+        Args:
+            data: Bytes-like object to read from
+            bit_count: Number of readable bits, all of `data` by default
+        """
+        self._data = memoryview(data)
+        self.bit_count = len(self._data) * 8 if bit_count is None else bit_count
+        self.position = 0
+
+
+    def remaining(self) -> int:
+        return self.bit_count - self.position
+
+
+    def read(self, length: int) -> int:
+        """
+        Reads `length` bits as an unsigned int.
+        """
+        if length > self.bit_count - self.position:
+            raise ValueError("Invalid compressed data: Unexpected end of bit stream.")
+
+        first = self.position >> 3
+        offset = self.position & 7
+        size = (offset + length + 7) >> 3
+        value = int.from_bytes(self._data[first:first + size], "big")
+        self.position += length
+        return (value >> (size * 8 - offset - length)) & ((1 << length) - 1)
+
+
+    def read_bit(self) -> int:
+        return self.read(1)
@@ -0,0 +1,58 @@
+# Reflected CRC-32 polynomial used by zlib.
+_POLY = 0xEDB88320
+CRC_SIZE = 4
+
+
+def _multmodp(a: int, b: int) -> int:
+    """
+    Multiplies two polynomials modulo the CRC-32 polynomial (reflected bit order).
+    """
+    m = 1 << 31
+    p = 0
+    while True:
+        if a & m:
+            p ^= b
+            if not a & (m - 1):
+                return p
+        m >>= 1
+        b = (b >> 1) ^ _POLY if b & 1 else b >> 1
+
+
+def _x2n_table() -> list:
+    table = []
+    p = 1 << 30  # x^1
+    for _ in range(32):
+        table.append(p)
+        p = _multmodp(p, p)
+    return table
+
+
+# x^(2^n) modulo the polynomial, for n = 0..31.
+_X2N = _x2n_table()
+
+
+def _x2nmodp(n: int, k: int) -> int:
+    """
+    Returns x^(n * 2^k) modulo the polynomial.
+    """
+    p = 1 << 31  # x^0
+    while n:
+        if n & 1:
+            p = _multmodp(_X2N[k & 31], p)
+        n >>= 1
+        k += 1
+    return p
+
+
+def crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """
+    Returns the CRC-32 of two pieces of data joined together from the CRC-32
+    of each piece and the length of the second one, as zlib's C function of
+    the same name does, without reading the data again.
+
+    Args:
+        crc1: CRC-32 of the first piece
+        crc2: CRC-32 of the second piece
+        length2: Length of the second piece in bytes
+    """
+    return _multmodp(_x2nmodp(length2, 3), crc1) ^ crc2
@@ -0,0 +1,258 @@
+import heapq
+
+
+def write_varint(value: int) -> bytes:
+    """
+    Encodes a non-negative int as LEB128, 7 bits per byte with the high bit as continuation flag.
+    """
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def read_varint(data, offset: int) -> tuple[int, int]:
+    """
+    Decodes a LEB128 int from `data` at `offset`.
+
+    Returns:
+        The value and the offset just past it
+    """
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Invalid compressed data: Truncated header.")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def huffman_merges(weights: list) -> list:
+    """
+    Builds a Huffman tree with the two-queue method: once the leaves are
+    sorted, merged nodes come out in non-decreasing weight order, so the two
+    lightest nodes are always at the front of the sorted leaves or of the
+    queue of merged nodes and every merge takes constant time.
+
+    Ties go to the leaf and then to the lower index, which gives the same tree
+    as a heap of (weight, index) pairs.
+
+    Args:
+        weights: Weight of every leaf, leaves are numbered in this order
+
+    Returns:
+        List of (left, right) node pairs, the k-th merge creates node
+        `len(weights) + k`
+    """
+    count = len(weights)
+    leaves = sorted(range(count), key=weights.__getitem__)
+    node_weights = list(weights)
+    merges = []
+    leaf = 0
+    merged = count
+
+    for _ in range(count - 1):
+        pair = []
+        for _ in range(2):
+            if leaf < count and (merged == len(node_weights) or weights[leaves[leaf]] <= node_weights[merged]):
+                pair.append(leaves[leaf])
+                leaf += 1
+            else:
+                pair.append(merged)
+                merged += 1
+        node_weights.append(node_weights[pair[0]] + node_weights[pair[1]])
+        merges.append((pair[0], pair[1]))
+
+    return merges
+
+
+def code_lengths(freqs: dict) -> dict:
+    """
+    Computes Huffman code lengths straight from symbol frequencies.
+
+    Only the parent of every node is kept, and depths are read back from the
+    root down since a parent always gets a larger index than its children.
+    Symbols are taken in sorted order so ties break the same way whatever
+    order `freqs` is in.
+
+    Args:
+        freqs: Mapping of symbol -> frequency
+
+    Returns:
+        Mapping of symbol -> code length
+    """
+    symbols = sorted(freqs)
+    count = len(symbols)
+    if count == 1:
+        return {symbols[0]: 1}
+
+    parent = [0] * (2 * count - 1)
+    for index, (left, right) in enumerate(huffman_merges([freqs[symbol] for symbol in symbols]), count):
+        parent[left] = parent[right] = index
+
+    depth = [0] * (2 * count - 1)
+    for index in range(2 * count - 3, -1, -1):
+        depth[index] = depth[parent[index]] + 1
+
+    return {symbol: depth[index] for index, symbol in enumerate(symbols)}
+
+
+def fitting_code_length(max_length: int, symbol_count: int) -> int:
+    """
+    Returns `max_length`, raised to the fewest bits that give each of
+    `symbol_count` symbols a code of its own when it is too short for that.
+    """
+    return max(max_length, (symbol_count - 1).bit_length())
+
+
+def limited_code_lengths(freqs: dict, max_length: int) -> dict:
+    """
+    Computes optimal code lengths of at most `max_length` bits with the
+    package-merge algorithm. When plain Huffman lengths already fit they are
+    returned unchanged.
+
+    Leaves are sorted by weight; `max_length - 1` times, consecutive pairs of
+    the current list are packaged and merged back with the leaves. The code
+    length of a symbol is the number of times its leaf appears, directly or
+    inside packages, among the first 2n - 2 items of the final list.
+
+    Args:
+        freqs: Mapping of symbol -> frequency
+        max_length: Longest allowed code, in bits
+
+    Returns:
+        Mapping of symbol -> code length
+    """
+    lengths = code_lengths(freqs)
+    if max(lengths.values()) <= max_length:
+        return lengths
+
+    symbols = sorted(freqs)
+    count = len(symbols)
+    if count > 1 << max_length:
+        raise ValueError(f"Cannot code {count} symbols with codes of at most {max_length} bits")
+
+    # Items are (weight, node): a leaf node is a symbol index, a package is a pair of nodes.
+    leaves = sorted((freqs[symbol], index) for index, symbol in enumerate(symbols))
+    items = leaves
+    for _ in range(max_length - 1):
+        packages = [(items[i][0] + items[i + 1][0], (items[i][1], items[i + 1][1]))
+                    for i in range(0, len(items) - 1, 2)]
+        items = list(heapq.merge(leaves, packages, key=lambda item: item[0]))
+
+    depth = [0] * count
+    stack = [node for _, node in items[:2 * count - 2]]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, int):
+            depth[node] += 1
+        else:
+            stack.extend(node)
+
+    return {symbol: depth[index] for index, symbol in enumerate(symbols)}
+
+
+def code_lengths_from_tree(root) -> dict:
+    """
+    Returns the code length of every leaf of a Huffman tree, walking it without recursion.
+    A tree made of a single leaf gets a 1-bit code.
+    """
+    lengths = {}
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node.char is not None:
+            lengths[node.char] = depth or 1
+            continue
+        if node.left_child is not None:
+            stack.append((node.left_child, depth + 1))
+        if node.right_child is not None:
+            stack.append((node.right_child, depth + 1))
+    return lengths
+
+
+def canonical_codes(lengths: dict) -> dict:
+    """
+    Assigns canonical Huffman codes: symbols are ordered by (length, symbol)
+    and each code is the previous one plus one, shifted left when the length grows.
+
+    Args:
+        lengths: Mapping of symbol -> code length
+
+    Returns:
+        Mapping of symbol -> (code, length)
+    """
+    codes = {}
+    code = 0
+    previous_length = 0
+    for symbol, length in sorted(lengths.items(), key=lambda item: (item[1], item[0])):
+        code <<= length - previous_length
+        codes[symbol] = (code, length)
+        code += 1
+        previous_length = length
+
+    if code > (1 << previous_length):
+        raise ValueError("Code lengths do not form a valid prefix code")
+    return codes
+
+
+def serialize_codebook(lengths: dict) -> bytes:
+    """
+    Stores a codebook as its code lengths only.
+
+    Layout: max length (varint), then the number of symbols of every length
+    from 1 to max length (varints), then the symbols of each length in
+    ascending order, delta encoded inside their length group (varints).
+
+    Args:
+        lengths: Mapping of int symbol -> code length
+    """
+    max_length = max(lengths.values())
+    groups = [[] for _ in range(max_length + 1)]
+    for symbol in sorted(lengths):
+        groups[lengths[symbol]].append(symbol)
+
+    out = bytearray(write_varint(max_length))
+    for length in range(1, max_length + 1):
+        out += write_varint(len(groups[length]))
+    for length in range(1, max_length + 1):
+        previous = 0
+        for symbol in groups[length]:
+            out += write_varint(symbol - previous)
+            previous = symbol
+    return bytes(out)
+
+
+def deserialize_codebook(data, offset: int = 0) -> tuple[dict, int]:
+    """
+    Reads a codebook written by `serialize_codebook`.
+
+    Returns:
+        Mapping of int symbol -> code length and the offset just past the codebook
+    """
+    max_length, offset = read_varint(data, offset)
+    if max_length == 0:
+        raise ValueError("Invalid compressed data: Empty codebook.")
+
+    counts = []
+    for _ in range(max_length):
+        count, offset = read_varint(data, offset)
+        counts.append(count)
+
+    lengths = {}
+    for length, count in enumerate(counts, start=1):
+        symbol = 0
+        for _ in range(count):
+            delta, offset = read_varint(data, offset)
+            symbol += delta
+            lengths[symbol] = length
+
+    if len(lengths) != sum(counts):
+        raise ValueError("Invalid compressed data: Duplicate symbols in codebook.")
+    return lengths, offset
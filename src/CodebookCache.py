@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+
+# Entries kept per process. A decode table with the default 12 table bits
+# takes a few hundred KB, a codebook a few KB.
+DEFAULT_MAX_TABLES = 64
+DEFAULT_MAX_CODEBOOKS = 256
+
+
+class LRUCache:
+    """
+    Size-bounded mapping that drops the least recently used entry when full. Safe to share between threads.
+
+    Attributes:
+        max_entries: Number of entries kept
+        hits: Lookups that found their key
+        misses: Lookups that did not
+        evictions: Entries dropped to make room
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key):
+        """
+        Returns the value of `key`, or None when it is not cached.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._evict()
+
+
+    def get_or_build(self, key, build) -> tuple[object, bool]:
+        """
+        Returns the value of `key`, calling `build()` and caching its result on a miss.
+
+        Returns:
+            The value and whether it came from the cache
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = build()
+        self.put(key, value)
+        return value, False
+
+
+    def resize(self, max_entries: int) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            self._evict()
+
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# Decode tables keyed by (mode, serialized code lengths) or ("dictionary", dictionary ID).
+DECODE_TABLES = LRUCache(DEFAULT_MAX_TABLES)
+
+# Codes keyed by (mode, sorted histogram). The exact histogram is used rather
+# than a rounded one so the output never depends on what was cached before.
+CODEBOOKS = LRUCache(DEFAULT_MAX_CODEBOOKS)
+
+
+def cache_info() -> dict:
+    """
+    Returns the entries and hit/miss counters of the caches of this process.
+    """
+    return {"decode_tables": DECODE_TABLES.info(), "codebooks": CODEBOOKS.info()}
+
+
+def configure_caches(max_tables: int = None, max_codebooks: int = None) -> None:
+    """
+    Changes how many entries the caches of this process keep; 0 disables a cache.
+    """
+    if max_tables is not None:
+        DECODE_TABLES.resize(max_tables)
+    if max_codebooks is not None:
+        CODEBOOKS.resize(max_codebooks)
+
+
+def clear_caches() -> None:
+    DECODE_TABLES.clear()
+    CODEBOOKS.clear()
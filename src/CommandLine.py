@@ -0,0 +1,232 @@
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .Container import DEFAULT_BLOCK_SIZE, MODE_BYTES, MODE_TEXT, detect_mode
+from .Dictionary import load_dictionary, save_dictionary, train_dictionary_from_files
+from .HuffmanCoding import HuffmanCoding
+from .ParallelCoding import default_workers
+from .Transforms import CONTEXT_STAGE, STAGES, Pipeline
+
+SUFFIX = ".huff"
+
+
+def expand_paths(patterns: list, suffix: str = None) -> list:
+    """
+    Expands files, directories (walked recursively) and glob patterns into a sorted list of files.
+
+    Args:
+        patterns: Paths or glob patterns given on the command line
+        suffix: When set, files found inside directories must end with it
+    """
+    files = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            if os.path.isdir(match):
+                for directory, _, names in os.walk(match):
+                    files.update(os.path.join(directory, name) for name in names
+                                 if suffix is None or name.endswith(suffix))
+            elif os.path.isfile(match):
+                files.add(match)
+            else:
+                raise FileNotFoundError(f"No such file or directory: {match}")
+    return sorted(files)
+
+
+def default_output_path(path: str, output_dir: str, suffix_to_add: str = "", suffix_to_strip: str = "") -> str:
+    """
+    Returns where the output of `path` goes: in `output_dir` (next to `path`
+    when it is empty), with `suffix_to_add` appended or `suffix_to_strip`
+    removed (".out" is appended when the name does not end with it).
+    """
+    name = os.path.basename(path)
+    if suffix_to_strip:
+        name = name[:-len(suffix_to_strip)] if name.endswith(suffix_to_strip) else name + ".out"
+    return os.path.join(output_dir or os.path.dirname(path), name + suffix_to_add)
+
+
+def _compress_job(path: str, output_path: str, mode: str, block_size: int, dictionary: str = None,
+                  adaptive: bool = False, max_code_length: int = None, checksums: bool = False,
+                  pipeline: str = None) -> str:
+    if dictionary:
+        dictionary = load_dictionary(dictionary)
+        mode = dictionary.mode
+    mode = detect_mode(path) if mode == "auto" else mode
+    HuffmanCoding().compress_data(path, output_path, block_size=block_size, mode=mode, dictionary=dictionary,
+                                  adaptive=adaptive, max_code_length=max_code_length, checksums=checksums,
+                                  pipeline=pipeline)
+    return output_path
+
+
+def _decompress_job(path: str, output_path: str, dictionaries: list = None) -> str:
+    HuffmanCoding().decompress_data(path, output_path, use_mmap=True, dictionaries=dictionaries)
+    return output_path
+
+
+def _verify_job(path: str, dictionaries: list = None, workers: int = 1) -> str:
+    size = HuffmanCoding().verify_data(path, workers=workers, dictionaries=dictionaries)
+    return f"OK ({size} bytes)"
+
+
+def _bench_job(path: str, mode: str, block_size: int) -> str:
+    mode = detect_mode(path) if mode == "auto" else mode
+    size = os.path.getsize(path)
+    huffman = HuffmanCoding()
+
+    with tempfile.TemporaryDirectory() as directory:
+        compressed = os.path.join(directory, "bench" + SUFFIX)
+        start = time.perf_counter()
+        huffman.compress_data(path, compressed, block_size=block_size, mode=mode)
+        compress_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        huffman.decompress_data(compressed, os.devnull)
+        decompress_time = time.perf_counter() - start
+        compressed_size = os.path.getsize(compressed)
+
+    megabytes = size / 1e6
+    return (f"{mode} ratio {compressed_size / size:.3f}  "
+            f"compress {megabytes / compress_time:.2f} MB/s  "
+            f"decompress {megabytes / decompress_time:.2f} MB/s")
+
+
+def _run_jobs(function, jobs: list, workers: int) -> int:
+    """
+    Runs `function(path, *args)` for every (path, args) job on a process pool and prints one line per file.
+
+    Returns:
+        The number of failed jobs
+    """
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [(path, executor.submit(function, path, *args)) for path, args in jobs]
+        for path, future in futures:
+            try:
+                print(f"{path}: {future.result()}")
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                failures += 1
+                print(f"{path}: FAILED ({e})", file=sys.stderr)
+    return failures
+
+
+def _pipeline(spec: str) -> str:
+    try:
+        Pipeline.parse(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return spec
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src", description="Huffman compression without the GUI.")
+    parser.add_argument("-j", "--jobs", type=int, default=default_workers(),
+                        help="files processed concurrently (default: one per CPU)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compress = commands.add_parser("compress", help=f"compress files into {SUFFIX} archives")
+    compress.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    compress.add_argument("-o", "--output-dir", help="directory for the archives (default: next to each input)")
+    compress.add_argument("--mode", choices=("auto", MODE_TEXT, MODE_BYTES), default="auto")
+    compress.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    compress.add_argument("-D", "--dictionary", help="shared dictionary to code the files with (sets the mode)")
+    compress.add_argument("--adaptive", action="store_true",
+                          help="per block, reuse the previous codebook or store raw when that is smaller")
+    compress.add_argument("--max-code-length", type=int, help="longest code in bits, e.g. 11 to 15")
+    compress.add_argument("--checksum", action="store_true",
+                          help="store CRC32 checksums of every block and of the whole file")
+    compress.add_argument("--pipeline", type=_pipeline,
+                          help=f"transform stages before coding, from {', '.join(STAGES)} and {CONTEXT_STAGE} "
+                               "(last), e.g. bwt,mtf,rle")
+
+    append = commands.add_parser("append", help=f"add files to the end of a {SUFFIX} archive")
+    append.add_argument("archive", help="archive to extend, in place")
+    append.add_argument("paths", nargs="+", help="files, directories or glob patterns, appended in order")
+    append.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    append.add_argument("-D", "--dictionary", help="shared dictionary to code the files with")
+    append.add_argument("--new-codebooks", action="store_true",
+                        help="give every block its own codebook instead of reusing the archive's when smaller")
+    append.add_argument("--max-code-length", type=int, help="longest code in bits, e.g. 11 to 15")
+
+    decompress = commands.add_parser("decompress", help=f"decompress {SUFFIX} archives")
+    decompress.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    decompress.add_argument("-o", "--output-dir", help="directory for the output (default: next to each archive)")
+    decompress.add_argument("-D", "--dictionary", action="append", help="dictionary the archives may need")
+
+    verify = commands.add_parser("verify", help="decode archives without writing the output")
+    verify.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    verify.add_argument("-D", "--dictionary", action="append", help="dictionary the archives may need")
+
+    train = commands.add_parser("train", help="train a shared dictionary on sample files")
+    train.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    train.add_argument("-o", "--output", required=True, help="dictionary file to write")
+    train.add_argument("--mode", choices=(MODE_TEXT, MODE_BYTES), default=MODE_TEXT)
+
+    bench = commands.add_parser("bench", help="time compression and decompression of files")
+    bench.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    bench.add_argument("--mode", choices=("auto", MODE_TEXT, MODE_BYTES), default="auto")
+    bench.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """
+    Entry point of `python -m src`, returns the process exit code.
+    """
+    args = build_parser().parse_args(argv)
+    archives_only = SUFFIX if args.command in ("decompress", "verify") else None
+    try:
+        paths = expand_paths(args.paths, archives_only)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    if getattr(args, "output_dir", None):
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.command == "train":
+        try:
+            dictionary = train_dictionary_from_files(paths, args.mode)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            print(f"Training failed: {e}", file=sys.stderr)
+            return 1
+        save_dictionary(dictionary, args.output)
+        print(f"{args.output}: dictionary {dictionary.dictionary_id:08x}, {len(dictionary.lengths)} symbols")
+        return 0
+
+    if args.command == "append":
+        # Every file extends the same archive, so they are added one after the other.
+        failures = 0
+        for path in paths:
+            try:
+                stats = HuffmanCoding().append_data(path, args.archive, block_size=args.block_size,
+                                                    workers=args.jobs, dictionary=args.dictionary,
+                                                    adaptive=not args.new_codebooks,
+                                                    max_code_length=args.max_code_length)
+                print(f"{path}: +{stats.output_bytes} bytes")
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                failures += 1
+                print(f"{path}: FAILED ({e})", file=sys.stderr)
+        return 1 if failures else 0
+
+    if args.command == "compress":
+        jobs = [(path, (default_output_path(path, args.output_dir, suffix_to_add=SUFFIX), args.mode, args.block_size,
+                        args.dictionary, args.adaptive, args.max_code_length, args.checksum, args.pipeline))
+                for path in paths]
+        failures = _run_jobs(_compress_job, jobs, args.jobs)
+    elif args.command == "decompress":
+        jobs = [(path, (default_output_path(path, args.output_dir, suffix_to_strip=SUFFIX), args.dictionary))
+                for path in paths]
+        failures = _run_jobs(_decompress_job, jobs, args.jobs)
+    elif args.command == "verify":
+        # Files are checked side by side, and the CPUs left over decode the blocks of each one.
+        block_workers = max(1, args.jobs // max(1, len(paths)))
+        failures = _run_jobs(_verify_job, [(path, (args.dictionary, block_workers)) for path in paths], args.jobs)
+    else:
+        failures = _run_jobs(_bench_job, [(path, (args.mode, args.block_size)) for path in paths], args.jobs)
+
+    return 1 if failures else 0
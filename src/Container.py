@@ -0,0 +1,1566 @@
+import bisect
+import codecs
+import contextlib
+import io
+import mmap
+import time
+import zlib
+from collections import Counter
+
+from .BitStream import BitWriter
+from .Checksum import CRC_SIZE, crc32_combine
+from .CodebookCache import CODEBOOKS, DECODE_TABLES
+from .Codebook import (canonical_codes, code_lengths, deserialize_codebook, fitting_code_length, limited_code_lengths,
+                       read_varint, serialize_codebook, write_varint)
+from .DecodeTable import DEFAULT_TABLE_BITS, ContextDecodeTable, DecodeTable
+from .Stats import CodingStats
+from .Transforms import Pipeline
+from . import NumpyBackend
+
+MAGIC = b"HUF"
+STREAM_VERSION = 4
+
+# Symbols are the characters of UTF-8 text, or the 256 byte values of any file.
+MODE_TEXT = "text"
+MODE_BYTES = "bytes"
+FLAG_BYTES = 0x01
+FLAG_CHECKSUMS = 0x02
+FLAG_PIPELINE = 0x04
+
+# Characters (or bytes) of input per block, which bounds the memory used by either side.
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+BLOCK_END = 0
+BLOCK_HUFFMAN = 1
+BLOCK_DICTIONARY = 2
+BLOCK_REPEAT = 3
+BLOCK_STORED = 4
+BLOCK_CONTEXT = 5
+BLOCK_TYPES = (BLOCK_HUFFMAN, BLOCK_DICTIONARY, BLOCK_REPEAT, BLOCK_STORED, BLOCK_CONTEXT)
+
+# A block coded with a shared dictionary falls back to its own codebook when
+# more than this fraction of its symbols would have to be escaped.
+MAX_ESCAPE_RATIO = 1 / 16
+
+# Longest code length limit that keeps every decode within two table lookups.
+MAX_CODE_LENGTH_LIMIT = 2 * DEFAULT_TABLE_BITS
+
+# Order-1 context coding: previous bytes seen at least MIN_CONTEXT_SYMBOLS
+# times get their own codebook, up to MAX_CONTEXT_CLASSES - 1 of them, and the
+# other previous bytes share one. Context codes fit in a single table lookup.
+MAX_CONTEXT_CLASSES = 16
+MIN_CONTEXT_SYMBOLS = 256
+CONTEXT_CODE_LENGTH = DEFAULT_TABLE_BITS
+
+# The last byte of a stream, after the length of its block index.
+INDEX_MAGIC = b"X"
+
+
+def detect_mode(path: str, sample_size: int = 1 << 16) -> str:
+    """
+    Guesses the symbol mode of a file from its first bytes: MODE_TEXT when
+    they are valid UTF-8, MODE_BYTES otherwise.
+    """
+    with open(path, "rb") as f:
+        sample = f.read(sample_size)
+    try:
+        # A multi-byte character may be cut at the end of the sample.
+        codecs.getincrementaldecoder("utf-8")().decode(sample)
+    except UnicodeDecodeError:
+        return MODE_BYTES
+    return MODE_TEXT
+
+
+def byte_histogram(data) -> list:
+    """
+    Returns the number of occurrences of each of the 256 byte values in `data`.
+    """
+    histogram = [0] * 256
+    for byte, count in Counter(memoryview(data)).items():
+        histogram[byte] = count
+    return histogram
+
+
+def encode_block(data, mode: str = MODE_TEXT, use_numpy: bool = None,
+                 stats: CodingStats = None, max_code_length: int = None) -> tuple[bytes, int]:
+    """
+    Compresses one block into a frame body.
+
+    Layout: code lengths, decoded size in bytes (varint), payload length in
+    bits (varint), then the payload padded to a whole byte.
+
+    Args:
+        data: A str in text mode, a bytes-like object in bytes mode
+        mode: MODE_TEXT or MODE_BYTES
+        use_numpy: Use the NumPy backend; by default it is used when NumPy is
+                   installed and the block is large enough to benefit
+        stats: Per-block stats to fill in, phases are not timed without it
+        max_code_length: Longest code allowed, see `limited_code_lengths`
+
+    Returns:
+        The frame body and the decoded size of the block in bytes
+    """
+    text = mode != MODE_BYTES
+    if use_numpy is None:
+        use_numpy = _use_numpy(data)
+    if stats is None:
+        stats = CodingStats("compress")
+
+    freqs, lengths, codes = _block_codes(data, mode, use_numpy, stats, max_code_length)
+    payload, bit_count = _encode_payload(data, codes, text, use_numpy, stats)
+    start = time.perf_counter()
+
+    decoded_size = _decoded_size(data, freqs, text)
+    header = _serialize_lengths(lengths, text) + write_varint(decoded_size) + write_varint(bit_count)
+    body = header + payload
+    stats.add_time("header_serialization", start)
+
+    _count_block(stats, data, len(freqs), codes, len(payload))
+    return body, decoded_size
+
+
+def _use_numpy(data) -> bool:
+    return len(data) >= NumpyBackend.MIN_SYMBOLS and NumpyBackend.available()
+
+
+def check_code_length_limit(max_code_length: int) -> None:
+    if max_code_length is not None and not 1 <= max_code_length <= MAX_CODE_LENGTH_LIMIT:
+        raise ValueError(f"Maximum code length must be between 1 and {MAX_CODE_LENGTH_LIMIT}")
+
+
+def check_encoding_options(dictionary=None, adaptive: bool = False, max_code_length: int = None,
+                           pipeline: Pipeline = None) -> None:
+    """
+    Raises ValueError for options of `compress_stream` that cannot be combined.
+    """
+    if adaptive and dictionary is not None:
+        raise ValueError("Adaptive blocks cannot be combined with a dictionary")
+    if pipeline and (adaptive or dictionary is not None):
+        raise ValueError("A pipeline cannot be combined with adaptive blocks or a dictionary")
+    check_code_length_limit(max_code_length)
+
+
+def _block_codes(data, mode: str, use_numpy: bool, stats: CodingStats,
+                 max_code_length: int = None) -> tuple[dict, dict, dict]:
+    """
+    Counts the symbols of a block and builds their codes, or takes them from the codebook cache.
+    With a `max_code_length`, the bits lost to the limit are added to `stats`.
+
+    Returns:
+        Mappings of symbol -> frequency, symbol -> code length and symbol -> (code, length)
+    """
+    start = time.perf_counter()
+    if use_numpy:
+        freqs = NumpyBackend.histogram(data, mode != MODE_BYTES)
+    elif mode != MODE_BYTES:
+        freqs = Counter(data)
+    else:
+        freqs = {byte: count for byte, count in enumerate(byte_histogram(data)) if count}
+    start = stats.add_time("histogram", start)
+
+    key = (mode, max_code_length, tuple(sorted(freqs.items())))
+    cached = CODEBOOKS.get(key)
+    if cached is None:
+        stats.cache_misses += 1
+        lengths = code_lengths(freqs)
+        loss_bits = 0
+        # A block with more distinct symbols than the limit can code gets the fewest bits that fit them.
+        limit = fitting_code_length(max_code_length, len(freqs)) if max_code_length is not None else None
+        if limit is not None and max(lengths.values()) > limit:
+            limited = limited_code_lengths(freqs, limit)
+            loss_bits = sum(freq * (limited[symbol] - lengths[symbol]) for symbol, freq in freqs.items())
+            lengths = limited
+        start = stats.add_time("tree_build", start)
+        codes = canonical_codes(lengths)
+        stats.add_time("code_generation", start)
+        CODEBOOKS.put(key, (lengths, codes, loss_bits))
+    else:
+        stats.cache_hits += 1
+        lengths, codes, loss_bits = cached
+        stats.add_time("tree_build", start)
+
+    if loss_bits:
+        stats.limited_blocks += 1
+        stats.limit_loss_bits += loss_bits
+    return freqs, lengths, codes
+
+
+def _decoded_size(data, freqs: dict, text: bool) -> int:
+    if text:
+        return sum(freq * len(char.encode("utf-8")) for char, freq in freqs.items())
+    return len(data)
+
+
+def _serialize_lengths(lengths: dict, text: bool) -> bytes:
+    if text:
+        lengths = {ord(char): length for char, length in lengths.items()}
+    return serialize_codebook(lengths)
+
+
+def _count_block(stats: CodingStats, data, distinct_symbols: int, codes: dict, payload_size: int) -> None:
+    stats.blocks += 1
+    stats.symbols += len(data)
+    stats.distinct_symbols = max(stats.distinct_symbols, distinct_symbols)
+    if codes:
+        stats.max_code_length = max(stats.max_code_length, max(length for _, length in codes.values()))
+    stats.payload_bytes += payload_size
+
+
+def _encode_payload(data, codes: dict, text: bool, use_numpy: bool, stats: CodingStats) -> tuple[bytes, int]:
+    """
+    Packs the codes of every symbol of `data`, with NumPy when asked to and the codes allow it.
+
+    Returns:
+        The payload padded to a whole byte and its length in bits
+    """
+    start = time.perf_counter()
+    if use_numpy and max(length for _, length in codes.values()) <= NumpyBackend.MAX_CODE_LENGTH:
+        payload, bit_count = NumpyBackend.encode(data, codes, text)
+        stats.add_time("encode", start)
+        return payload, bit_count
+
+    writer = BitWriter()
+    if text:
+        writer.write_symbols(data, codes)
+    else:
+        code_list = [None] * 256
+        for byte, code in codes.items():
+            code_list[byte] = code
+        writer.write_symbols(memoryview(data), code_list)
+    bit_count = writer.bit_count
+    start = stats.add_time("encode", start)
+    payload = writer.getvalue()
+    stats.add_time("pack", start)
+    return payload, bit_count
+
+
+def _escape_symbols(data, codes: dict, text: bool) -> tuple[object, list]:
+    """
+    Takes the symbols without a code out of `data`.
+
+    Returns:
+        The data left and a list of (offset in the decoded bytes, symbol) for
+        every symbol taken out, symbols being code points in text mode
+    """
+    unseen = set(data) - codes.keys()
+    if not unseen:
+        return data, []
+
+    escapes = []
+    if text:
+        byte_offset = 0
+        previous = 0
+        for index, char in enumerate(data):
+            if char in unseen:
+                byte_offset += len(data[previous:index].encode("utf-8"))
+                escapes.append((byte_offset, ord(char)))
+                byte_offset += len(char.encode("utf-8"))
+                previous = index + 1
+        return data.translate(dict.fromkeys(map(ord, unseen))), escapes
+
+    data = bytes(data)
+    escapes = [(index, byte) for index, byte in enumerate(data) if byte in unseen]
+    return data.translate(None, bytes(unseen)), escapes
+
+
+def encode_dictionary_block(data, dictionary, mode: str = MODE_TEXT, use_numpy: bool = None,
+                            stats: CodingStats = None) -> tuple[bytes, int] | None:
+    """
+    Compresses one block with the codes of a shared dictionary.
+
+    Layout: dictionary ID, decoded size in bytes, payload length in bits, the
+    number of escaped symbols, then for each of them the distance in decoded
+    bytes from the previous one and the symbol (all varints), then the payload.
+    Escaped symbols are the ones the dictionary has no code for; they are kept
+    out of the payload and put back at their offsets after decoding.
+
+    Args:
+        dictionary: A `Dictionary` of the same mode
+
+    Returns:
+        The frame body and the decoded size of the block in bytes, or None
+        when too many symbols would have to be escaped
+    """
+    text = mode != MODE_BYTES
+    if use_numpy is None:
+        use_numpy = _use_numpy(data)
+    if stats is None:
+        stats = CodingStats("compress")
+    start = time.perf_counter()
+
+    codes = dictionary.codes
+    coded, escapes = _escape_symbols(data, codes, text)
+    if len(escapes) > len(data) * MAX_ESCAPE_RATIO:
+        return None
+    stats.add_time("histogram", start)
+
+    payload, bit_count = _encode_payload(coded, codes, text, use_numpy, stats) if coded else (b"", 0)
+    start = time.perf_counter()
+
+    decoded_size = len(data.encode("utf-8")) if text else len(data)
+    header = bytearray(write_varint(dictionary.dictionary_id) + write_varint(decoded_size) +
+                       write_varint(bit_count) + write_varint(len(escapes)))
+    previous = 0
+    for offset, symbol in escapes:
+        header += write_varint(offset - previous) + write_varint(symbol)
+        previous = offset
+    body = bytes(header) + payload
+    stats.add_time("header_serialization", start)
+
+    _count_block(stats, data, len(codes), codes, len(payload))
+    return body, decoded_size
+
+
+def _context_classes(data) -> tuple[bytes, list]:
+    """
+    Picks the previous bytes that get a codebook of their own: the most
+    frequent ones, the first byte of a block counting as following a 0 byte.
+
+    Returns:
+        The class of every byte value (256 bytes, 0 for the shared class) and
+        the bytes with their own class, in ascending order
+    """
+    counts = byte_histogram(memoryview(data)[:-1])
+    counts[0] += 1
+    frequent = sorted((byte for byte in range(256) if counts[byte] >= MIN_CONTEXT_SYMBOLS),
+                      key=lambda byte: (-counts[byte], byte))
+    owners = sorted(frequent[:MAX_CONTEXT_CLASSES - 1])
+    classes = bytearray(256)
+    for index, byte in enumerate(owners, start=1):
+        classes[byte] = index
+    return bytes(classes), owners
+
+
+def encode_context_block(data, use_numpy: bool = None, stats: CodingStats = None,
+                         max_code_length: int = None) -> bytes:
+    """
+    Compresses the bytes of one block with one codebook per class of previous
+    byte (order-1 context coding), see `_context_classes`.
+
+    Layout: the number of previous bytes with their own class (varint) and
+    those bytes, then the code lengths of every class (a single 0 byte for a
+    class without symbols), the decoded size and the payload length in bits
+    (varints), then the payload padded to a whole byte.
+
+    Args:
+        data: A bytes-like object
+        max_code_length: Longest code allowed, CONTEXT_CODE_LENGTH at most
+
+    Returns:
+        The frame body
+    """
+    if use_numpy is None:
+        use_numpy = _use_numpy(data)
+    if stats is None:
+        stats = CodingStats("compress")
+    start = time.perf_counter()
+
+    classes, owners = _context_classes(data)
+    class_count = len(owners) + 1
+    if use_numpy:
+        symbols = NumpyBackend.context_symbols(data, classes)
+        freqs = NumpyBackend.context_histogram(symbols, class_count)
+    else:
+        symbols = [classes[previous] << 8 | byte for previous, byte in zip(b"\0" + bytes(data[:-1]), data)]
+        freqs = Counter(symbols)
+    start = stats.add_time("histogram", start)
+
+    limit = min(max_code_length or CONTEXT_CODE_LENGTH, CONTEXT_CODE_LENGTH)
+    class_freqs = [{} for _ in range(class_count)]
+    for symbol, freq in freqs.items():
+        class_freqs[symbol >> 8][symbol & 0xFF] = freq
+    codes = {}
+    codebooks = bytearray()
+    for index, byte_freqs in enumerate(class_freqs):
+        if not byte_freqs:
+            codebooks.append(0)
+            continue
+        lengths = limited_code_lengths(byte_freqs, fitting_code_length(limit, len(byte_freqs)))
+        codes.update(((index << 8) | byte, code) for byte, code in canonical_codes(lengths).items())
+        codebooks += serialize_codebook(lengths)
+    start = stats.add_time("tree_build", start)
+
+    if use_numpy:
+        payload, bit_count = NumpyBackend.encode_symbols(symbols, codes)
+    else:
+        writer = BitWriter()
+        writer.write_symbols(symbols, codes)
+        bit_count = writer.bit_count
+        payload = writer.getvalue()
+    start = stats.add_time("encode", start)
+
+    body = (write_varint(len(owners)) + bytes(owners) + bytes(codebooks) +
+            write_varint(len(data)) + write_varint(bit_count) + payload)
+    stats.add_time("header_serialization", start)
+
+    _count_block(stats, data, len(freqs), codes, len(payload))
+    return body
+
+
+def _context_table(header, stats: CodingStats) -> tuple[ContextDecodeTable, int]:
+    """
+    Returns the decode table of the classes and code lengths at the start of a
+    BLOCK_CONTEXT body from the cache, building it on a miss.
+
+    Returns:
+        The table and the class of the byte before the first one
+    """
+    owner_count, offset = read_varint(header, 0)
+    if owner_count >= MAX_CONTEXT_CLASSES or offset + owner_count > len(header):
+        raise ValueError("Invalid compressed data: Corrupted context classes.")
+    owners = bytes(header[offset:offset + owner_count])
+    classes = bytearray(256)
+    for index, byte in enumerate(owners, start=1):
+        classes[byte] = index
+
+    key = ("context", bytes(header))
+    table = DECODE_TABLES.get(key)
+    if table is not None:
+        stats.cache_hits += 1
+        return table, classes[0]
+
+    stats.cache_misses += 1
+    offset += owner_count
+    class_codes = []
+    for _ in range(owner_count + 1):
+        if offset < len(header) and header[offset] == 0:
+            class_codes.append(None)
+            offset += 1
+            continue
+        lengths, offset = deserialize_codebook(header, offset)
+        if max(lengths) > 255:
+            raise ValueError("Invalid compressed data: Symbol out of byte range.")
+        class_codes.append(canonical_codes(lengths))
+    table = ContextDecodeTable(class_codes, bytes(classes), CONTEXT_CODE_LENGTH)
+    DECODE_TABLES.put(key, table)
+    return table, classes[0]
+
+
+def _context_header_end(body) -> int:
+    owner_count, offset = read_varint(body, 0)
+    offset += owner_count
+    for _ in range(owner_count + 1):
+        if offset >= len(body):
+            raise ValueError("Invalid compressed data: Truncated header.")
+        offset = offset + 1 if body[offset] == 0 else deserialize_codebook(body, offset)[1]
+    return offset
+
+
+def decode_context_block(body, stats: CodingStats = None) -> bytearray:
+    """
+    Decompresses a frame body written by `encode_context_block`.
+    """
+    count_symbols = stats is not None
+    if stats is None:
+        stats = CodingStats("decompress")
+    start = time.perf_counter()
+
+    offset = _context_header_end(body)
+    header = body[:offset]
+    decoded_size, offset = read_varint(body, offset)
+    bit_count, offset = read_varint(body, offset)
+    start = stats.add_time("header_parse", start)
+
+    table, first_class = _context_table(header, stats)
+    start = stats.add_time("table_build", start)
+
+    decoded = table.decode(memoryview(body)[offset:], bit_count, decoded_size, first_class)
+    stats.add_time("decode", start)
+
+    stats.blocks += 1
+    if count_symbols:
+        stats.symbols += len(decoded)
+    stats.max_code_length = max(stats.max_code_length, table.max_length)
+    stats.payload_bytes += len(body) - offset
+    return decoded
+
+
+def block_checksum(data, mode: str = MODE_TEXT) -> bytes:
+    """
+    Returns the CRC-32 of a block's decoded bytes (UTF-8 in text mode) as 4 big-endian bytes.
+    """
+    return zlib.crc32(data.encode("utf-8") if mode != MODE_BYTES else data).to_bytes(CRC_SIZE, "big")
+
+
+def encode_frame(data, mode: str = MODE_TEXT, dictionary=None, stats: CodingStats = None,
+                 max_code_length: int = None, checksum: bool = False,
+                 pipeline: Pipeline = None) -> tuple[int, bytes, int]:
+    """
+    Compresses one block with the dictionary when one is given and suits the
+    block, with its own codebook otherwise. A block whose body would not be
+    smaller than its raw bytes, like random or already compressed data or a
+    block too small to pay for its codebook, is stored raw (BLOCK_STORED).
+
+    Args:
+        checksum: Append the CRC-32 of the decoded block to the body, for streams with FLAG_CHECKSUMS
+        pipeline: Stages of a stream with FLAG_PIPELINE, see `encode_transformed_frame`
+
+    Returns:
+        The block type, the frame body and the decoded size of the block in bytes
+    """
+    if pipeline:
+        return encode_transformed_frame(data, pipeline, mode, stats, max_code_length, checksum)
+    if stats is None:
+        stats = CodingStats("compress")
+    coded = CodingStats("compress")
+    block = None
+    if dictionary is not None:
+        block = encode_dictionary_block(data, dictionary, mode, stats=coded)
+    if block is not None:
+        block_type = BLOCK_DICTIONARY
+        body, decoded_size = block
+    else:
+        block_type = BLOCK_HUFFMAN
+        body, decoded_size = encode_block(data, mode, stats=coded, max_code_length=max_code_length)
+    stats.merge(coded)
+
+    if len(body) >= decoded_size:
+        block_type = BLOCK_STORED
+        body = _store_raw(data.encode("utf-8") if mode != MODE_BYTES else bytes(data), coded, stats)
+    if checksum:
+        body += block_checksum(data, mode)
+    return block_type, body, decoded_size
+
+
+def encode_frame_with_stats(data, mode: str = MODE_TEXT, dictionary=None, max_code_length: int = None,
+                            checksum: bool = False, pipeline: Pipeline = None) -> tuple[int, bytes, int, CodingStats]:
+    """
+    Like `encode_frame`, also returning the stats of the block so they can
+    come back from a worker process.
+    """
+    stats = CodingStats("compress")
+    return encode_frame(data, mode, dictionary, stats, max_code_length, checksum, pipeline) + (stats,)
+
+
+def encode_transformed_frame(data, pipeline: Pipeline, mode: str = MODE_TEXT, stats: CodingStats = None,
+                             max_code_length: int = None, checksum: bool = False) -> tuple[int, bytes, int]:
+    """
+    Runs the bytes of a block (UTF-8 in text mode) through the stages of a
+    pipeline, then codes the result as byte symbols: as a BLOCK_CONTEXT body
+    when the pipeline ends with the context coder, as a BLOCK_HUFFMAN body
+    otherwise. When that is not smaller than the block, the block is stored
+    raw (BLOCK_STORED) and skips the stages.
+
+    Returns:
+        The block type, the frame body and the decoded size of the block in bytes
+    """
+    if stats is None:
+        stats = CodingStats("compress")
+    start = time.perf_counter()
+    raw = data.encode("utf-8") if mode != MODE_BYTES else bytes(data)
+    transformed = pipeline.forward(raw)
+    stats.add_time("transform", start)
+
+    coded = CodingStats("compress")
+    if pipeline.context:
+        block_type, body = BLOCK_CONTEXT, encode_context_block(transformed, stats=coded,
+                                                               max_code_length=max_code_length)
+    else:
+        block_type = BLOCK_HUFFMAN
+        body, _ = encode_block(transformed, MODE_BYTES, stats=coded, max_code_length=max_code_length)
+    stats.merge(coded)
+
+    if len(body) >= len(raw):
+        block_type, body = BLOCK_STORED, _store_raw(raw, coded, stats)
+    if checksum:
+        body += zlib.crc32(raw).to_bytes(CRC_SIZE, "big")
+    return block_type, body, len(raw)
+
+
+def _store_raw(raw: bytes, coded: CodingStats, stats: CodingStats) -> bytes:
+    """
+    Counts in `stats` a block stored raw instead of as the body described by
+    `coded`, whose payload was already added to them.
+
+    Returns:
+        The raw bytes, which are the BLOCK_STORED body
+    """
+    stats.stored_blocks += 1
+    stats.payload_bytes += len(raw) - coded.payload_bytes
+    return raw
+
+
+def _frame_size(body_size: int) -> int:
+    return 1 + len(write_varint(body_size)) + body_size
+
+
+def _payload_size(decoded_size: int, bit_count: int) -> int:
+    return len(write_varint(decoded_size)) + len(write_varint(bit_count)) + (bit_count + 7) // 8
+
+
+class AdaptiveEncoder:
+    """
+    Chooses how every block of a stream is coded from the exact size of each
+    choice, frame header included:
+
+    - BLOCK_HUFFMAN: the block's own code lengths, which become the active codebook
+    - BLOCK_REPEAT: the active codebook again, when it has a code for every symbol of the block
+    - BLOCK_STORED: the raw bytes, for blocks that do not compress
+
+    Planning only needs the histogram, so it runs in order in the calling
+    process while the payloads can be packed anywhere with `encode_planned`.
+    """
+
+    def __init__(self, mode: str = MODE_TEXT, max_code_length: int = None):
+        self.mode = mode
+        self.max_code_length = max_code_length
+        self._active = None  # codes of the last block that stored its code lengths
+
+
+    def reuse(self, codebook) -> None:
+        """
+        Makes serialized code lengths the active codebook, as if the last
+        planned block had stored them, so that the next blocks can be
+        BLOCK_REPEAT. Used to continue an existing stream.
+        """
+        lengths, _ = deserialize_codebook(codebook)
+        if self.mode != MODE_BYTES:
+            lengths = {chr(symbol): length for symbol, length in lengths.items()}
+        self._active = canonical_codes(lengths)
+
+
+    def plan(self, data, stats: CodingStats = None) -> tuple:
+        """
+        Decides how to code the next block.
+
+        Returns:
+            A plan for `encode_planned`: the block type, the codes to use
+            (None for stored blocks), the serialized code lengths (new codebooks
+            only) and the decoded size
+        """
+        text = self.mode != MODE_BYTES
+        if stats is None:
+            stats = CodingStats("compress")
+
+        freqs, lengths, codes = _block_codes(data, self.mode, _use_numpy(data), stats, self.max_code_length)
+        start = time.perf_counter()
+        decoded_size = _decoded_size(data, freqs, text)
+        codebook = _serialize_lengths(lengths, text)
+
+        bit_count = sum(freq * codes[symbol][1] for symbol, freq in freqs.items())
+        # Ties go to the choice that is cheapest to decode.
+        choices = [(_frame_size(decoded_size), 0, BLOCK_STORED),
+                   (_frame_size(len(codebook) + _payload_size(decoded_size, bit_count)), 2, BLOCK_HUFFMAN)]
+        active = self._active
+        if active is not None and freqs.keys() <= active.keys():
+            repeat_bits = sum(freq * active[symbol][1] for symbol, freq in freqs.items())
+            choices.append((_frame_size(_payload_size(decoded_size, repeat_bits)), 1, BLOCK_REPEAT))
+        _, _, block_type = min(choices)
+        stats.add_time("header_serialization", start)
+
+        if block_type == BLOCK_HUFFMAN:
+            self._active = codes
+            return block_type, codes, codebook, decoded_size
+        if block_type == BLOCK_REPEAT:
+            return block_type, active, None, decoded_size
+        return block_type, None, None, decoded_size
+
+
+def encode_planned(data, plan: tuple, mode: str = MODE_TEXT, stats: CodingStats = None,
+                   checksum: bool = False) -> tuple[int, bytes, int]:
+    """
+    Codes a block as decided by `AdaptiveEncoder.plan`.
+
+    A BLOCK_REPEAT body is a BLOCK_HUFFMAN body without the code lengths; a
+    BLOCK_STORED body is the raw block (UTF-8 bytes in text mode). With
+    `checksum`, the CRC-32 of the decoded block follows the body.
+
+    Returns:
+        The block type, the frame body and the decoded size of the block in bytes
+    """
+    block_type, codes, codebook, decoded_size = plan
+    text = mode != MODE_BYTES
+    if stats is None:
+        stats = CodingStats("compress")
+
+    if block_type == BLOCK_STORED:
+        start = time.perf_counter()
+        body = data.encode("utf-8") if text else bytes(data)
+        stats.add_time("encode", start)
+        stats.stored_blocks += 1
+        _count_block(stats, data, 0, None, len(body))
+        if checksum:
+            body += zlib.crc32(body).to_bytes(CRC_SIZE, "big")
+        return block_type, body, decoded_size
+
+    payload, bit_count = _encode_payload(data, codes, text, _use_numpy(data), stats)
+    start = time.perf_counter()
+    header = write_varint(decoded_size) + write_varint(bit_count)
+    body = (codebook + header if codebook is not None else header) + payload
+    stats.add_time("header_serialization", start)
+
+    if block_type == BLOCK_REPEAT:
+        stats.repeated_blocks += 1
+    _count_block(stats, data, len(codes), codes, len(payload))
+    if checksum:
+        body += block_checksum(data, mode)
+    return block_type, body, decoded_size
+
+
+def encode_planned_with_stats(data, plan: tuple, mode: str = MODE_TEXT,
+                              checksum: bool = False) -> tuple[int, bytes, int, CodingStats]:
+    """
+    Like `encode_planned`, also returning the stats of the block so they can
+    come back from a worker process.
+    """
+    stats = CodingStats("compress")
+    return encode_planned(data, plan, mode, stats, checksum) + (stats,)
+
+
+def plan_blocks(blocks, encoder: AdaptiveEncoder, stats: CodingStats = None):
+    """
+    Yields (block, plan) for every block, planning them in order.
+    """
+    for data in blocks:
+        yield data, encoder.plan(data, stats)
+
+
+def collect_block_stats(blocks, stats: CodingStats = None, hook=None):
+    """
+    Strips the stats from (block type, body, decoded size, stats) tuples, adding
+    them to `stats` and passing them to `hook.on_block`.
+
+    Yields:
+        (block type, body, decoded size) as `write_stream` takes them
+    """
+    for block_type, body, decoded_size, block_stats in blocks:
+        if stats is not None:
+            stats.merge(block_stats)
+        if hook is not None:
+            hook.on_block(block_stats)
+        yield block_type, body, decoded_size
+
+
+def timed(items, stats: CodingStats, phase: str):
+    """
+    Yields from `items`, adding the time spent getting every item to `phase`.
+    """
+    iterator = iter(items)
+    while True:
+        start = time.perf_counter()
+        item = next(iterator, None)
+        stats.add_time(phase, start)
+        if item is None:
+            return
+        yield item
+
+
+def _codebook_table(codebook, mode: str, stats: CodingStats) -> DecodeTable:
+    """
+    Returns the decode table of serialized code lengths from the cache, building it on a miss.
+    """
+    key = (mode, bytes(codebook))
+    table = DECODE_TABLES.get(key)
+    if table is not None:
+        stats.cache_hits += 1
+        return table
+
+    stats.cache_misses += 1
+    lengths, end = deserialize_codebook(codebook)
+    if end != len(codebook):
+        raise ValueError("Invalid compressed data: Corrupted codebook.")
+    if mode == MODE_BYTES:
+        if max(lengths) > 255:
+            raise ValueError("Invalid compressed data: Symbol out of byte range.")
+        table = DecodeTable(canonical_codes(lengths), lambda byte: bytes([byte]))
+    else:
+        table = DecodeTable(canonical_codes(lengths), lambda symbol: chr(symbol).encode("utf-8"))
+    DECODE_TABLES.put(key, table)
+    return table
+
+
+def codebook_end(body) -> int:
+    """
+    Returns the offset just past the code lengths at the start of a BLOCK_HUFFMAN body.
+    """
+    return deserialize_codebook(body)[1]
+
+
+def decode_block(body, mode: str = MODE_TEXT, stats: CodingStats = None, codebook=None) -> bytearray:
+    """
+    Decompresses a frame body written by `encode_block`, into UTF-8 bytes in text mode.
+
+    Args:
+        stats: Per-block stats to fill in
+        codebook: For a BLOCK_REPEAT body, the serialized code lengths of the
+                  BLOCK_HUFFMAN block it reuses
+    """
+    count_symbols = stats is not None
+    if stats is None:
+        stats = CodingStats("decompress")
+    start = time.perf_counter()
+
+    if codebook is None:
+        offset = codebook_end(body)
+        codebook = body[:offset]
+    else:
+        offset = 0
+    decoded_size, offset = read_varint(body, offset)
+    bit_count, offset = read_varint(body, offset)
+    start = stats.add_time("header_parse", start)
+
+    table = _codebook_table(codebook, mode, stats)
+    start = stats.add_time("table_build", start)
+
+    decoded = table.decode(memoryview(body)[offset:], bit_count, output_size=decoded_size)
+    if len(decoded) != decoded_size:
+        raise ValueError("Invalid compressed data: Decoded size does not match the block header.")
+    stats.add_time("decode", start)
+
+    stats.blocks += 1
+    if count_symbols:
+        stats.symbols += len(decoded) if mode == MODE_BYTES else len(str(decoded, "utf-8"))
+    stats.max_code_length = max(stats.max_code_length, table.max_length)
+    stats.payload_bytes += len(body) - offset
+    return decoded
+
+
+def decode_dictionary_block(body, dictionaries: dict, mode: str = MODE_TEXT, stats: CodingStats = None) -> bytearray:
+    """
+    Decompresses a frame body written by `encode_dictionary_block`.
+
+    Args:
+        dictionaries: Mapping of dictionary ID -> `Dictionary`
+    """
+    count_symbols = stats is not None
+    if stats is None:
+        stats = CodingStats("decompress")
+    start = time.perf_counter()
+
+    dictionary_id, offset = read_varint(body, 0)
+    dictionary = (dictionaries or {}).get(dictionary_id)
+    if dictionary is None:
+        raise ValueError(f"Dictionary {dictionary_id:08x} is needed to decode this data")
+    if dictionary.mode != mode:
+        raise ValueError(f"Dictionary {dictionary_id:08x} does not match the stream mode")
+
+    decoded_size, offset = read_varint(body, offset)
+    bit_count, offset = read_varint(body, offset)
+    escape_count, offset = read_varint(body, offset)
+    if escape_count > decoded_size:
+        raise ValueError("Invalid compressed data: Too many escaped symbols.")
+
+    escapes = []
+    escape_offset = 0
+    for _ in range(escape_count):
+        delta, offset = read_varint(body, offset)
+        symbol, offset = read_varint(body, offset)
+        escape_offset += delta
+        try:
+            piece = bytes([symbol]) if mode == MODE_BYTES else chr(symbol).encode("utf-8")
+        except (ValueError, OverflowError):
+            raise ValueError("Invalid compressed data: Escaped symbol out of range.") from None
+        escapes.append((escape_offset, piece))
+    start = stats.add_time("header_parse", start)
+
+    table, hit = dictionary.decode_table()
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+    start = stats.add_time("table_build", start)
+
+    coded_size = decoded_size - sum(len(piece) for _, piece in escapes)
+    decoded = table.decode(memoryview(body)[offset:], bit_count, output_size=coded_size) if bit_count else bytearray()
+    if len(decoded) != coded_size:
+        raise ValueError("Invalid compressed data: Decoded size does not match the block header.")
+
+    if escapes:
+        out = bytearray()
+        taken = 0
+        for escape_offset, piece in escapes:
+            if escape_offset < len(out):
+                raise ValueError("Invalid compressed data: Overlapping escaped symbols.")
+            end = taken + escape_offset - len(out)
+            out += decoded[taken:end]
+            out += piece
+            taken = end
+        out += decoded[taken:]
+        if len(out) != decoded_size:
+            raise ValueError("Invalid compressed data: Escaped symbols past the end of the block.")
+        decoded = out
+    stats.add_time("decode", start)
+
+    stats.blocks += 1
+    if count_symbols:
+        stats.symbols += len(decoded) if mode == MODE_BYTES else len(str(decoded, "utf-8"))
+    stats.distinct_symbols = max(stats.distinct_symbols, len(dictionary.lengths))
+    stats.max_code_length = max(stats.max_code_length, table.max_length)
+    stats.payload_bytes += len(body) - offset
+    return decoded
+
+
+def decode_stored_block(body, mode: str = MODE_TEXT, stats: CodingStats = None) -> bytearray:
+    """
+    Returns the block held by a BLOCK_STORED body, copied in one go: no table
+    is built and nothing is decoded symbol by symbol.
+    """
+    if stats is None:
+        return bytearray(body)
+    start = time.perf_counter()
+    decoded = bytearray(body)
+    stats.add_time("decode", start)
+
+    stats.blocks += 1
+    stats.stored_blocks += 1
+    stats.payload_bytes += len(body)
+    stats.symbols += len(body) if mode == MODE_BYTES else len(str(body, "utf-8"))
+    return decoded
+
+
+def decode_frame(block_type: int, body, mode: str = MODE_TEXT, dictionaries: dict = None,
+                 stats: CodingStats = None, codebook=None, checksum: bool = False,
+                 pipeline: Pipeline = None) -> bytearray:
+    """
+    Decompresses a frame body of any block type.
+
+    Args:
+        codebook: Serialized code lengths reused by a BLOCK_REPEAT body, see `link_codebooks`
+        checksum: The body ends with the CRC-32 of the decoded block, which is checked
+        pipeline: Stages of a stream with FLAG_PIPELINE, undone in reverse
+                  order on every block that is not stored raw
+    """
+    if checksum:
+        if len(body) < CRC_SIZE:
+            raise ValueError("Invalid compressed data: Truncated block checksum.")
+        expected = int.from_bytes(body[-CRC_SIZE:], "big")
+        decoded = decode_frame(block_type, body[:-CRC_SIZE], mode, dictionaries, stats, codebook, pipeline=pipeline)
+        if zlib.crc32(decoded) != expected:
+            raise ValueError("Invalid compressed data: Block checksum mismatch.")
+        return decoded
+
+    if block_type == BLOCK_STORED:
+        return decode_stored_block(body, mode, stats)
+    if pipeline:
+        decoded = decode_frame(block_type, body, MODE_BYTES, dictionaries, stats, codebook)
+        start = time.perf_counter()
+        decoded = bytearray(pipeline.inverse(decoded))
+        if stats is not None:
+            stats.add_time("transform", start)
+        return decoded
+    if block_type == BLOCK_CONTEXT:
+        return decode_context_block(body, stats)
+    if block_type == BLOCK_HUFFMAN:
+        return decode_block(body, mode, stats)
+    if block_type == BLOCK_DICTIONARY:
+        return decode_dictionary_block(body, dictionaries, mode, stats)
+    if block_type == BLOCK_REPEAT:
+        if codebook is None:
+            raise ValueError("Invalid compressed data: Repeated codebook without an earlier one.")
+        return decode_block(body, mode, stats, codebook)
+    raise ValueError(f"Invalid compressed data: Unknown block type {block_type}.")
+
+
+def decode_frame_with_stats(frame: tuple, mode: str = MODE_TEXT, dictionaries: dict = None,
+                            checksum: bool = False, pipeline: Pipeline = None) -> tuple[bytearray, CodingStats]:
+    """
+    Like `decode_frame` on a (block type, body, codebook) tuple, also returning
+    the stats of the block so they can come back from a worker process.
+    """
+    stats = CodingStats("decompress")
+    return decode_frame(frame[0], frame[1], mode, dictionaries, stats, frame[2], checksum, pipeline), stats
+
+
+def check_frame(frame: tuple, mode: str = MODE_TEXT, dictionaries: dict = None,
+                checksum: bool = False, pipeline: Pipeline = None) -> tuple[int, int]:
+    """
+    Decodes a (block type, body, codebook) tuple only to check it, keeping
+    nothing of the output but its CRC-32 and length, which is all a worker
+    process needs to send back.
+
+    Returns:
+        The CRC-32 and the length of the decoded block
+    """
+    decoded = decode_frame(frame[0], frame[1], mode, dictionaries, codebook=frame[2], checksum=checksum,
+                           pipeline=pipeline)
+    return zlib.crc32(decoded), len(decoded)
+
+
+def link_codebooks(frames):
+    """
+    Pairs every BLOCK_REPEAT frame with the code lengths it reuses, those of
+    the last BLOCK_HUFFMAN frame before it. Other block types leave them unchanged.
+
+    Yields:
+        (block type, body, codebook), codebook being None except for BLOCK_REPEAT
+    """
+    last_body = None
+    codebook = None
+    for block_type, body in frames:
+        if block_type == BLOCK_HUFFMAN:
+            last_body = body
+            codebook = None
+        elif block_type == BLOCK_REPEAT:
+            if codebook is None and last_body is not None:
+                codebook = bytes(last_body[:codebook_end(last_body)])
+            yield block_type, body, codebook
+            continue
+        yield block_type, body, None
+
+
+class BufferReader:
+    """
+    File-like reader over a bytes-like object whose reads return zero-copy
+    memoryview slices, so blocks can be decoded straight from a memory map.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self._position = 0
+
+
+    def read(self, size: int = -1) -> memoryview:
+        end = len(self._view) if size < 0 else min(self._position + size, len(self._view))
+        chunk = self._view[self._position:end]
+        self._position = end
+        return chunk
+
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        base = (0, self._position, len(self._view))[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+
+    def tell(self) -> int:
+        return self._position
+
+
+@contextlib.contextmanager
+def mapped_file(path: str):
+    """
+    Maps a non-empty file read-only and yields a memoryview of the mapping.
+    Views taken from it must be released before the context exits.
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        try:
+            yield view
+        finally:
+            try:
+                view.release()
+                mapping.close()
+            except BufferError:
+                # Views are still referenced, usually by the traceback of a decoding
+                # error; the mapping is closed once they are collected.
+                pass
+
+
+def _read_stream_varint(src) -> int:
+    value = 0
+    shift = 0
+    while True:
+        byte = src.read(1)
+        if not byte:
+            raise ValueError("Invalid compressed data: Truncated frame header.")
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def is_stream_header(header: bytes) -> bool:
+    """
+    Tells whether `header` starts like a block stream.
+    """
+    return len(header) > len(MAGIC) and header[:len(MAGIC)] == MAGIC and header[len(MAGIC)] == STREAM_VERSION
+
+
+def stream_header(mode: str = MODE_TEXT, checksums: bool = False, pipeline: Pipeline = None) -> bytes:
+    """
+    Returns the magic, version and flags that open a stream, followed by the
+    stages of the pipeline when there is one (see `Pipeline.serialize`).
+    """
+    flags = ((FLAG_BYTES if mode == MODE_BYTES else 0) | (FLAG_CHECKSUMS if checksums else 0) |
+             (FLAG_PIPELINE if pipeline else 0))
+    return MAGIC + bytes([STREAM_VERSION, flags]) + (pipeline.serialize() if pipeline else b"")
+
+
+def read_stream_info(src) -> tuple[str, bool, Pipeline]:
+    """
+    Reads and checks the magic, version, flags and pipeline at the start of a stream.
+
+    Returns:
+        The symbol mode of the stream, whether it has checksums and its
+        pipeline (None when blocks are coded as they are)
+    """
+    header = src.read(len(MAGIC) + 1)
+    if len(header) < len(MAGIC) + 1 or header[:len(MAGIC)] != MAGIC:
+        raise ValueError("Invalid compressed data: Missing stream header.")
+    if header[-1] != STREAM_VERSION:
+        raise ValueError(f"Unsupported compressed data version: {header[-1]}")
+
+    flags = src.read(1)
+    if not flags:
+        raise ValueError("Invalid compressed data: Missing stream header.")
+    pipeline = None
+    if flags[0] & FLAG_PIPELINE:
+        pipeline = Pipeline.from_ids([_read_stream_varint(src) for _ in range(_read_stream_varint(src))])
+    return MODE_BYTES if flags[0] & FLAG_BYTES else MODE_TEXT, bool(flags[0] & FLAG_CHECKSUMS), pipeline
+
+
+def read_stream_header(src) -> str:
+    """
+    Like `read_stream_info`, returning the symbol mode of the stream only.
+    """
+    return read_stream_info(src)[0]
+
+
+def read_stream_checksum(src) -> int:
+    """
+    Reads the CRC-32 of the whole decoded data that follows the end marker of a stream with checksums.
+    """
+    crc = src.read(CRC_SIZE)
+    if len(crc) != CRC_SIZE:
+        raise ValueError("Invalid compressed data: Missing stream checksum.")
+    return int.from_bytes(crc, "big")
+
+
+def check_stream_checksum(src, crc: int) -> None:
+    if read_stream_checksum(src) != crc:
+        raise ValueError("Invalid compressed data: Stream checksum mismatch.")
+
+
+def write_frame(block_type: int, body: bytes) -> bytes:
+    """
+    Returns a frame: the block type, the body length (varint) and the body.
+    """
+    return bytes([block_type]) + write_varint(len(body)) + body
+
+
+def read_frames(src):
+    """
+    Reads the frames of a stream whose header was already consumed, up to the end marker.
+
+    Yields:
+        (block type, body) for every block
+    """
+    while True:
+        block_type = src.read(1)
+        if not block_type:
+            raise ValueError("Invalid compressed data: Missing end of stream marker.")
+        if block_type[0] == BLOCK_END:
+            return
+        if block_type[0] not in BLOCK_TYPES:
+            raise ValueError(f"Invalid compressed data: Unknown block type {block_type[0]}.")
+
+        body_length = _read_stream_varint(src)
+        body = src.read(body_length)
+        if len(body) != body_length:
+            raise ValueError("Invalid compressed data: Truncated block.")
+        yield block_type[0], body
+
+
+def read_blocks(src, block_size: int):
+    """
+    Yields successive blocks of at most `block_size` characters (or bytes) from a file object.
+    """
+    if block_size < 1:
+        raise ValueError("Block size must be positive")
+
+    while True:
+        text = src.read(block_size)
+        if not text:
+            return
+        yield text
+
+
+class StreamWriter:
+    """
+    Frames encoded blocks one at a time, keeping the block index until the end.
+
+    With checksums, every frame body ends with the CRC-32 of its decoded
+    block, and the CRC-32 of the whole decoded data follows the end marker.
+    It is combined from the block checksums, so the data is never read twice.
+
+    After the end marker comes the block index: the number of blocks, then
+    for every block its offset in the decoded data, the offset of its frame
+    in the stream and the frame length, then the total decoded size (all
+    varints). A stream with a single block leaves out its entry, the frame
+    being all that lies between the header and the end marker. The trailer
+    is the length of the index as a varint with its bytes reversed, so it
+    can be read backwards from the end, then INDEX_MAGIC.
+    """
+
+    def __init__(self, mode: str = MODE_TEXT, checksums: bool = False, pipeline: Pipeline = None):
+        self.mode = mode
+        self.checksums = checksums
+        self.pipeline = pipeline
+        self.offset = 0
+        self.decoded_offset = 0
+        self.crc = 0
+        self._index = bytearray()
+        self._count = 0
+
+
+    def resume(self, entries: list, decoded_size: int, offset: int, crc: int = 0) -> None:
+        """
+        Continues an existing stream instead of starting a new one.
+
+        Args:
+            entries: The block index of the stream, as returned by `read_index`
+            decoded_size: Total decoded size of the stream
+            offset: Offset of the end marker, where the next frame goes
+            crc: CRC-32 of the decoded data of a stream with checksums
+        """
+        self.offset = offset
+        self.decoded_offset = decoded_size
+        self.crc = crc
+        self._index = bytearray()
+        for decoded_offset, frame_offset, frame_length in entries:
+            self._index += write_varint(decoded_offset) + write_varint(frame_offset) + write_varint(frame_length)
+        self._count = len(entries)
+
+
+    def header(self) -> bytes:
+        header = stream_header(self.mode, self.checksums, self.pipeline)
+        self.offset += len(header)
+        return header
+
+
+    def frame(self, block_type: int, body: bytes, decoded_size: int) -> bytes:
+        """
+        Returns the frame of the next block and records it in the index.
+        """
+        frame = write_frame(block_type, body)
+        if self.checksums:
+            self.crc = crc32_combine(self.crc, int.from_bytes(body[-CRC_SIZE:], "big"), decoded_size)
+        self._index += write_varint(self.decoded_offset) + write_varint(self.offset) + write_varint(len(frame))
+        self._count += 1
+        self.offset += len(frame)
+        self.decoded_offset += decoded_size
+        return frame
+
+
+    def end(self) -> bytes:
+        """
+        Returns the end marker followed by the block index and the trailer.
+        """
+        end = bytes([BLOCK_END]) + (self.crc.to_bytes(CRC_SIZE, "big") if self.checksums else b"")
+        index = (write_varint(self._count) + (self._index if self._count != 1 else b"") +
+                 write_varint(self.decoded_offset))
+        return end + index + write_varint(len(index))[::-1] + INDEX_MAGIC
+
+
+def write_stream(blocks, mode: str = MODE_TEXT, checksums: bool = False, pipeline: Pipeline = None):
+    """
+    Frames encoded blocks into a complete stream with `StreamWriter`.
+
+    Args:
+        blocks: Iterable of (block type, frame body, decoded size)
+        mode: Symbol mode recorded in the stream header
+        checksums: The bodies end with block checksums, see `StreamWriter`
+        pipeline: Stages the blocks went through, recorded in the stream header
+
+    Yields:
+        The stream header, one frame per block, then the end marker with the index and trailer
+    """
+    writer = StreamWriter(mode, checksums, pipeline)
+    yield writer.header()
+    for block_type, body, decoded_size in blocks:
+        yield writer.frame(block_type, body, decoded_size)
+    yield writer.end()
+
+
+def read_index(src) -> tuple[list, int]:
+    """
+    Reads the block index of a seekable binary stream.
+
+    Returns:
+        A list of (decoded offset, frame offset, frame length) per block and
+        the total decoded size
+    """
+    src.seek(0, 2)
+    size = src.tell()
+    if size < 2:
+        raise ValueError("Invalid compressed data: Missing block index.")
+
+    # The index length is a varint stored backwards just before the magic.
+    src.seek(max(0, size - 11))
+    tail = src.read()
+    if tail[-1:] != INDEX_MAGIC:
+        raise ValueError("Invalid compressed data: Missing block index.")
+    length_bytes = bytearray()
+    for byte in reversed(tail[:-1]):
+        length_bytes.append(byte)
+        if not byte & 0x80:
+            break
+    else:
+        raise ValueError("Invalid compressed data: Corrupted block index.")
+    index_length, _ = read_varint(length_bytes, 0)
+    index_offset = size - len(INDEX_MAGIC) - len(length_bytes) - index_length
+    if index_offset < 0:
+        raise ValueError("Invalid compressed data: Corrupted block index.")
+    src.seek(index_offset)
+    data = src.read(index_length)
+
+    count, offset = read_varint(data, 0)
+    entries = []
+    if count == 1:
+        # The only frame lies between the header and the end marker.
+        src.seek(0)
+        _, checksums, _ = read_stream_info(src)
+        frame_offset = src.tell()
+        end_offset = index_offset - 1 - (CRC_SIZE if checksums else 0)
+        if end_offset <= frame_offset:
+            raise ValueError("Invalid compressed data: Corrupted block index.")
+        entries.append((0, frame_offset, end_offset - frame_offset))
+    else:
+        for _ in range(count):
+            decoded_offset, offset = read_varint(data, offset)
+            frame_offset, offset = read_varint(data, offset)
+            frame_length, offset = read_varint(data, offset)
+            entries.append((decoded_offset, frame_offset, frame_length))
+    total_size, offset = read_varint(data, offset)
+    if offset != index_length:
+        raise ValueError("Invalid compressed data: Corrupted block index.")
+    return entries, total_size
+
+
+def read_range(path: str, start: int, length: int, dictionaries: dict = None) -> bytes:
+    """
+    Decodes `length` bytes of the original data starting at byte `start`,
+    reading only the blocks that cover the range.
+
+    Args:
+        path: Path to a compressed file with a block index
+        start: Offset in the decoded data, in bytes
+        length: Number of bytes to return, fewer if the data ends first
+        dictionaries: Mapping of dictionary ID -> `Dictionary` for blocks coded with one
+    """
+    if start < 0 or length < 0:
+        raise ValueError("Range start and length must not be negative")
+
+    with open(path, "rb") as src:
+        mode, checksums, pipeline = read_stream_info(src)
+        entries, total_size = read_index(src)
+
+        end = min(start + length, total_size)
+        if start >= end:
+            return b""
+
+        offsets = [decoded_offset for decoded_offset, _, _ in entries]
+        first = bisect.bisect_right(offsets, start) - 1
+        codebook = None
+        out = bytearray()
+        for block in range(first, len(entries)):
+            decoded_offset, frame_offset, frame_length = entries[block]
+            if decoded_offset >= end:
+                break
+
+            block_type, body = _read_indexed_frame(src, frame_offset, frame_length)
+            if block_type == BLOCK_HUFFMAN:
+                codebook = None
+            elif block_type == BLOCK_REPEAT and codebook is None:
+                codebook = _previous_codebook(src, entries, block)
+            decoded = decode_frame(block_type, body, mode, dictionaries, codebook=codebook, checksum=checksums,
+                                   pipeline=pipeline)
+            if block_type == BLOCK_HUFFMAN:
+                codebook = bytes(body[:codebook_end(body)])
+            out += decoded[max(0, start - decoded_offset):end - decoded_offset]
+
+        return bytes(out)
+
+
+def resume_stream(dst) -> tuple[StreamWriter, bytes]:
+    """
+    Prepares a complete stream, open for reading and writing, for more
+    blocks: reads its header, block index and checksum, then seeks to its end
+    marker so that new frames replace the end marker, index and trailer.
+    Only the index is read, never the frames, except for looking back to the
+    last block with its own code lengths.
+
+    Returns:
+        A `StreamWriter` continuing the stream, with its mode, checksums and
+        pipeline, and the code lengths of the last BLOCK_HUFFMAN frame (None
+        when there is none)
+    """
+    dst.seek(0)
+    mode, checksums, pipeline = read_stream_info(dst)
+    header_size = dst.tell()
+    entries, total_size = read_index(dst)
+
+    end = entries[-1][1] + entries[-1][2] if entries else header_size
+    dst.seek(end)
+    if dst.read(1) != bytes([BLOCK_END]):
+        raise ValueError("Invalid compressed data: Missing end of stream marker.")
+    crc = read_stream_checksum(dst) if checksums else 0
+
+    writer = StreamWriter(mode, checksums, pipeline)
+    writer.resume(entries, total_size, end, crc)
+    codebook = _previous_codebook(dst, entries, len(entries))
+    dst.seek(end)
+    return writer, codebook
+
+
+def _read_indexed_frame(src, frame_offset: int, frame_length: int) -> tuple[int, bytes]:
+    src.seek(frame_offset)
+    frame = src.read(frame_length)
+    block_type, body = next(read_frames(io.BytesIO(frame)), (None, None))
+    if body is None:
+        raise ValueError("Invalid compressed data: Block index points past a block.")
+    return block_type, body
+
+
+def _previous_codebook(src, entries: list, block: int):
+    """
+    Returns the code lengths of the last BLOCK_HUFFMAN frame before `block`, or None.
+    """
+    for previous in range(block - 1, -1, -1):
+        _, frame_offset, frame_length = entries[previous]
+        src.seek(frame_offset)
+        if src.read(1)[0] == BLOCK_HUFFMAN:
+            block_type, body = _read_indexed_frame(src, frame_offset, frame_length)
+            return bytes(body[:codebook_end(body)])
+    return None
+
+
+def compress_stream(src, block_size: int = DEFAULT_BLOCK_SIZE, mode: str = MODE_TEXT,
+                    stats: CodingStats = None, hook=None, dictionary=None, adaptive: bool = False,
+                    max_code_length: int = None, checksums: bool = False, pipeline: Pipeline = None):
+    """
+    Compresses a file object block by block.
+
+    Every block gets its own code lengths (or reuses the previous ones in
+    adaptive mode), so memory use depends on the block size only, never on
+    the size of the input.
+
+    Args:
+        src: File-like object, opened in text mode for MODE_TEXT and in binary mode for MODE_BYTES
+        block_size: Characters (or bytes) read per block
+        mode: MODE_TEXT or MODE_BYTES
+        stats: Totals to add the stats of every block to
+        hook: Optional `StatsHook` told about every block
+        dictionary: Shared `Dictionary` to code the blocks with instead of their own codebooks
+        adaptive: Let `AdaptiveEncoder` choose between a new codebook, the
+                  previous one or storing every block raw
+        max_code_length: Longest code allowed, at most MAX_CODE_LENGTH_LIMIT so
+                         that every code decodes in one or two table lookups
+        checksums: Store the CRC-32 of every block and of the whole data, see `StreamWriter`
+        pipeline: Transform stages to run every block through, recorded in
+                  the stream header, see `encode_transformed_frame`
+
+    Yields:
+        The stream header, one frame per block and the end marker with the block index, as bytes
+    """
+    yield from write_stream(encode_blocks(src, block_size, mode, stats, hook, dictionary, adaptive, max_code_length,
+                                          checksums, pipeline=pipeline), mode, checksums, pipeline)
+
+
+def encode_blocks(src, block_size: int = DEFAULT_BLOCK_SIZE, mode: str = MODE_TEXT, stats: CodingStats = None,
+                  hook=None, dictionary=None, adaptive: bool = False, max_code_length: int = None,
+                  checksums: bool = False, encoder: AdaptiveEncoder = None, pipeline: Pipeline = None):
+    """
+    Reads and encodes the blocks of a file object lazily, see `compress_stream` for the arguments.
+
+    Args:
+        encoder: `AdaptiveEncoder` to plan the blocks with in adaptive mode,
+                 a new one by default
+
+    Returns:
+        An iterator of (block type, frame body, decoded size) for `StreamWriter.frame`
+    """
+    check_encoding_options(dictionary, adaptive, max_code_length, pipeline)
+
+    collect = stats is not None or hook is not None
+    reads = read_blocks(src, block_size)
+    if collect:
+        reads = timed(reads, stats or CodingStats("compress"), "read")
+
+    if adaptive:
+        encode = encode_planned_with_stats if collect else encode_planned
+        planned = plan_blocks(reads, encoder or AdaptiveEncoder(mode, max_code_length), stats)
+        blocks = (encode(data, plan, mode, checksum=checksums) for data, plan in planned)
+    else:
+        encode = encode_frame_with_stats if collect else encode_frame
+        blocks = (encode(data, mode, dictionary, max_code_length=max_code_length, checksum=checksums,
+                         pipeline=pipeline) for data in reads)
+
+    if collect:
+        blocks = collect_block_stats(blocks, stats, hook)
+    return blocks
+
+
+def decompress_stream(src, stats: CodingStats = None, hook=None, dictionaries: dict = None):
+    """
+    Decompresses a stream written by `compress_stream`, one block at a time.
+    The checksums of streams that have them are checked, and ValueError is
+    raised at the first block that does not match.
+
+    Args:
+        src: File-like object opened in binary mode
+        stats: Totals to add the stats of every block to
+        hook: Optional `StatsHook` told about every block
+        dictionaries: Mapping of dictionary ID -> `Dictionary` for blocks coded with one
+
+    Yields:
+        The bytes of every block, UTF-8 encoded for text streams
+    """
+    mode, checksums, pipeline = read_stream_info(src)
+    crc = 0
+
+    if stats is None and hook is None:
+        for block_type, body, codebook in link_codebooks(read_frames(src)):
+            decoded = decode_frame(block_type, body, mode, dictionaries, codebook=codebook, checksum=checksums,
+                                   pipeline=pipeline)
+            if checksums:
+                crc = zlib.crc32(decoded, crc)
+            yield decoded
+    else:
+        for frame in link_codebooks(timed(read_frames(src), stats or CodingStats("decompress"), "read")):
+            decoded, block_stats = decode_frame_with_stats(frame, mode, dictionaries, checksums, pipeline)
+            if checksums:
+                crc = zlib.crc32(decoded, crc)
+            yield from collect_decoded_stats([(decoded, block_stats)], stats, hook)
+
+    if checksums:
+        check_stream_checksum(src, crc)
+
+
+def verify_stream(src, dictionaries: dict = None) -> int:
+    """
+    Decodes a stream written by `compress_stream` without keeping the output,
+    checking its checksums when it has them.
+
+    Args:
+        src: File-like object opened in binary mode
+        dictionaries: Mapping of dictionary ID -> `Dictionary` for blocks coded with one
+
+    Returns:
+        The size of the decoded data
+    """
+    mode, checksums, pipeline = read_stream_info(src)
+    checks = (check_frame(frame, mode, dictionaries, checksums, pipeline) for frame in link_codebooks(read_frames(src)))
+    return combine_checks(src, checks, checksums)
+
+
+def combine_checks(src, checks, checksums: bool) -> int:
+    """
+    Combines the (CRC-32, length) of every block returned by `check_frame`
+    and compares the result with the stream checksum that follows the end marker.
+
+    Returns:
+        The size of the decoded data
+    """
+    crc = 0
+    size = 0
+    for block_crc, length in checks:
+        crc = crc32_combine(crc, block_crc, length)
+        size += length
+    if checksums:
+        check_stream_checksum(src, crc)
+    return size
+
+
+def collect_decoded_stats(blocks, stats: CodingStats = None, hook=None):
+    """
+    Strips the stats from (decoded bytes, stats) pairs, adding them to `stats`
+    and passing them to `hook.on_block`.
+    """
+    for decoded, block_stats in blocks:
+        if stats is not None:
+            stats.merge(block_stats)
+        if hook is not None:
+            hook.on_block(block_stats)
+        yield decoded
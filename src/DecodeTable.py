@@ -0,0 +1,312 @@
+import sys
+from array import array
+
+DEFAULT_TABLE_BITS = 12
+MAX_TABLE_BITS = 25     # a 32-bit window starts up to 7 bits into its first byte
+
+# Payload bytes decoded between two progress reports.
+SEGMENT_BYTES = 1 << 16
+
+
+def _windows(data, start: int, end: int) -> array:
+    """
+    Returns, for every byte offset in [start, end), the big-endian 32-bit word
+    starting at that offset, reading zeros past the end of data.
+    """
+    count = min(end, len(data)) - start
+    padded = bytes(data[start:start + count + 3]) + b"\0\0\0"
+    interleaved = bytearray(4 * count)
+    for shift in range(4):
+        interleaved[shift::4] = padded[shift:shift + count]
+
+    words = array("I")
+    words.frombytes(interleaved)
+    if sys.byteorder == "little":
+        words.byteswap()
+    return words
+
+
+def _peek(data, position: int, count: int) -> int:
+    """
+    Returns `count` bits of data starting at bit `position`, reading zeros past the end.
+    """
+    first = position >> 3
+    size = ((position & 7) + count + 7) >> 3
+    chunk = bytes(data[first:first + size]).ljust(size, b"\0")
+    return (int.from_bytes(chunk, "big") >> (size * 8 - (position & 7) - count)) & ((1 << count) - 1)
+
+
+def _build_level(codes: list, bits: int) -> tuple[list, dict]:
+    """
+    Builds one level of the lookup table.
+
+    Args:
+        codes: List of (piece, code, length) with codes relative to this level
+        bits: Number of bits indexed by this level
+
+    Returns:
+        A list with a (piece, length) entry per index, or None where the code
+        continues in a sub-table, and a dict of index -> (bits, entries, links)
+    """
+    entries = [None] * (1 << bits)
+    long_codes = {}
+
+    for piece, code, length in codes:
+        if length <= bits:
+            start = code << (bits - length)
+            for index in range(start, start + (1 << (bits - length))):
+                entries[index] = (piece, length)
+        else:
+            rest = length - bits
+            long_codes.setdefault(code >> rest, []).append((piece, code & ((1 << rest) - 1), rest))
+
+    links = {}
+    for prefix, group in long_codes.items():
+        sub_bits = min(bits, max(length for _, _, length in group))
+        sub_entries, sub_links = _build_level(group, sub_bits)
+        links[prefix] = (sub_bits, sub_entries, sub_links)
+
+    return entries, links
+
+
+def _depth(links: dict) -> int:
+    return 1 + max((_depth(sub_links) for _, _, sub_links in links.values()), default=0)
+
+
+class DecodeTable:
+    """
+    Lookup table that decodes a Huffman payload several bits at a time.
+
+    Each root entry stores the output bytes of every symbol whose code fits
+    completely inside the window together with the number of bits they use,
+    so one lookup usually emits more than one symbol. Codes longer than the
+    window continue in sub-tables.
+
+    Attributes:
+        bits: Number of bits resolved by one root lookup
+        min_length: Length of the shortest code
+        max_length: Length of the longest code
+        max_lookups: Most table lookups any code takes, 2 at most when
+                     `max_length` is no more than twice `bits`
+    """
+
+    def __init__(self, codes: dict, symbol_bytes, bits: int = DEFAULT_TABLE_BITS):
+        """
+        Args:
+            codes: Mapping of symbol -> (code, length), with the code as an int
+            symbol_bytes: Function returning the decoded bytes of a symbol
+            bits: Maximum number of bits resolved by one root lookup
+        """
+        if not codes:
+            raise ValueError("Cannot build a decode table without codes")
+        if not 1 <= bits <= MAX_TABLE_BITS:
+            raise ValueError(f"Table bits must be between 1 and {MAX_TABLE_BITS}")
+
+        pieces = [(symbol_bytes(symbol), code, length) for symbol, (code, length) in codes.items()]
+        self.min_length = min(length for _, _, length in pieces)
+        self.max_length = max(length for _, _, length in pieces)
+        self.max_piece_size = max(len(piece) for piece, _, _ in pieces)
+        self.bits = bits
+
+        self._single, self._links = _build_level(pieces, self.bits)
+        self.max_lookups = _depth(self._links)
+        self._entries = self._build_multi_entries()
+
+
+    def _build_multi_entries(self) -> list:
+        """
+        Extends every root entry with the symbols that follow the first one
+        inside the same window.
+        """
+        bits = self.bits
+        mask = (1 << bits) - 1
+        single = self._single
+        entries = []
+
+        for index in range(1 << bits):
+            entry = single[index]
+            if entry is None:
+                entries.append((b"", 0, 0))
+                continue
+
+            piece, used = entry
+            pieces = [piece]
+            while used < bits:
+                following = single[(index << used) & mask]
+                if following is None or used + following[1] > bits:
+                    break
+                pieces.append(following[0])
+                used += following[1]
+
+            piece = b"".join(pieces)
+            entries.append((piece, len(piece), used))
+
+        return entries
+
+
+    def _decode_long(self, window: int) -> tuple[bytes, int]:
+        """
+        Resolves a code that does not fit in the root window.
+
+        Args:
+            window: The next `max(bits, max_length)` bits of the payload
+
+        Returns:
+            The decoded bytes and the code length
+        """
+        bits, entries, links = self.bits, self._single, self._links
+        window_bits = max(bits, self.max_length)
+        used = 0
+
+        while True:
+            index = (window >> (window_bits - used - bits)) & ((1 << bits) - 1)
+            entry = entries[index]
+            if entry is not None:
+                return entry[0], used + entry[1]
+
+            link = links.get(index)
+            if link is None:
+                raise ValueError("Invalid compressed data: Unknown Huffman code.")
+            used += bits
+            bits, entries, links = link
+
+
+    def decode(self, data, bit_count: int, progress_callback=None, output_size: int = None) -> bytearray:
+        """
+        Decodes `bit_count` bits of `data` into a preallocated output buffer,
+        raising ValueError instead of writing past `output_size`.
+
+        Args:
+            data: Bytes-like object with the encoded payload
+            bit_count: Number of meaningful bits at the start of `data`
+            progress_callback: Optional function to report progress (0-100)
+            output_size: Exact size of the decoded data, when it is known
+
+        Returns:
+            The decoded bytes
+        """
+        if bit_count > len(data) * 8:
+            raise ValueError("Invalid compressed data: Payload is truncated.")
+
+        bits = self.bits
+        mask = (1 << bits) - 1
+        base = 32 - bits
+        entries = self._entries
+
+        if output_size is None:
+            # Every code is at least `min_length` bits long, which bounds the output size.
+            output_size = (bit_count // self.min_length) * self.max_piece_size
+        out = bytearray(output_size)
+        out_pos = 0
+        position = 0
+        last_window = bit_count - bits  # last position where a whole window is payload
+
+        while position <= last_window:
+            start = position >> 3
+            windows = _windows(data, start, start + SEGMENT_BYTES)
+            end = min(len(windows) * 8, last_window - start * 8 + 1)
+            p = position - start * 8
+            pieces = []
+            append = pieces.append
+
+            while p < end:
+                piece, size, used = entries[(windows[p >> 3] >> (base - (p & 7))) & mask]
+                if not used:
+                    piece, used = self._decode_long(_peek(data, start * 8 + p, max(bits, self.max_length)))
+                    if start * 8 + p + used > bit_count:
+                        raise ValueError("Invalid compressed data: Payload is truncated.")
+                append(piece)
+                p += used
+
+            position = start * 8 + p
+            piece = b"".join(pieces)
+            if out_pos + len(piece) > output_size:
+                raise ValueError("Invalid compressed data: Decoded data is larger than recorded.")
+            out[out_pos:out_pos + len(piece)] = piece
+            out_pos += len(piece)
+
+            if progress_callback:
+                progress_callback(int((position / bit_count) * 100))
+
+        # Fewer bits than the window are left, decode them one symbol at a time.
+        while position < bit_count:
+            entry = self._single[_peek(data, position, bits)]
+            if entry is None or position + entry[1] > bit_count:
+                raise ValueError("Invalid compressed data: Payload is truncated.")
+            if out_pos + len(entry[0]) > output_size:
+                raise ValueError("Invalid compressed data: Decoded data is larger than recorded.")
+            out[out_pos:out_pos + len(entry[0])] = entry[0]
+            out_pos += len(entry[0])
+            position += entry[1]
+
+        if progress_callback:
+            progress_callback(100)
+
+        del out[out_pos:]
+        return out
+
+
+class ContextDecodeTable:
+    """
+    Lookup table for payloads coded with one codebook per class of previous
+    byte (order-1 context coding). Each symbol picks the table of the next
+    one, so symbols are decoded one at a time, and every code must fit in
+    `bits` so that a single lookup resolves it.
+    """
+
+    def __init__(self, class_codes: list, classes: bytes, bits: int = DEFAULT_TABLE_BITS):
+        """
+        Args:
+            class_codes: Mapping of byte -> (code, length) for every class, None for an unused class
+            classes: Class of every previous byte value, 256 bytes
+            bits: Bits resolved by one lookup, at least the longest code
+        """
+        if not 1 <= bits <= MAX_TABLE_BITS:
+            raise ValueError(f"Table bits must be between 1 and {MAX_TABLE_BITS}")
+        self.bits = bits
+        self.max_length = 0
+        size = 1 << bits
+        # Every entry is (byte, code length, start of the table of the next symbol).
+        self._entries = [None] * (size * len(class_codes))
+
+        for index, codes in enumerate(class_codes):
+            base = index * size
+            for byte, (code, length) in (codes or {}).items():
+                if length > bits:
+                    raise ValueError(f"Context codes must be at most {bits} bits long")
+                self.max_length = max(self.max_length, length)
+                entry = (byte, length, classes[byte] * size)
+                start = base + (code << (bits - length))
+                self._entries[start:start + (1 << (bits - length))] = [entry] * (1 << (bits - length))
+
+
+    def decode(self, data, bit_count: int, output_size: int, first_class: int) -> bytearray:
+        """
+        Decodes exactly `output_size` bytes, stopping by count.
+
+        Args:
+            data: Bytes-like object with the encoded payload
+            bit_count: Number of meaningful bits at the start of `data`
+            first_class: Class of the (virtual) byte before the first one
+        """
+        if bit_count > len(data) * 8:
+            raise ValueError("Invalid compressed data: Payload is truncated.")
+        out = bytearray(output_size)
+        if not output_size:
+            return out
+
+        windows = _windows(data, 0, len(data))
+        entries = self._entries
+        shift = 32 - self.bits
+        mask = (1 << self.bits) - 1
+        base = first_class << self.bits
+        position = 0
+        try:
+            for index in range(output_size):
+                out[index], used, base = entries[base + ((windows[position >> 3] >> (shift - (position & 7))) & mask)]
+                position += used
+        except (IndexError, TypeError):
+            raise ValueError("Invalid compressed data: Unknown Huffman code.") from None
+        if position != bit_count:
+            raise ValueError("Invalid compressed data: Payload size does not match the block header.")
+        return out
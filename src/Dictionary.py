@@ -0,0 +1,154 @@
+import zlib
+from collections import Counter
+
+from .Codebook import (canonical_codes, deserialize_codebook, fitting_code_length, limited_code_lengths,
+                       serialize_codebook)
+from .CodebookCache import DECODE_TABLES
+from .Container import FLAG_BYTES, MAX_CODE_LENGTH_LIMIT, MODE_BYTES, MODE_TEXT, byte_histogram
+from .DecodeTable import DecodeTable
+
+DICTIONARY_MAGIC = b"HUFD"
+DICTIONARY_VERSION = 1
+
+
+class Dictionary:
+    """
+    A codebook trained once and shared by many compressed files, which then
+    only store its ID instead of their own code lengths.
+
+    Attributes:
+        mode: MODE_TEXT or MODE_BYTES
+        lengths: Mapping of int symbol (code point or byte value) -> code length
+        dictionary_id: CRC-32 of the serialized dictionary, stored in the blocks coded with it
+    """
+
+    def __init__(self, lengths: dict, mode: str = MODE_TEXT):
+        self.mode = mode
+        self.lengths = lengths
+        self.dictionary_id = zlib.crc32(self._body())
+        self._codes = None
+
+
+    def _body(self) -> bytes:
+        return bytes([DICTIONARY_VERSION, FLAG_BYTES if self.mode == MODE_BYTES else 0]) + \
+               serialize_codebook(self.lengths)
+
+
+    @property
+    def codes(self) -> dict:
+        """
+        Mapping of symbol (a char in text mode, a byte value otherwise) -> (code, length).
+        """
+        if self._codes is None:
+            codes = canonical_codes(self.lengths)
+            self._codes = codes if self.mode == MODE_BYTES else {chr(s): code for s, code in codes.items()}
+        return self._codes
+
+
+    def decode_table(self) -> tuple[DecodeTable, bool]:
+        """
+        Returns the decode table of the dictionary from the process-wide cache,
+        building it on first use, and whether it came from the cache.
+        """
+        def build():
+            if self.mode == MODE_BYTES:
+                return DecodeTable(canonical_codes(self.lengths), lambda byte: bytes([byte]))
+            return DecodeTable(canonical_codes(self.lengths), lambda symbol: chr(symbol).encode("utf-8"))
+
+        return DECODE_TABLES.get_or_build(("dictionary", self.dictionary_id), build)
+
+
+    def __getstate__(self):
+        # Sent to worker processes without the cached codes.
+        return {"mode": self.mode, "lengths": self.lengths, "dictionary_id": self.dictionary_id, "_codes": None}
+
+
+    def to_bytes(self) -> bytes:
+        """
+        Layout: magic, format version, flags (bit 0 set in bytes mode), then the code lengths.
+        """
+        return DICTIONARY_MAGIC + self._body()
+
+
+    @classmethod
+    def from_bytes(cls, data) -> "Dictionary":
+        if bytes(data[:len(DICTIONARY_MAGIC)]) != DICTIONARY_MAGIC:
+            raise ValueError("Not a Huffman dictionary file")
+        version = data[len(DICTIONARY_MAGIC)] if len(data) > len(DICTIONARY_MAGIC) else None
+        if version != DICTIONARY_VERSION:
+            raise ValueError(f"Unsupported dictionary version: {version}")
+        if len(data) < len(DICTIONARY_MAGIC) + 2:
+            raise ValueError("Invalid dictionary: Truncated header.")
+
+        flags = data[len(DICTIONARY_MAGIC) + 1]
+        lengths, _ = deserialize_codebook(data, len(DICTIONARY_MAGIC) + 2)
+        return cls(lengths, MODE_BYTES if flags & FLAG_BYTES else MODE_TEXT)
+
+
+def train_dictionary(samples, mode: str = MODE_TEXT, max_code_length: int = MAX_CODE_LENGTH_LIMIT) -> Dictionary:
+    """
+    Builds a dictionary from sample data that looks like the data it will compress.
+
+    In bytes mode every byte value gets a code, so nothing ever has to be
+    escaped. In text mode only the characters seen in the samples get one.
+
+    Args:
+        samples: Iterable of str in text mode, of bytes-like objects in bytes mode
+        mode: MODE_TEXT or MODE_BYTES
+        max_code_length: Longest code of the dictionary; by default short
+                         enough for every code to decode in two table lookups
+    """
+    if mode == MODE_BYTES:
+        histogram = [1] * 256
+        for sample in samples:
+            for byte, count in enumerate(byte_histogram(sample)):
+                histogram[byte] += count
+        freqs = dict(enumerate(histogram))
+    else:
+        freqs = Counter()
+        for sample in samples:
+            freqs.update(sample)
+        if not freqs:
+            raise ValueError("Cannot train a dictionary on empty samples")
+        freqs = {ord(char): count for char, count in freqs.items()}
+
+    return Dictionary(limited_code_lengths(freqs, fitting_code_length(max_code_length, len(freqs))), mode)
+
+
+def train_dictionary_from_files(paths, mode: str = MODE_TEXT) -> Dictionary:
+    """
+    Trains a dictionary on the content of files, read as UTF-8 text in text mode.
+    """
+    def samples():
+        for path in paths:
+            if mode == MODE_BYTES:
+                with open(path, "rb") as f:
+                    yield f.read()
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    yield f.read()
+
+    return train_dictionary(samples(), mode)
+
+
+def save_dictionary(dictionary: Dictionary, path: str) -> None:
+    with open(path, "wb") as f:
+        f.write(dictionary.to_bytes())
+
+
+def load_dictionary(path: str) -> Dictionary:
+    with open(path, "rb") as f:
+        return Dictionary.from_bytes(f.read())
+
+
+def dictionary_map(dictionaries) -> dict:
+    """
+    Turns dictionaries, or paths to dictionary files, into the mapping of
+    dictionary ID -> `Dictionary` the decoders take.
+    """
+    if not dictionaries:
+        return {}
+    if isinstance(dictionaries, (Dictionary, str)):
+        dictionaries = [dictionaries]
+    loaded = [load_dictionary(item) if isinstance(item, str) else item for item in dictionaries]
+    return {dictionary.dictionary_id: dictionary for dictionary in loaded}
@@ -1,4 +1,21 @@
-import heapq
+import contextlib
+import io
+import os
+import time
+import uuid
+from collections import Counter
+
+from .BitStream import BitReader, BitWriter
+from .Codebook import huffman_merges
+from .CodebookCache import DECODE_TABLES
+from .Container import (DEFAULT_BLOCK_SIZE, MAGIC, MODE_BYTES, MODE_TEXT, AdaptiveEncoder, compress_stream,
+                        decompress_stream, encode_blocks, BufferReader, is_stream_header, mapped_file, read_index,
+                        read_range, resume_stream, verify_stream)
+from .DecodeTable import DecodeTable
+from .Dictionary import Dictionary, dictionary_map, load_dictionary
+from .ParallelCoding import compress_parallel, decompress_parallel, encode_blocks_parallel, verify_parallel
+from .Stats import CodingStats, StatsHook
+from .Transforms import Pipeline
 
 
 class HuffmanNode:
@@ -11,6 +28,8 @@ class HuffmanNode:
            left_child: Left child node
            right_child: Right child node
        """
+    __slots__ = ("char", "freq", "left_child", "right_child")
+
     def __init__(self, char, freq):
         self.char = char
         self.freq = freq
@@ -32,225 +51,689 @@ class HuffmanCoding:
         self.text_from_file = None
 
 
-    def _to_bytes(self, data : str):
-        b = bytearray()
-        for i in range(0, len(data), 8):
-            b.append(int(data[i:i+8], 2))
-        return bytes(b)
-    
-
-    def _from_bytes(self, data: bytes) -> str:
-        return "".join(f"{byte:08b}" for byte in data)
-
-
-    def _serialize_tree(self) -> str:
+    def _serialize_tree(self, writer: BitWriter) -> None:
+        """
+        Writes the tree in the legacy pre-order layout: '0' for internal nodes,
+        '1' followed by the UTF-32-BE character for leaves.
+        """
         if not self.root:
-            return ""
-        
-        def pre_order(node):
-            bits = []
+            return
+
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
             if node.char is not None:
-                bits.append('1')
-                char_bytes = node.char.encode('utf-32-be')
-                for byte in char_bytes:
-                    bits.append(f"{byte:08b}")
+                writer.write(1, 1)
+                writer.write(int.from_bytes(node.char.encode('utf-32-be'), 'big'), 32)
             else:
-                bits.append('0')
-                bits.append(pre_order(node.left_child))
-                bits.append(pre_order(node.right_child))
-            return "".join(bits)
-        
-        return pre_order(self.root)
+                writer.write(0, 1)
+                stack.append(node.right_child)
+                stack.append(node.left_child)
 
     
-    def _deserialize_tree(self, bit_stream :str, index=0) -> tuple[HuffmanNode | None , int]:
-        
-        if index >= len(bit_stream):
-            return None, index
-
-        bit = bit_stream[index]
-        index += 1 
+    def _deserialize_tree(self, reader: BitReader) -> HuffmanNode | None:
+        """
+        Reads a tree written by `_serialize_tree`. Nodes arrive in pre-order, so
+        each one is the next missing child of the deepest internal node read so far.
+        """
+        if not reader.remaining():
+            return None
+
+        root = None
+        pending = []  # internal nodes still missing a child
+        while True:
+            if reader.read_bit() == 0:
+                node = HuffmanNode(None, 0) #Frequency is not necessary
+            else:
+                char_bytes = reader.read(32).to_bytes(4, 'big') #because our symbol size consists of 4 bytes
+                node = HuffmanNode(char_bytes.decode('utf-32-be'), 0)
 
-        if bit == '0':
-            node = HuffmanNode(None, 0) #Frequency is not necessary
-            node.left_child, index = self._deserialize_tree(bit_stream, index)
-            node.right_child, index = self._deserialize_tree(bit_stream, index)
-            return node , index
-        
-        elif bit == '1':
-            char_bits = bit_stream[index: index+32]
-            index += 32 #because our symbol size consists of 4 bytes
-            byte_list = [int(char_bits[i:i+8], 2) for i in range(0, 32, 8)]
-            char = bytes(byte_list).decode('utf-32-be')
-            print(f"---> {char}")
-            return HuffmanNode(char, 0), index #Frequency is not necessary
+            if not pending:
+                root = node
+            elif pending[-1].left_child is None:
+                pending[-1].left_child = node
+            else:
+                pending.pop().right_child = node
 
-        else: raise ValueError("Invalid bit in tree deserialization") 
+            if node.char is None:
+                pending.append(node)
+            if not pending:
+                return root
 
 
     def _build_huffman_tree(self):
         """
-        This function builds the Huffman tree by creating a priority queue of Huffman nodes,
-        and then repeatedly merging the two nodes with the lowest frequencies untill only one has been left
-        O(n logn) - pessemistic case 
+        This function builds the Huffman tree from the character frequencies with
+        the two-queue method of `huffman_merges`.
+        O(n logn) for sorting the leaves, O(n) for the merges
         """
-        heap = []
-        
-        for char in self.text_from_file:
-            self.symbols_freq[char] = self.symbols_freq.get(char, 0) + 1
+        for char, freq in Counter(self.text_from_file).items():
+            self.symbols_freq[char] = self.symbols_freq.get(char, 0) + freq
 
-        for char, freq in self.symbols_freq.items():
-            heapq.heappush(heap, HuffmanNode(char, freq))
-        
-        while len(heap) > 1:
+        nodes = [HuffmanNode(char, freq) for char, freq in sorted(self.symbols_freq.items())]
+        for left, right in huffman_merges([node.freq for node in nodes]):
+            parent_node = HuffmanNode(None, nodes[left].freq + nodes[right].freq) #  add frequency 
+            parent_node.left_child = nodes[left]
+            parent_node.right_child = nodes[right]
+            nodes.append(parent_node)
 
-            leaft_node = heapq.heappop(heap)
-            right_node = heapq.heappop(heap)
+        self.root = nodes[-1] if nodes else None
 
-            parent_node = HuffmanNode(None, leaft_node.freq + right_node.freq) #  add frequency 
-            parent_node.left_child = leaft_node
-            parent_node.right_child = right_node
 
-            heapq.heappush(heap, parent_node)
+    def _tree_codes(self, root: HuffmanNode = None) -> dict:
+        """
+        Walks the tree (`self.root` unless another root is given) without recursion.
 
-        self.root = heap[0]  
+        Returns:
+            Mapping of char -> (code, length), with the code as an int
+        """
+        codes = {}
+        stack = [(root or self.root, 0, 0)]
+        while stack:
+            node, code, length = stack.pop()
+            if node.char is not None:
+                codes[node.char] = (code, length or 1)
+                continue
+            if node.left_child is not None:
+                stack.append((node.left_child, code << 1, length + 1))
+            if node.right_child is not None:
+                stack.append((node.right_child, (code << 1) | 1, length + 1))
+        return codes
 
 
-    def _generate_codes_for_each_char(self, node = None, current_code="") -> None:
+    def _generate_codes_for_each_char(self) -> None:
         """
-        Recursively traverse the Huffman tree to generate the binary codes for each character.
+        Generates the binary code string of each character from the Huffman tree.
         """
-        if node is None:
-            node = self.root 
+        for char, (code, length) in self._tree_codes().items():
+            self.codes[char] = format(code, f"0{length}b")
 
-        if node.char is not None:
-            self.codes[node.char] = current_code or "0"
-            return
 
-        if node.left_child is not None:
-            self._generate_codes_for_each_char(node.left_child, current_code + "0")
-        if node.right_child is not None:
-            self._generate_codes_for_each_char(node.right_child, current_code + "1")
+    def _legacy_header_size(self, data: bytes) -> int:
+        """
+        Returns the size of the tree header of a legacy file, without reading the tree.
+        """
+        if len(data) < 4:
+            raise ValueError("Invalid compressed data: Missing tree length header.")
 
+        len_tree = int.from_bytes(data[:4], 'big')   # First element (32 bits) in the data is len tree
+        tree_bytes_count = (len_tree + 7) // 8  # Number of bytes used for the tree (with padding)
 
-    def compress_data(self, read_path : str, write_path : str, progress_callback = None) -> None:
-        """
-        Compresses a text file using Huffman coding.
-        
-        Args:
-            input_file: Path to text file to compress
-            output_file: Path to save compressed .bin file
+        if len(data) < 4 + tree_bytes_count:
+            raise ValueError("Invalid compressed data: Tree data corrupted.")
+        return 4 + tree_bytes_count
+
+
+    def _read_legacy_header(self, data: bytes) -> tuple[dict, int]:
         """
+        Reads the pre-order tree header of files written before format versions existed.
 
-        with open(read_path, 'r', encoding="utf-8") as file:
-            self.text_from_file = file.read()
+        Returns:
+            Mapping of char -> (code, length) and the offset of the padding byte
+        """
+        header_size = self._legacy_header_size(data)
+        len_tree = int.from_bytes(data[:4], 'big')
+        tree_bytes_count = header_size - 4
 
-        if not self.text_from_file:
-            raise ValueError("Cannot compress empty file")
-        
-        # Build Huffman tree and codes
-        self._build_huffman_tree()
-        self._generate_codes_for_each_char()
+        # The tree stays local so decoding never touches the state of the instance.
+        root = self._deserialize_tree(BitReader(data[4:4 + tree_bytes_count], len_tree))
+        if root is None:
+            raise ValueError("Invalid compressed data: Tree data corrupted.")
 
-        # --- Serialize Huffman Tree ---
-        bits_tree = self._serialize_tree()
-        tree_length = len(bits_tree)
+        return self._tree_codes(root), 4 + tree_bytes_count
 
-        padded_tree : str = bits_tree + '0' * ((8 - (len(bits_tree) % 8)) % 8)
-        tree_bytes : bytes = self._to_bytes(padded_tree)
 
-        # Encode Text Data with Progress
-        encoded_data = []
-        total_chars = len(self.text_from_file)
-        progress_step = max(1, total_chars // 100)  # Update every ~1%
+    def compress_data(self, read_path : str, write_path : str, progress_callback = None,
+                      block_size : int = DEFAULT_BLOCK_SIZE, workers : int = 1, mode : str = MODE_TEXT,
+                      stats_hook : StatsHook = None, dictionary : Dictionary | str = None,
+                      adaptive : bool = False, max_code_length : int = None,
+                      checksums : bool = False, pipeline : Pipeline | str = None) -> CodingStats:
+        """
+        Compresses a file using Huffman coding, one block at a time. The
+        output goes to a temporary file that replaces `write_path` only once
+        it is complete, so nothing is left behind when compressing fails.
         
-        for i, char in enumerate(self.text_from_file):
-            encoded_data.append(self.codes[char])
-            if progress_callback and i % progress_step == 0:
-                progress = int((i / total_chars) * 100)
-                progress_callback(progress)
-            
-        encoded_data = ''.join(encoded_data)
+        Args:
+            read_path: Path to file to compress
+            write_path: Path to save compressed .huff file
+            progress_callback: Optional function to report progress (0-100)
+            block_size: Characters per block, bounds the memory used
+            workers: Number of processes encoding blocks in parallel
+            mode: MODE_TEXT to code the characters of a UTF-8 file, MODE_BYTES
+                  to code the bytes of any file
+            stats_hook: Optional `StatsHook` told about every block and the totals
+            dictionary: Shared `Dictionary` (or path to one) to code the blocks
+                        with; only its ID is stored, so the same dictionary is
+                        needed to decompress
+            adaptive: Choose for every block, from the exact coded size, between
+                      its own codebook, the previous block's one or storing it raw
+            max_code_length: Longest code allowed (up to 24 bits), so decoding any
+                             code takes at most two table lookups; the bits it
+                             costs are reported in the returned stats
+            checksums: Store the CRC-32 of every block and of the whole data,
+                       checked whenever the file is decompressed or verified
+            pipeline: Transform stages run on every block before coding, as a
+                      `Pipeline` or stage names like "bwt,mtf,rle" or "o1";
+                      they are recorded in the file and undone when decompressing
+
+        Returns:
+            Per-phase timings and counters of the compression
+        """
+        total_size = os.path.getsize(read_path)
+        if not total_size:
+            raise ValueError("Cannot compress empty file")
+        stats = CodingStats("compress")
+        started = time.perf_counter()
+
+        if mode == MODE_BYTES:
+            src = open(read_path, 'rb')
+            raw = src
+        else:
+            src = open(read_path, 'r', encoding="utf-8", newline="")
+            raw = src.buffer
+
+        with src, _replaced_on_success(write_path) as temp_path, open(temp_path, 'wb') as dst:
+            frames = _compress_frames(src, block_size, workers, mode, stats, stats_hook, dictionary, adaptive,
+                                      max_code_length, checksums, pipeline)
+            for frame in frames:
+                start = time.perf_counter()
+                dst.write(frame)
+                stats.add_time("write", start)
+                if progress_callback:
+                    progress_callback(min(99, int((raw.tell() / total_size) * 100)))
+            stats.output_bytes = dst.tell()
+
+        stats.input_bytes = total_size
+        stats.header_bytes = stats.output_bytes - stats.payload_bytes
+        stats.wall_time = time.perf_counter() - started
+        if stats_hook:
+            stats_hook.on_finish(stats)
+
         if progress_callback:
             progress_callback(100)  # Final completion
+        return stats
 
-        #convert extra_pading to byte and than add extra_padding before main encoded_bit
-        data_padding = (8 - (len(encoded_data) % 8)) % 8
-        encoded_bytes  = self._to_bytes(encoded_data + '0' * data_padding)
-              
-        with open(write_path, 'wb') as f:
-            f.write(
-                tree_length.to_bytes(4, 'big') +  # 4-byte tree length
-                tree_bytes +                      # Tree data with padding
-                bytes([data_padding]) +           # 1-byte padding info
-                encoded_bytes                     # Compressed text data
-            )
 
+    def append_data(self, read_path : str, archive_path : str, progress_callback = None,
+                    block_size : int = DEFAULT_BLOCK_SIZE, workers : int = 1, stats_hook : StatsHook = None,
+                    dictionary : Dictionary | str = None, adaptive : bool = True,
+                    max_code_length : int = None) -> CodingStats:
+        """
+        Compresses a file onto the end of an existing archive, as if it had
+        been compressed together with the archived data. New frames replace
+        the end marker, then the block index (with the new blocks added) and
+        the trailer are written again. The archived blocks are never decoded,
+        so the time taken depends on the size of the new data only.
 
-    def decompress_data(self, file_with_encoded_data : str, write_path : str, progress_callback=None) -> str:
+        The new data is coded in the mode of the archive, with its checksums
+        and transform pipeline when it has them; blocks of an archive with a
+        pipeline, or coded with a dictionary, are never adaptive. If appending fails part way, the archive is put
+        back exactly as it was before the error is raised.
+
+        Args:
+            read_path: Path to the file to add
+            archive_path: Path to a .huff file with a block index
+            progress_callback: Optional function to report progress (0-100)
+            block_size: Characters per block, bounds the memory used
+            workers: Number of processes encoding blocks in parallel
+            stats_hook: Optional `StatsHook` told about every block and the totals
+            dictionary: Shared `Dictionary` (or path to one) to code the blocks with
+            adaptive: Let every block reuse the last code lengths of the archive
+                      (or store itself raw) when that is smaller than new ones
+            max_code_length: Longest code allowed, see `compress_data`
+
+        Returns:
+            Per-phase timings and counters of the appended data
         """
-        Decompresses a Huffman-coded file with progress tracking.
+        total_size = os.path.getsize(read_path)
+        if isinstance(dictionary, str):
+            dictionary = load_dictionary(dictionary)
+        stats = CodingStats("compress")
+        started = time.perf_counter()
+
+        with open(archive_path, "r+b") as dst:
+            writer, codebook = resume_stream(dst)
+            mode = writer.mode
+            if dictionary is not None and dictionary.mode != mode:
+                raise ValueError(f"Dictionary was trained in {dictionary.mode} mode, not {mode}")
+            adaptive = adaptive and not writer.pipeline and dictionary is None
+            encoder = None
+            if adaptive:
+                encoder = AdaptiveEncoder(mode, max_code_length)
+                if codebook is not None:
+                    encoder.reuse(codebook)
+
+            src = open(read_path, 'rb') if mode == MODE_BYTES else open(read_path, 'r', encoding="utf-8", newline="")
+            raw = src if mode == MODE_BYTES else src.buffer
+            with src:
+                blocks = (encode_blocks(src, block_size, mode, stats, stats_hook, dictionary, adaptive,
+                                        max_code_length, writer.checksums, encoder, writer.pipeline)
+                          if workers == 1 else
+                          encode_blocks_parallel(src, block_size, workers, mode, stats, stats_hook, dictionary,
+                                                 adaptive, max_code_length, writer.checksums, encoder,
+                                                 writer.pipeline))
+                start_offset = writer.offset
+                tail = dst.read()  # the end marker, index and trailer, put back if appending fails
+                dst.seek(start_offset)
+                try:
+                    for block in blocks:
+                        frame = writer.frame(*block)
+                        start = time.perf_counter()
+                        dst.write(frame)
+                        stats.add_time("write", start)
+                        if progress_callback:
+                            progress_callback(min(99, int((raw.tell() / max(1, total_size)) * 100)))
+                except BaseException:
+                    dst.seek(start_offset)
+                    dst.write(tail)
+                    dst.truncate()
+                    raise
+                dst.write(writer.end())
+                dst.truncate()
+            stats.output_bytes = writer.offset - start_offset
+
+        stats.input_bytes = total_size
+        stats.header_bytes = stats.output_bytes - stats.payload_bytes
+        stats.wall_time = time.perf_counter() - started
+        if stats_hook:
+            stats_hook.on_finish(stats)
+
+        if progress_callback:
+            progress_callback(100)
+        return stats
+
+
+    def decompress_data(self, file_with_encoded_data : str, write_path : str, progress_callback=None,
+                        workers : int = 1, use_mmap : bool = False, stats_hook : StatsHook = None,
+                        dictionaries = None) -> CodingStats:
+        """
+        Decompresses a Huffman-coded file with progress tracking. Like
+        `compress_data`, it replaces `write_path` only once the output is complete.
         
         Args:
-            file_with_encoded_data: Path to compressed .bin file
+            file_with_encoded_data: Path to compressed .huff file
             write_path: Path to save decompressed text file
             progress_callback: Optional function to report progress (0-100)
+            workers: Number of processes decoding blocks in parallel
+            use_mmap: Map the compressed file into memory and decode blocks
+                      straight from the mapping instead of reading them
+            stats_hook: Optional `StatsHook` told about every block and the totals
+            dictionaries: `Dictionary` objects (or paths to them) the file may
+                          have been compressed with
+
+        Returns:
+            Per-phase timings and counters of the decompression
         """
-        try:
-            if not file_with_encoded_data:
-                raise ValueError("Encoded data is empty")
-
-            with open(file_with_encoded_data, "rb") as f:
-                data = f.read()
-
-            data_bits : str = self._from_bytes(data)
-
-            if len(data_bits) < 32:
-                raise ValueError("Invalid compressed data: Missing tree length header.")
-            
-            len_tree = int(data_bits[:32], 2)   # First element (32 bits) in the data is len tree 
-            data_bits = data_bits[32:]
-            
-            tree_bytes_count = (len_tree + 7) // 8  # Number of bytes used for the tree
-            tree_bits_padded_length = tree_bytes_count * 8  # Total bits (with padding)
-
-            # Extract the tree bits (including padding) and truncate to original length
-            if len(data_bits) < tree_bits_padded_length:
-                raise ValueError("Invalid compressed data: Tree data corrupted.")
-            
-            tree_bits_padded = data_bits[:tree_bits_padded_length]
-            tree_bits = tree_bits_padded[:len_tree]  # Remove padding
-            data_bits = data_bits[tree_bits_padded_length:]
-                
-            self.root, _ = self._deserialize_tree(tree_bits)
-
-            extra_padding = int(data_bits[:8], 2)
-            data_bits = data_bits[8:]  # Skip the 8-bit padding header.
-            
-            if extra_padding > 0:
-                data_bits = data_bits[:-extra_padding]
-
-            decoded_data = ""
-            current_node = self.root
-            total_bits = len(data_bits)
-            progress_step = max(1, total_bits // 100)  # Update every ~1%
-
-            for i, bit in enumerate(data_bits):
-                current_node = current_node.left_child if bit == "0" else current_node.right_child
-
-                if current_node.char is not None:
-                    decoded_data += current_node.char
-                    current_node = self.root
-
-                if progress_callback and i % progress_step == 0:
-                    progress = int((i / total_bits) * 100)
-                    progress_callback(progress)
-        
-            if progress_callback:
-                progress_callback(100)  # Final completion
-                
-            with open(write_path, "w", encoding="utf-8") as f:
-                f.write(decoded_data)
-        
-        except ArithmeticError as e:
-            raise ValueError("Encoded data must contain only 0s and 1s")
+        if not file_with_encoded_data:
+            raise ValueError("Encoded data is empty")
+        dictionaries = dictionary_map(dictionaries)
+
+        stats = CodingStats("decompress")
+        started = time.perf_counter()
+
+        with _replaced_on_success(write_path) as temp_path:
+            if use_mmap and os.path.getsize(file_with_encoded_data):
+                with mapped_file(file_with_encoded_data) as view:
+                    self._decompress_source(BufferReader(view), temp_path, progress_callback, workers,
+                                            stats, stats_hook, dictionaries)
+            else:
+                with open(file_with_encoded_data, "rb") as src:
+                    self._decompress_source(src, temp_path, progress_callback, workers, stats, stats_hook,
+                                            dictionaries)
+
+        stats.input_bytes = os.path.getsize(file_with_encoded_data)
+        stats.header_bytes = stats.input_bytes - stats.payload_bytes
+        stats.wall_time = time.perf_counter() - started
+        if stats_hook:
+            stats_hook.on_finish(stats)
+        return stats
+
+
+    def _decompress_source(self, src, write_path : str, progress_callback=None, workers : int = 1,
+                           stats : CodingStats = None, stats_hook : StatsHook = None,
+                           dictionaries : dict = None) -> None:
+        """
+        Decompresses from a seekable binary reader, writing every block as soon as it is decoded.
+        """
+        stats = stats or CodingStats("decompress")
+        header = src.read(len(MAGIC) + 1)
+        src.seek(0)
+
+        if is_stream_header(header):
+            src.seek(0, 2)
+            total_size = src.tell()
+            src.seek(0)
+            with open(write_path, "wb") as dst:
+                for decoded in _decompress_blocks(src, workers, stats, stats_hook, dictionaries):
+                    start = time.perf_counter()
+                    dst.write(decoded)
+                    stats.add_time("write", start)
+                    stats.output_bytes += len(decoded)
+                    if progress_callback:
+                        progress_callback(int((src.tell() / total_size) * 100))
+        else:
+            self._decompress_legacy(src.read(), write_path, progress_callback, stats)
+
+        if progress_callback:
+            progress_callback(100)  # Final completion
+
+
+    def verify_data(self, read_path : str, workers : int = 1, dictionaries = None) -> int:
+        """
+        Decodes a compressed file without writing or keeping the output, raising
+        ValueError if it is corrupted. Only the checksum and size of every block
+        are kept, the checksums stored in the file are checked when it has
+        them, and the decoded size must match the block index.
+
+        Args:
+            read_path: Path to compressed .huff file
+            workers: Number of processes decoding blocks in parallel
+            dictionaries: `Dictionary` objects (or paths to them) the file may have been compressed with
+
+        Returns:
+            The size of the decoded data in bytes
+        """
+        dictionaries = dictionary_map(dictionaries)
+
+        with open(read_path, "rb") as src:
+            if not is_stream_header(src.read(len(MAGIC) + 1)):
+                src.seek(0)
+                stats = CodingStats("decompress")
+                self._decompress_legacy(src.read(), os.devnull, stats=stats)
+                return stats.output_bytes
+
+            src.seek(0)
+            size = (verify_stream(src, dictionaries) if workers == 1 else
+                    verify_parallel(src, workers, dictionaries))
+            if read_index(src)[1] != size:
+                raise ValueError("Invalid compressed data: Decoded size does not match the block index.")
+            return size
+
+
+    def read_range(self, read_path : str, start : int, length : int, dictionaries = None) -> bytes:
+        """
+        Decodes part of a compressed file using its block index, without decoding the rest.
+
+        Args:
+            read_path: Path to compressed .huff file
+            start: Offset of the first byte to return in the decompressed data
+            length: Number of bytes to return
+            dictionaries: `Dictionary` objects (or paths to them) the file may have been compressed with
+        """
+        return read_range(read_path, start, length, dictionary_map(dictionaries))
+
+
+    def _decompress_legacy(self, data: bytes, write_path: str, progress_callback=None,
+                                 stats: CodingStats = None) -> None:
+        """
+        Decompresses a legacy file, written before the block stream format, held in memory.
+        """
+        stats = stats or CodingStats("decompress")
+        decoded_data = self._decode_legacy(data, progress_callback, stats)
+
+        start = time.perf_counter()
+        with open(write_path, "wb") as f:
+            f.write(decoded_data)
+        stats.add_time("write", start)
+
+
+    def _decode_legacy(self, data: bytes, progress_callback=None, stats: CodingStats = None) -> bytes:
+        """
+        Decodes a legacy file held in memory.
+
+        Returns:
+            The decoded data, UTF-8 encoded
+        """
+        stats = stats or CodingStats("decompress")
+        start = time.perf_counter()
+
+        # The table is cached under the raw header, so a repeated legacy tree is not even deserialized.
+        offset = self._legacy_header_size(data)
+        key = ("legacy", bytes(data[:offset]))
+
+        if offset >= len(data):
+            raise ValueError("Invalid compressed data: Missing padding header.")
+
+        extra_padding = data[offset]
+        payload = memoryview(data)[offset + 1:]
+        total_bits = len(payload) * 8 - extra_padding
+
+        start = stats.add_time("header_parse", start)
+
+        table = DECODE_TABLES.get(key)
+        if table is None:
+            stats.cache_misses += 1
+            codes, _ = self._read_legacy_header(data)
+            table = DecodeTable(codes, lambda char: char.encode("utf-8"))
+            DECODE_TABLES.put(key, table)
+        else:
+            stats.cache_hits += 1
+        start = stats.add_time("table_build", start)
+        decoded_data = table.decode(payload, total_bits, progress_callback)
+        stats.add_time("decode", start)
+
+        stats.blocks = 1
+        stats.max_code_length = table.max_length
+        stats.payload_bytes = len(payload)
+        stats.output_bytes = len(decoded_data)
+        return decoded_data
+
+
+@contextlib.contextmanager
+def _replaced_on_success(path: str):
+    """
+    Yields a temporary path next to `path` to write the output to. It replaces
+    `path` once the block finishes and is deleted if the block raises, so a
+    failed or cancelled operation leaves neither a partial file nor a changed
+    one behind. Paths that are not regular files, like os.devnull, are used as they are.
+    """
+    if os.path.exists(path) and not os.path.isfile(path):
+        yield path
+        return
+
+    directory, name = os.path.split(path)
+    temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        yield temp_path
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+
+
+# Stateless counterparts of the HuffmanCoding methods, over data in memory and
+# open file objects. They keep nothing between calls (the caches they share are
+# locked), so any number of threads can run them at once.
+
+def compress_bytes(data: bytes | str, block_size: int = DEFAULT_BLOCK_SIZE, mode: str = None,
+                   dictionary: Dictionary | str = None, adaptive: bool = False, max_code_length: int = None,
+                   checksums: bool = False, pipeline: Pipeline | str = None, stats: CodingStats = None) -> bytes:
+    """
+    Compresses data held in memory into a block stream.
+
+    Args:
+        data: A str, coded in text mode, or bytes, coded in bytes mode
+        block_size: Characters (or bytes) per block
+        mode: MODE_TEXT or MODE_BYTES, to override the mode chosen from the type of `data`
+        dictionary: Shared `Dictionary` (or path to one) to code the blocks with
+        adaptive: Choose for every block between its own codebook, the previous one or storing it raw
+        max_code_length: Longest code allowed, see `HuffmanCoding.compress_data`
+        checksums: Store the CRC-32 of every block and of the whole data
+        pipeline: Transform stages run on every block before coding, as a `Pipeline` or stage names
+        stats: Totals to add the stats of every block to
+
+    Returns:
+        The compressed stream
+    """
+    mode = mode or (MODE_TEXT if isinstance(data, str) else MODE_BYTES)
+    if mode == MODE_TEXT:
+        src = io.StringIO(data if isinstance(data, str) else bytes(data).decode("utf-8"))
+    else:
+        src = io.BytesIO(data.encode("utf-8") if isinstance(data, str) else data)
+    return b"".join(_compress_frames(src, block_size, 1, mode, stats, None, dictionary, adaptive, max_code_length,
+                                     checksums, pipeline))
+
+
+def decompress_bytes(data: bytes, dictionaries=None, stats: CodingStats = None) -> bytes:
+    """
+    Decompresses a block stream, or a legacy file, held in memory.
+
+    Args:
+        data: The compressed data
+        dictionaries: `Dictionary` objects (or paths to them) the data may have been compressed with
+        stats: Totals to add the stats of every block to
+
+    Returns:
+        The decompressed data, UTF-8 encoded for text streams
+    """
+    if not is_stream_header(bytes(data[:len(MAGIC) + 1])):
+        return HuffmanCoding()._decode_legacy(data, stats=stats)
+    return b"".join(decompress_stream(BufferReader(data), stats, dictionaries=dictionary_map(dictionaries)))
+
+
+def compress_file(src, dst, block_size: int = DEFAULT_BLOCK_SIZE, mode: str = MODE_BYTES, workers: int = 1,
+                  stats_hook: StatsHook = None, dictionary: Dictionary | str = None, adaptive: bool = False,
+                  max_code_length: int = None, checksums: bool = False,
+                  pipeline: Pipeline | str = None) -> CodingStats:
+    """
+    Compresses an open binary file object into another one, one block at a
+    time. Neither has to be seekable, and neither is closed.
+
+    Args:
+        src: Binary file object to read, UTF-8 text in MODE_TEXT
+        dst: Binary file object the stream is written to
+        block_size: Characters (or bytes) per block
+        mode: MODE_TEXT to code the characters of UTF-8 text, MODE_BYTES to code the bytes
+        workers: Number of processes encoding blocks in parallel
+        stats_hook: Optional `StatsHook` told about every block and the totals
+        dictionary, adaptive, max_code_length, checksums, pipeline: See `compress_bytes`
+
+    Returns:
+        Per-phase timings and counters of the compression
+    """
+    stats = CodingStats("compress")
+    started = time.perf_counter()
+    src = _CountingReader(src)
+    text = io.TextIOWrapper(src, encoding="utf-8", newline="") if mode == MODE_TEXT else None
+
+    try:
+        for frame in _compress_frames(text or src, block_size, workers, mode, stats, stats_hook, dictionary,
+                                      adaptive, max_code_length, checksums, pipeline):
+            start = time.perf_counter()
+            dst.write(frame)
+            stats.add_time("write", start)
+            stats.output_bytes += len(frame)
+    finally:
+        if text is not None:
+            text.detach()
+
+    stats.input_bytes = src.position
+    stats.header_bytes = stats.output_bytes - stats.payload_bytes
+    stats.wall_time = time.perf_counter() - started
+    if stats_hook:
+        stats_hook.on_finish(stats)
+    return stats
+
+
+def decompress_file(src, dst, workers: int = 1, stats_hook: StatsHook = None, dictionaries=None) -> CodingStats:
+    """
+    Decompresses an open binary file object into another one, writing every
+    block as soon as it is decoded. Block streams are read sequentially, so
+    `src` does not have to be seekable; neither file object is closed.
+
+    Args:
+        src: Binary file object holding a block stream or a legacy file
+        dst: Binary file object the decompressed data is written to
+        workers: Number of processes decoding blocks in parallel
+        stats_hook: Optional `StatsHook` told about every block and the totals
+        dictionaries: `Dictionary` objects (or paths to them) the data may have been compressed with
+
+    Returns:
+        Per-phase timings and counters of the decompression
+    """
+    stats = CodingStats("decompress")
+    started = time.perf_counter()
+    src = _CountingReader(src, len(MAGIC) + 1)
+
+    if is_stream_header(src.peeked):
+        for decoded in _decompress_blocks(src, workers, stats, stats_hook, dictionary_map(dictionaries)):
+            start = time.perf_counter()
+            dst.write(decoded)
+            stats.add_time("write", start)
+            stats.output_bytes += len(decoded)
+        src.read()  # the block index, so the input size covers the whole file
+    else:
+        decoded = HuffmanCoding()._decode_legacy(src.read(), stats=stats)
+        start = time.perf_counter()
+        dst.write(decoded)
+        stats.add_time("write", start)
+
+    stats.input_bytes = src.position
+    stats.header_bytes = stats.input_bytes - stats.payload_bytes
+    stats.wall_time = time.perf_counter() - started
+    if stats_hook:
+        stats_hook.on_finish(stats)
+    return stats
+
+
+class _CountingReader(io.RawIOBase):
+    """
+    Binary reader over a file object that counts the bytes read and can look
+    at the first ones without seeking it.
+
+    Attributes:
+        peeked: The first bytes of the file, read up front
+        position: Number of bytes read so far, including the peeked ones
+    """
+
+    def __init__(self, src, peek: int = 0):
+        self.src = src
+        self.peeked = src.read(peek) if peek else b""
+        self.position = 0
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+    def read(self, size: int = -1) -> bytes:
+        head = self.peeked[self.position:]
+        if size is not None and 0 <= size <= len(head):
+            data = head[:size]
+        else:
+            data = head + self.src.read(-1 if size is None or size < 0 else size - len(head))
+        self.position += len(data)
+        return data
+
+
+def _compress_frames(src, block_size: int, workers: int, mode: str, stats: CodingStats, hook, dictionary, adaptive,
+                     max_code_length, checksums, pipeline):
+    """
+    Loads the dictionary and parses the pipeline when given as strings, then
+    yields the frames of `compress_stream` or, with several workers, `compress_parallel`.
+    """
+    if isinstance(dictionary, str):
+        dictionary = load_dictionary(dictionary)
+    if isinstance(pipeline, str):
+        pipeline = Pipeline.parse(pipeline)
+    if dictionary is not None and dictionary.mode != mode:
+        raise ValueError(f"Dictionary was trained in {dictionary.mode} mode, not {mode}")
+
+    if workers == 1:
+        return compress_stream(src, block_size, mode, stats, hook, dictionary, adaptive, max_code_length, checksums,
+                               pipeline)
+    return compress_parallel(src, block_size, workers, mode, stats, hook, dictionary, adaptive, max_code_length,
+                             checksums, pipeline)
+
+
+def _decompress_blocks(src, workers: int, stats: CodingStats, hook, dictionaries: dict):
+    if workers == 1:
+        return decompress_stream(src, stats, hook, dictionaries)
+    return decompress_parallel(src, workers, stats, hook, dictionaries)
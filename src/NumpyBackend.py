@@ -0,0 +1,182 @@
+# Optional NumPy implementation of the histogram and encoding steps. It produces
+# exactly what the pure-Python path produces and is only used when NumPy imports.
+# NumPy is imported the first time it is needed, so programs that only code
+# small blocks never pay for the import.
+import importlib
+
+
+class _LazyNumpy:
+    """
+    Stands in for the numpy module until an attribute of it is first used.
+    """
+
+    def __getattr__(self, name):
+        global np
+        np = importlib.import_module("numpy")
+        return getattr(np, name)
+
+
+np = _LazyNumpy()
+
+# Below this many symbols the pure-Python path is faster than setting up arrays.
+MIN_SYMBOLS = 4096
+
+# Codes are shifted inside uint64 values.
+MAX_CODE_LENGTH = 57
+
+# Symbols expanded to bit columns at once, bounds the temporary arrays.
+CHUNK_SYMBOLS = 1 << 16
+
+
+def available() -> bool:
+    global np
+    if isinstance(np, _LazyNumpy):
+        try:
+            np = importlib.import_module("numpy")
+        except ImportError:
+            np = None
+    return np is not None
+
+
+def _symbol_array(data, text: bool):
+    if text:
+        return np.frombuffer(data.encode("utf-32-le"), dtype="<u4")
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def histogram(data, text: bool) -> dict:
+    """
+    Counts the symbols of a block.
+
+    Args:
+        data: A str when `text` is true, a bytes-like object otherwise
+
+    Returns:
+        Mapping of symbol (a char in text mode, a byte value otherwise) -> frequency
+    """
+    symbols = _symbol_array(data, text)
+    if text:
+        values, counts = np.unique(symbols, return_counts=True)
+        return {chr(value): count for value, count in zip(values.tolist(), counts.tolist())}
+
+    counts = np.bincount(symbols, minlength=256).tolist()
+    return {byte: count for byte, count in enumerate(counts) if count}
+
+
+def encode(data, codes: dict, text: bool) -> tuple[bytes, int]:
+    """
+    Packs the codes of every symbol MSB-first, like `BitWriter.write_symbols`.
+
+    Args:
+        data: A str when `text` is true, a bytes-like object otherwise
+        codes: Mapping of symbol (a char in text mode, a byte value otherwise) -> (code, length)
+
+    Returns:
+        The payload padded with 0 bits to a whole byte and its length in bits
+    """
+    if text:
+        codes = {ord(key): code for key, code in codes.items()}
+    return encode_symbols(_symbol_array(data, text), codes)
+
+
+def encode_symbols(symbols, codes: dict) -> tuple[bytes, int]:
+    """
+    Packs the codes of an array of int symbols MSB-first.
+
+    The codes of the alphabet are laid out one bit per byte in `patterns`.
+    The length of every symbol is looked up, a cumulative sum gives where
+    each symbol's bits start in the output, and every output bit becomes a
+    gather from `patterns`. The bits are then packed in bulk.
+
+    Args:
+        symbols: NumPy array of symbols
+        codes: Mapping of int symbol -> (code, length)
+
+    Returns:
+        The payload padded with 0 bits to a whole byte and its length in bits
+    """
+    keys = sorted(codes)
+    key_values = np.array(keys, dtype=np.int64)
+    values = np.array([codes[key][0] for key in keys], dtype=np.uint64)
+    lengths = np.array([codes[key][1] for key in keys], dtype=np.int64)
+
+    pattern_starts = np.cumsum(lengths) - lengths
+    pattern_keys = np.repeat(np.arange(len(keys)), lengths)
+    pattern_shifts = lengths[pattern_keys] - 1 - (np.arange(len(pattern_keys)) - pattern_starts[pattern_keys])
+    patterns = ((values[pattern_keys] >> pattern_shifts.astype(np.uint64)) & np.uint64(1)).astype(np.uint8)
+
+    if key_values[-1] < 1 << 16:
+        lookup = np.zeros(int(key_values[-1]) + 1, dtype=np.int64)
+        lookup[key_values] = np.arange(len(keys))
+        index = lookup[symbols]
+    else:
+        index = np.searchsorted(key_values, symbols)
+
+    chunks = []
+    for start in range(0, len(index), CHUNK_SYMBOLS):
+        chunk = index[start:start + CHUNK_SYMBOLS]
+        symbol_lengths = lengths[chunk]
+        symbol_starts = np.cumsum(symbol_lengths) - symbol_lengths
+        gather = np.repeat(pattern_starts[chunk] - symbol_starts, symbol_lengths)
+        gather += np.arange(len(gather))
+        chunks.append(patterns[gather])
+
+    bits = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint8)
+    return np.packbits(bits).tobytes(), len(bits)
+
+
+def context_symbols(data, classes: bytes):
+    """
+    Numbers every byte of `data` by the class of the byte before it, the first
+    byte following a 0 byte: symbol = class * 256 + byte.
+
+    Args:
+        classes: Class of every previous byte value, 256 bytes
+    """
+    current = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    previous = np.concatenate((np.zeros(1, dtype=np.int64), current[:-1]))
+    return np.frombuffer(classes, dtype=np.uint8).astype(np.int64)[previous] * 256 + current
+
+
+def context_histogram(symbols, class_count: int) -> dict:
+    """
+    Counts the symbols returned by `context_symbols`.
+
+    Returns:
+        Mapping of class * 256 + byte -> frequency
+    """
+    counts = np.bincount(symbols, minlength=class_count * 256).tolist()
+    return {symbol: count for symbol, count in enumerate(counts) if count}
+
+
+def rotation_order(data) -> list:
+    """
+    Sorts the rotations of `data` by prefix doubling: after every round,
+    rotations are ranked by their first `2 * step` bytes, from the ranks of
+    their first `step` bytes and of the `step` bytes after them. Equal
+    rotations of a periodic block keep equal ranks.
+
+    Returns:
+        The start offset of every rotation, in sorted order
+    """
+    size = len(data)
+    rank = np.frombuffer(data, dtype=np.uint8).astype(np.int64)
+    order = np.argsort(rank, kind="stable")
+    step = 1
+    while step < size:
+        key = rank * (int(rank.max()) + 1) + np.roll(rank, -step)
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+        rank = np.empty(size, dtype=np.int64)
+        rank[order] = np.concatenate(([0], np.cumsum(sorted_key[1:] != sorted_key[:-1])))
+        if rank[order[-1]] == size - 1:
+            break
+        step *= 2
+    return order.tolist()
+
+
+def sort_positions(data) -> list:
+    """
+    Returns the offsets of the bytes of `data` sorted by value, equal bytes in order.
+    """
+    return np.argsort(np.frombuffer(data, dtype=np.uint8), kind="stable").tolist()
@@ -0,0 +1,180 @@
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .Container import (DEFAULT_BLOCK_SIZE, MODE_TEXT, AdaptiveEncoder, check_encoding_options, check_frame,
+                        check_stream_checksum, collect_block_stats, collect_decoded_stats, combine_checks,
+                        decode_frame, decode_frame_with_stats, encode_frame, encode_frame_with_stats, encode_planned,
+                        encode_planned_with_stats, link_codebooks, plan_blocks, read_blocks, read_frames,
+                        read_stream_info, timed, write_stream)
+from .Stats import CodingStats
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _ordered_map(executor, function, items, max_pending: int):
+    """
+    Like `executor.map`, but submits at most `max_pending` items ahead of the
+    one being yielded, so a large input is never read into memory at once.
+    Items not started yet are cancelled when the consumer stops early.
+    """
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def compress_parallel(src, block_size: int = DEFAULT_BLOCK_SIZE, workers: int = None, mode: str = MODE_TEXT,
+                      stats: CodingStats = None, hook=None, dictionary=None, adaptive: bool = False,
+                      max_code_length: int = None, checksums: bool = False, pipeline=None):
+    """
+    Compresses a file object like `compress_stream`, encoding blocks on a
+    pool of processes. The output is identical to `compress_stream`.
+
+    In adaptive mode blocks are planned in order in this process, which only
+    takes their histograms, and their payloads are packed on the pool.
+
+    Args:
+        src: File-like object, opened in text mode for MODE_TEXT and in binary mode for MODE_BYTES
+        block_size: Characters (or bytes) read per block
+        workers: Number of processes, one per CPU by default
+        mode: MODE_TEXT or MODE_BYTES
+        stats: Totals to add the stats of every block to
+        hook: Optional `StatsHook` told about every block
+        dictionary: Shared `Dictionary` to code the blocks with instead of their own codebooks
+        adaptive: Let `AdaptiveEncoder` choose between a new codebook, the
+                  previous one or storing every block raw
+        max_code_length: Longest code allowed, see `compress_stream`
+        checksums: Store the CRC-32 of every block and of the whole data, see `compress_stream`
+        pipeline: Transform stages to run every block through, see `compress_stream`
+
+    Yields:
+        The stream header, one frame per block and the end marker with the block index, as bytes
+    """
+    yield from write_stream(encode_blocks_parallel(src, block_size, workers, mode, stats, hook, dictionary, adaptive,
+                                                   max_code_length, checksums, pipeline=pipeline),
+                            mode, checksums, pipeline)
+
+
+def encode_blocks_parallel(src, block_size: int = DEFAULT_BLOCK_SIZE, workers: int = None, mode: str = MODE_TEXT,
+                           stats: CodingStats = None, hook=None, dictionary=None, adaptive: bool = False,
+                           max_code_length: int = None, checksums: bool = False, encoder: AdaptiveEncoder = None,
+                           pipeline=None):
+    """
+    Like `encode_blocks`, encoding the blocks on a pool of processes, see
+    `compress_parallel` for the arguments.
+
+    Yields:
+        (block type, frame body, decoded size) for `StreamWriter.frame`, in order
+    """
+    check_encoding_options(dictionary, adaptive, max_code_length, pipeline)
+    workers = workers or default_workers()
+
+    collect = stats is not None or hook is not None
+    reads = read_blocks(src, block_size)
+    if collect:
+        reads = timed(reads, stats or CodingStats("compress"), "read")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if adaptive:
+            encode = partial(_encode_planned, mode=mode, with_stats=collect, checksum=checksums)
+            items = plan_blocks(reads, encoder or AdaptiveEncoder(mode, max_code_length), stats)
+        else:
+            encode = partial(encode_frame_with_stats if collect else encode_frame, mode=mode, dictionary=dictionary,
+                             max_code_length=max_code_length, checksum=checksums, pipeline=pipeline)
+            items = reads
+
+        blocks = _ordered_map(executor, encode, items, 2 * workers)
+        if collect:
+            blocks = collect_block_stats(blocks, stats, hook)
+        yield from blocks
+
+
+def _encode_planned(item: tuple, mode: str, with_stats: bool, checksum: bool):
+    data, plan = item
+    if with_stats:
+        return encode_planned_with_stats(data, plan, mode, checksum)
+    return encode_planned(data, plan, mode, checksum=checksum)
+
+
+def decompress_parallel(src, workers: int = None, stats: CodingStats = None, hook=None, dictionaries: dict = None):
+    """
+    Decompresses a stream like `decompress_stream`, decoding blocks on a pool
+    of processes while keeping them in order.
+
+    Args:
+        src: File-like object opened in binary mode
+        workers: Number of processes, one per CPU by default
+        stats: Totals to add the stats of every block to
+        hook: Optional `StatsHook` told about every block
+        dictionaries: Mapping of dictionary ID -> `Dictionary` for blocks coded with one
+
+    Yields:
+        The bytes of every block, UTF-8 encoded for text streams
+    """
+    workers = workers or default_workers()
+    mode, checksums, pipeline = read_stream_info(src)
+    crc = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if stats is None and hook is None:
+            frames = ((block_type, bytes(body), codebook)
+                      for block_type, body, codebook in link_codebooks(read_frames(src)))
+            decode = partial(_decode_frame, mode=mode, dictionaries=dictionaries, checksum=checksums,
+                             pipeline=pipeline)
+            blocks = _ordered_map(executor, decode, frames, 2 * workers)
+        else:
+            frames = ((block_type, bytes(body), codebook) for block_type, body, codebook in
+                      link_codebooks(timed(read_frames(src), stats or CodingStats("decompress"), "read")))
+            decode = partial(decode_frame_with_stats, mode=mode, dictionaries=dictionaries, checksum=checksums,
+                             pipeline=pipeline)
+            blocks = collect_decoded_stats(_ordered_map(executor, decode, frames, 2 * workers), stats, hook)
+
+        for decoded in blocks:
+            if checksums:
+                crc = zlib.crc32(decoded, crc)
+            yield decoded
+
+    if checksums:
+        check_stream_checksum(src, crc)
+
+
+def _decode_frame(frame: tuple, mode: str, dictionaries: dict, checksum: bool, pipeline):
+    return decode_frame(frame[0], frame[1], mode, dictionaries, codebook=frame[2], checksum=checksum,
+                        pipeline=pipeline)
+
+
+def verify_parallel(src, workers: int = None, dictionaries: dict = None) -> int:
+    """
+    Checks a stream like `verify_stream`, decoding blocks on a pool of
+    processes. Workers send back only the checksum and length of every
+    block, never the decoded data.
+
+    Args:
+        src: File-like object opened in binary mode
+        workers: Number of processes, one per CPU by default
+        dictionaries: Mapping of dictionary ID -> `Dictionary` for blocks coded with one
+
+    Returns:
+        The size of the decoded data
+    """
+    workers = workers or default_workers()
+    mode, checksums, pipeline = read_stream_info(src)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        frames = ((block_type, bytes(body), codebook)
+                  for block_type, body, codebook in link_codebooks(read_frames(src)))
+        check = partial(check_frame, mode=mode, dictionaries=dictionaries, checksum=checksums, pipeline=pipeline)
+        return combine_checks(src, _ordered_map(executor, check, frames, 2 * workers), checksums)
@@ -0,0 +1,52 @@
+import threading
+import time
+
+# Seconds between two progress reports forwarded to a UI.
+DEFAULT_INTERVAL = 0.1
+
+
+class OperationCancelled(Exception):
+    """
+    Raised from a progress callback to stop a running compression or decompression.
+    """
+
+
+class ThrottledProgress:
+    """
+    Progress callback that forwards a value at most once per `interval`
+    seconds, whatever the number of blocks or segments reporting it, and
+    that stops the operation once `cancel_event` is set.
+
+    The engine calls the progress callback after every block and every
+    decoded segment, so raising from it stops the work within one of them.
+    """
+
+    def __init__(self, callback, interval: float = DEFAULT_INTERVAL, cancel_event: threading.Event = None,
+                 clock=time.monotonic):
+        """
+        Args:
+            callback: Function receiving the forwarded progress (0-100)
+            interval: Minimum number of seconds between two forwarded values
+            cancel_event: Event that makes the next call raise OperationCancelled
+            clock: Function returning the current time in seconds
+        """
+        self.callback = callback
+        self.interval = interval
+        self.cancel_event = cancel_event
+        self.clock = clock
+        self.last_value = None
+        self._last_time = None
+
+
+    def __call__(self, value: int) -> None:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise OperationCancelled()
+        if value == self.last_value:
+            return
+
+        now = self.clock()
+        # The final value is always forwarded, so a finished operation never looks stuck.
+        if value >= 100 or self._last_time is None or now - self._last_time >= self.interval:
+            self.last_value = value
+            self._last_time = now
+            self.callback(value)
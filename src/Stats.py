@@ -0,0 +1,112 @@
+import time
+
+# Phases timed while compressing and decompressing, in the order they happen.
+COMPRESS_PHASES = ("read", "transform", "histogram", "tree_build", "code_generation", "header_serialization",
+                   "encode", "pack", "write")
+DECOMPRESS_PHASES = ("read", "header_parse", "table_build", "decode", "transform", "write")
+
+
+class CodingStats:
+    """
+    Timings and counters of one compression or decompression, or of one block of it.
+
+    Phase times are summed over blocks, so with several workers they add up
+    the time spent in every process and can exceed `wall_time`.
+
+    Attributes:
+        operation: "compress" or "decompress"
+        phase_times: Mapping of phase name -> seconds
+        wall_time: Seconds from start to end of the whole operation
+        input_bytes: Bytes read (the original data when compressing)
+        output_bytes: Bytes written
+        symbols: Number of symbols coded
+        distinct_symbols: Largest alphabet used by a block
+        max_code_length: Depth of the deepest Huffman tree of all blocks
+        blocks: Number of blocks
+        header_bytes: Bytes of the compressed data that are not payload (headers, codebooks, index)
+        payload_bytes: Bytes of coded symbols
+        limited_blocks: Blocks whose codes were shortened to the maximum code length
+        limit_loss_bits: Payload bits added by shortening codes, compared with unlimited Huffman codes
+        stored_blocks: Blocks stored raw because coding them would not make them smaller
+        repeated_blocks: Blocks that reused the codebook of an earlier block
+        cache_hits: Blocks whose codes (or decode table) came from the codebook cache
+        cache_misses: Blocks whose codes (or decode table) had to be built
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.phase_times = dict.fromkeys(COMPRESS_PHASES if operation == "compress" else DECOMPRESS_PHASES, 0.0)
+        self.wall_time = 0.0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.symbols = 0
+        self.distinct_symbols = 0
+        self.max_code_length = 0
+        self.blocks = 0
+        self.header_bytes = 0
+        self.payload_bytes = 0
+        self.limited_blocks = 0
+        self.limit_loss_bits = 0
+        self.stored_blocks = 0
+        self.repeated_blocks = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+    def add_time(self, phase: str, start: float) -> float:
+        """
+        Adds the time elapsed since `start` (a `time.perf_counter` value) to a phase.
+
+        Returns:
+            The current time, to start the next phase from
+        """
+        now = time.perf_counter()
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + now - start
+        return now
+
+
+    def merge(self, other: "CodingStats") -> None:
+        """
+        Adds the timings and counters of a block to these totals.
+        """
+        for phase, seconds in other.phase_times.items():
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+        self.symbols += other.symbols
+        self.distinct_symbols = max(self.distinct_symbols, other.distinct_symbols)
+        self.max_code_length = max(self.max_code_length, other.max_code_length)
+        self.blocks += other.blocks
+        self.payload_bytes += other.payload_bytes
+        self.limited_blocks += other.limited_blocks
+        self.limit_loss_bits += other.limit_loss_bits
+        self.stored_blocks += other.stored_blocks
+        self.repeated_blocks += other.repeated_blocks
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+
+
+    def as_dict(self) -> dict:
+        return dict(vars(self), phase_times=dict(self.phase_times))
+
+
+    def __repr__(self):
+        phases = ", ".join(f"{phase}={seconds:.3f}s" for phase, seconds in self.phase_times.items())
+        return (f"CodingStats({self.operation}, {self.input_bytes} -> {self.output_bytes} bytes, "
+                f"{self.blocks} blocks, {self.wall_time:.3f}s: {phases})")
+
+
+class StatsHook:
+    """
+    Receives the stats of a compression or decompression as it runs. Subclass
+    it and override the methods you need, e.g. to forward them to a metrics system.
+    """
+
+    def on_block(self, stats: CodingStats) -> None:
+        """
+        Called in the calling process after every block, with the stats of that block only.
+        """
+
+
+    def on_finish(self, stats: CodingStats) -> None:
+        """
+        Called once with the totals, just before they are returned.
+        """
@@ -0,0 +1,294 @@
+import abc
+import re
+
+from .Codebook import read_varint, write_varint
+from . import NumpyBackend
+
+# Longest run a single RLE count byte stands for, on top of the 4 bytes kept.
+MAX_RUN_EXTRA = 255
+
+_RUNS = re.compile(rb"(.)\1{3}(\1{0,%d})" % MAX_RUN_EXTRA, re.DOTALL)
+_RUN_COUNTS = re.compile(rb"(.)\1{3}(.)", re.DOTALL)
+
+
+class Stage(abc.ABC):
+    """
+    A reversible transform of a block's bytes, run before the entropy coder
+    to make the data easier to code. Stages are found by name when building a
+    pipeline and by `stage_id` when reading one back from a stream header,
+    see `register_stage`.
+
+    Attributes:
+        stage_id: Number stored in stream headers, unique among registered stages
+        name: Name used on the command line
+    """
+
+    stage_id = None
+    name = None
+
+    @abc.abstractmethod
+    def forward(self, data: bytes) -> bytes:
+        """
+        Transforms the bytes of a block.
+        """
+
+
+    @abc.abstractmethod
+    def inverse(self, data) -> bytes:
+        """
+        Undoes `forward`: `inverse(forward(data)) == data` for any bytes.
+        """
+
+
+class RunLengthStage(Stage):
+    """
+    Run-length coding: after 4 equal bytes comes one byte counting how many
+    more copies of the byte follow (up to 255). Runs shorter than 4 bytes are
+    left alone, so data without runs barely grows.
+    """
+
+    stage_id = 1
+    name = "rle"
+
+    def forward(self, data: bytes) -> bytes:
+        return _RUNS.sub(lambda match: match.group(1) * 4 + bytes([len(match.group(2))]), data)
+
+
+    def inverse(self, data) -> bytes:
+        return _RUN_COUNTS.sub(lambda match: match.group(1) * (4 + match.group(2)[0]), bytes(data))
+
+
+class MoveToFrontStage(Stage):
+    """
+    Move-to-front coding: every byte becomes its position in a list of the
+    256 byte values, then moves to the front of the list. Recently seen bytes
+    turn into small numbers, runs into zeros.
+    """
+
+    stage_id = 2
+    name = "mtf"
+
+    def forward(self, data: bytes) -> bytes:
+        order = bytearray(range(256))
+        out = bytearray(len(data))
+        for index, byte in enumerate(data):
+            position = order.index(byte)
+            if position:
+                order[1:position + 1] = order[:position]
+                order[0] = byte
+            out[index] = position
+        return bytes(out)
+
+
+    def inverse(self, data) -> bytes:
+        order = bytearray(range(256))
+        out = bytearray(len(data))
+        for index, position in enumerate(data):
+            byte = order[position]
+            if position:
+                order[1:position + 1] = order[:position]
+                order[0] = byte
+            out[index] = byte
+        return bytes(out)
+
+
+class BlockSortingStage(Stage):
+    """
+    Burrows-Wheeler transform: the last byte of every rotation of the block,
+    rotations being sorted, which groups bytes that appear in the same
+    context. The output starts with the rank of the unrotated block (varint).
+    """
+
+    stage_id = 3
+    name = "bwt"
+
+    def forward(self, data: bytes) -> bytes:
+        if not data:
+            return b""
+        order = _rotation_order(data)
+        last = bytes(data[start - 1] for start in order)
+        return write_varint(order.index(0)) + last
+
+
+    def inverse(self, data) -> bytes:
+        if not len(data):
+            return b""
+        primary, offset = read_varint(data, 0)
+        last = bytes(data[offset:])
+        size = len(last)
+        if primary >= size:
+            raise ValueError("Invalid compressed data: Corrupted block sorting index.")
+
+        # The n-th occurrence of a byte in the last column is the n-th in the
+        # sorted first column, which links every rotation to the next one.
+        following = (NumpyBackend.sort_positions(last) if _use_numpy(last) else
+                     sorted(range(size), key=last.__getitem__))
+        out = bytearray(size)
+        position = following[primary]
+        for index in range(size):
+            out[index] = last[position]
+            position = following[position]
+        return bytes(out)
+
+
+def _use_numpy(data) -> bool:
+    return len(data) >= NumpyBackend.MIN_SYMBOLS and NumpyBackend.available()
+
+
+def _rotation_order(data: bytes) -> list:
+    """
+    Returns the start offset of every rotation of `data` in sorted order,
+    see `NumpyBackend.rotation_order`.
+    """
+    if _use_numpy(data):
+        return NumpyBackend.rotation_order(data)
+
+    size = len(data)
+    rank = list(data)
+    order = sorted(range(size), key=rank.__getitem__)
+    step = 1
+    while step < size:
+        keys = [(rank[start], rank[(start + step) % size]) for start in range(size)]
+        order = sorted(range(size), key=keys.__getitem__)
+        rank = [0] * size
+        for previous, start in zip(order, order[1:]):
+            rank[start] = rank[previous] + (keys[start] != keys[previous])
+        if rank[order[-1]] == size - 1:
+            break
+        step *= 2
+    return order
+
+
+# Name used for the order-1 context coder in pipelines. It is not a transform
+# but picks the entropy coder, so it can only come last.
+CONTEXT_STAGE = "o1"
+CONTEXT_STAGE_ID = 0x7F
+
+STAGES = {}
+
+
+def register_stage(stage: Stage) -> None:
+    """
+    Makes a stage available to pipelines. Streams written with a custom
+    stage can only be read where the same stage is registered.
+
+    Args:
+        stage: Instance of a `Stage` subclass with its own `stage_id` and `name`
+    """
+    if not isinstance(stage, Stage):
+        raise TypeError("Stages must be Stage instances")
+    if not isinstance(stage.stage_id, int) or not stage.name or stage.name == CONTEXT_STAGE:
+        raise ValueError("Stages need an int stage_id and a name other than " + CONTEXT_STAGE)
+    if not 0 < stage.stage_id < CONTEXT_STAGE_ID:
+        raise ValueError(f"Stage IDs must be between 1 and {CONTEXT_STAGE_ID - 1}")
+    for other in STAGES.values():
+        if other.stage_id == stage.stage_id and other.name != stage.name:
+            raise ValueError(f"Stage ID {stage.stage_id} is already used by {other.name}")
+    STAGES[stage.name] = stage
+
+
+for _stage in (RunLengthStage(), MoveToFrontStage(), BlockSortingStage()):
+    register_stage(_stage)
+
+
+class Pipeline:
+    """
+    The stages a stream runs its blocks through before entropy coding,
+    recorded in the stream header. Blocks go through the stages in order when
+    compressing and back through them in reverse order when decompressing.
+
+    Attributes:
+        stages: The `Stage` objects, in forward order
+        context: Code the transformed bytes with the order-1 context coder
+                 instead of a single codebook per block
+    """
+
+    def __init__(self, stages: list = (), context: bool = False):
+        self.stages = list(stages)
+        self.context = context
+
+
+    @classmethod
+    def parse(cls, spec: str) -> "Pipeline":
+        """
+        Builds a pipeline from stage names separated by commas, like "bwt,mtf,rle" or "bwt,mtf,o1".
+        """
+        names = [name.strip().lower() for name in spec.split(",") if name.strip()]
+        context = bool(names) and names[-1] == CONTEXT_STAGE
+        if context:
+            names.pop()
+        stages = []
+        for name in names:
+            if name == CONTEXT_STAGE:
+                raise ValueError(f"The {CONTEXT_STAGE} stage must come last")
+            if name not in STAGES:
+                raise ValueError(f"Unknown stage {name!r}, expected one of {', '.join(STAGES)} or {CONTEXT_STAGE}")
+            stages.append(STAGES[name])
+        return cls(stages, context)
+
+
+    def serialize(self) -> bytes:
+        """
+        Layout: the number of stages (varint), then their IDs (varints), the context coder last.
+        """
+        ids = [stage.stage_id for stage in self.stages] + ([CONTEXT_STAGE_ID] if self.context else [])
+        return write_varint(len(ids)) + b"".join(write_varint(stage_id) for stage_id in ids)
+
+
+    @classmethod
+    def deserialize(cls, data, offset: int = 0) -> tuple["Pipeline", int]:
+        """
+        Reads a pipeline written by `serialize`.
+
+        Returns:
+            The pipeline and the offset just past it
+        """
+        count, offset = read_varint(data, offset)
+        ids = []
+        for _ in range(count):
+            stage_id, offset = read_varint(data, offset)
+            ids.append(stage_id)
+        return cls.from_ids(ids), offset
+
+
+    @classmethod
+    def from_ids(cls, ids: list) -> "Pipeline":
+        """
+        Builds a pipeline from the stage IDs stored in a stream header.
+        """
+        by_id = {stage.stage_id: stage for stage in STAGES.values()}
+        context = bool(ids) and ids[-1] == CONTEXT_STAGE_ID
+        stages = []
+        for stage_id in ids[:-1] if context else ids:
+            if stage_id not in by_id:
+                raise ValueError(f"Unsupported compressed data: Unknown transform stage {stage_id}.")
+            stages.append(by_id[stage_id])
+        return cls(stages, context)
+
+
+    def forward(self, data: bytes) -> bytes:
+        for stage in self.stages:
+            data = stage.forward(data)
+        return data
+
+
+    def inverse(self, data) -> bytes:
+        for stage in reversed(self.stages):
+            data = stage.inverse(data)
+        return data
+
+
+    def __bool__(self):
+        return bool(self.stages) or self.context
+
+
+    def __eq__(self, other):
+        return isinstance(other, Pipeline) and str(self) == str(other)
+
+
+    def __str__(self):
+        return ",".join([stage.name for stage in self.stages] + ([CONTEXT_STAGE] if self.context else []))
+
+
+    def __repr__(self):
+        return f"Pipeline({str(self)!r})"
@@ -1,62 +1,226 @@
-from PyQt6.QtWidgets import QPushButton, QLabel, QMessageBox, QMainWindow, QVBoxLayout, QWidget, QProgressBar, QFileDialog
-from PyQt6.QtCore import QSize, QThread, pyqtSignal, Qt, pyqtSlot
+import os
+import threading
+from collections import deque
+
+from PyQt6.QtWidgets import (QPushButton, QLabel, QMessageBox, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget,
+                             QProgressBar, QFileDialog, QScrollArea, QSpinBox)
+from PyQt6.QtCore import QSize, QThread, QObject, pyqtSignal, Qt, pyqtSlot
+from .CommandLine import SUFFIX, default_output_path
+from .Container import detect_mode
 from .HuffmanCoding import HuffmanCoding
+from .ParallelCoding import default_workers
+from .Progress import DEFAULT_INTERVAL, OperationCancelled, ThrottledProgress
+
+# Jobs run at the same time by default; the CPUs are shared between them.
+DEFAULT_CONCURRENT_JOBS = 2
 
 class CompressionWorker(QThread):
     """
-    Runs a counter thread.
+    Runs one compression or decompression job.
     """
     progress_updated = pyqtSignal(int)
     finished = pyqtSignal()
     error_happened = pyqtSignal(str)
+    cancelled = pyqtSignal()
 
-    def __init__(self, operation, input_path, output_path):
+    def __init__(self, operation, input_path, output_path, workers=None, progress_interval=DEFAULT_INTERVAL):
         super().__init__()
         self.operation = operation  # 'compress' or 'decompress'
         self.input_path = input_path
         self.output_path = output_path
+        self.workers = workers or default_workers()
         self.huffman = HuffmanCoding()
+        self._cancel_event = threading.Event()
+        # Progress is reported after every block, but only reaches the UI a few times per second.
+        self.progress = ThrottledProgress(self.progress_updated.emit, progress_interval, self._cancel_event)
+
+    def cancel(self):
+        """
+        Stops the job at the next block; safe to call from any thread.
+        """
+        self._cancel_event.set()
 
     def run(self):
         try:
+            self.progress(0)
             if self.operation == 'compress':
                 self.huffman.compress_data(
-                    self.input_path, 
-                    self.output_path, 
-                    self.update_progress
+                    self.input_path,
+                    self.output_path,
+                    self.progress,
+                    workers=self.workers,
+                    mode=detect_mode(self.input_path)
                     )
-                
+
             else:
                 self.huffman.decompress_data(
-                    self.input_path, 
-                    self.output_path, 
-                    self.update_progress
+                    self.input_path,
+                    self.output_path,
+                    self.progress,
+                    workers=self.workers
                     )
-                
+
             self.finished.emit()
 
+        except OperationCancelled:
+            # The partial output was already deleted by HuffmanCoding.
+            self.cancelled.emit()
+
         except Exception as e:
             self.error_happened.emit(str(e))
-    
+
+
+class Job:
+    """
+    A file waiting in, or taken from, the job queue.
+
+    Attributes:
+        operation: 'compress' or 'decompress'
+        input_path: File to read
+        output_path: File to write
+        state: 'queued', 'running', 'done', 'failed' or 'cancelled'
+        error: Error message of a failed job
+        worker: The `CompressionWorker` of a started job
+    """
+    def __init__(self, operation, input_path, output_path):
+        self.operation = operation
+        self.input_path = input_path
+        self.output_path = output_path
+        self.state = "queued"
+        self.error = None
+        self.worker = None
+
+
+class JobQueue(QObject):
+    """
+    Runs queued jobs in order, at most `max_concurrent` at a time.
+    """
+    job_started = pyqtSignal(object)
+    job_progress = pyqtSignal(object, int)
+    job_ended = pyqtSignal(object)
+    all_done = pyqtSignal()
+
+    def __init__(self, max_concurrent=DEFAULT_CONCURRENT_JOBS):
+        super().__init__()
+        self.max_concurrent = max_concurrent
+        self.queued = deque()
+        self.running = []
+        self.ended = []
+
+    def add(self, job):
+        self.queued.append(job)
+        self._start_next()
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = value
+        self._start_next()
+
+    def cancel(self, job):
+        if job.state == "queued":
+            self.queued.remove(job)
+            self._end(job, "cancelled")
+        elif job.state == "running":
+            job.worker.cancel()
+
+    def cancel_all(self):
+        for job in list(self.queued) + self.running:
+            self.cancel(job)
+
+    def _start_next(self):
+        while self.queued and len(self.running) < self.max_concurrent:
+            job = self.queued.popleft()
+            # Every running job gets its share of the CPUs for its block processes.
+            job.worker = CompressionWorker(job.operation, job.input_path, job.output_path,
+                                           max(1, default_workers() // self.max_concurrent))
+            job.worker.progress_updated.connect(lambda value, job=job: self.job_progress.emit(job, value))
+            job.worker.finished.connect(lambda job=job: self._end(job, "done"))
+            job.worker.error_happened.connect(lambda message, job=job: self._end(job, "failed", message))
+            job.worker.cancelled.connect(lambda job=job: self._end(job, "cancelled"))
+            job.state = "running"
+            self.running.append(job)
+            job.worker.start()
+            self.job_started.emit(job)
+
+    def _end(self, job, state, error=None):
+        if job in self.running:
+            self.running.remove(job)
+            job.worker.wait()
+        job.state = state
+        job.error = error
+        self.ended.append(job)
+        self.job_ended.emit(job)
+        self._start_next()
+        if not self.queued and not self.running:
+            self.all_done.emit()
+
+
+class JobRow(QWidget):
+    """
+    Shows the file name, progress and state of one job, with a button to cancel it.
+    """
+    def __init__(self, job, queue):
+        super().__init__()
+        self.job = job
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.name_label = QLabel(os.path.basename(job.input_path))
+        self.name_label.setToolTip(job.input_path)
+        self.name_label.setMinimumWidth(120)
+        layout.addWidget(self.name_label)
+
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 100)
+        self.progress.setTextVisible(True)
+        layout.addWidget(self.progress)
+
+        self.state_label = QLabel("Queued")
+        self.state_label.setMinimumWidth(70)
+        layout.addWidget(self.state_label)
+
+        self.btn_cancel = QPushButton("✖")
+        self.btn_cancel.setToolTip("Cancel")
+        self.btn_cancel.setFixedWidth(30)
+        self.btn_cancel.clicked.connect(lambda: queue.cancel(job))
+        layout.addWidget(self.btn_cancel)
+        self.setLayout(layout)
+
     def update_progress(self, value):
-        self.progress_updated.emit(value)
-        
+        self.progress.setValue(value)
+
+    def update_state(self):
+        text = {"queued": "Queued", "running": "Running", "done": "✅ Done",
+                "failed": "❌ Failed", "cancelled": "Cancelled"}[self.job.state]
+        self.state_label.setText(text)
+        if self.job.error:
+            self.state_label.setToolTip(self.job.error)
+        if self.job.state == "done":
+            self.progress.setValue(100)
+        if self.job.state in ("done", "failed", "cancelled"):
+            self.btn_cancel.setEnabled(False)
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.queue = JobQueue()
+        self.rows = {}
         self.init_ui()
-        
-        
+        self.queue.job_started.connect(self.on_job_started)
+        self.queue.job_progress.connect(self.update_progress)
+        self.queue.job_ended.connect(self.on_job_ended)
+        self.queue.all_done.connect(self.on_operation_finished)
+
+
     def init_ui(self):
         self.setWindowTitle("Compress/Decompress Data")
-        self.setFixedSize(QSize(400, 300))
+        self.setMinimumSize(QSize(480, 520))
 
         layout = QVBoxLayout()
         layout.setContentsMargins(20, 20, 20, 20)
 
         # Operation Buttons
-        self.btn_compress = QPushButton("📁 Compress File")
+        self.btn_compress = QPushButton("📁 Compress Files")
         self.btn_compress.clicked.connect(self.compress_file)
         self.btn_compress.setStyleSheet("""
             QPushButton {
@@ -70,7 +234,7 @@ class MainWindow(QMainWindow):
         """)
         layout.addWidget(self.btn_compress)
 
-        self.btn_decompress = QPushButton("📤 Decompress File")
+        self.btn_decompress = QPushButton("📤 Decompress Files")
         self.btn_decompress.clicked.connect(self.decompress_file)
         self.btn_decompress.setStyleSheet("""
             QPushButton {
@@ -84,6 +248,31 @@ class MainWindow(QMainWindow):
         """)
         layout.addWidget(self.btn_decompress)
 
+        # Queue Settings
+        settings = QHBoxLayout()
+        settings.addWidget(QLabel("Parallel jobs:"))
+        self.concurrent_jobs = QSpinBox()
+        self.concurrent_jobs.setRange(1, max(1, default_workers()))
+        self.concurrent_jobs.setValue(min(DEFAULT_CONCURRENT_JOBS, self.concurrent_jobs.maximum()))
+        self.concurrent_jobs.valueChanged.connect(self.queue.set_max_concurrent)
+        self.queue.set_max_concurrent(self.concurrent_jobs.value())
+        settings.addWidget(self.concurrent_jobs)
+        settings.addStretch()
+        self.btn_cancel_all = QPushButton("Cancel All")
+        self.btn_cancel_all.clicked.connect(self.queue.cancel_all)
+        settings.addWidget(self.btn_cancel_all)
+        layout.addLayout(settings)
+
+        # Job Rows
+        self.job_list = QVBoxLayout()
+        self.job_list.addStretch()
+        jobs = QWidget()
+        jobs.setLayout(self.job_list)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(jobs)
+        layout.addWidget(scroll)
+
         # Progress Indicators
         self.progress = QProgressBar()
         self.progress.setRange(0, 100)
@@ -135,55 +324,95 @@ class MainWindow(QMainWindow):
 
     def decompress_file(self):
         self.start_operation("decompress")
-    
+
     def start_operation(self, operation):
-        
-        input_path, _ = (QFileDialog.getOpenFileName(self, "Decompres file")
-                        if operation == 'decompress' else
-                        QFileDialog.getOpenFileName(self, "Compres file"))
 
-        if not input_path:
+        input_paths, _ = (QFileDialog.getOpenFileNames(self, "Decompres files")
+                          if operation == 'decompress' else
+                          QFileDialog.getOpenFileNames(self, "Compres files"))
+
+        if not input_paths:
             return
 
-        output_path, _ = (QFileDialog.getSaveFileName(self, "Compres file", "", "Text fail (*.txt)")
-                         if operation == 'decompress' else
-                         QFileDialog.getSaveFileName(self, "Decompres file", "", "Huffman Compress Files (*.huff)"))
+        if len(input_paths) == 1:
+            output_path, _ = (QFileDialog.getSaveFileName(self, "Compres file", "", "All files (*)")
+                             if operation == 'decompress' else
+                             QFileDialog.getSaveFileName(self, "Decompres file", "", "Huffman Compress Files (*.huff)"))
+            output_paths = [output_path] if output_path else []
+        else:
+            # Several files go to one directory, named like the command line does.
+            output_dir = QFileDialog.getExistingDirectory(self, "Output directory")
+            suffix = {"suffix_to_strip": SUFFIX} if operation == 'decompress' else {"suffix_to_add": SUFFIX}
+            output_paths = [default_output_path(path, output_dir, **suffix) for path in input_paths] if output_dir else []
 
-        if not output_path:
+        if not output_paths:
             return
 
-        self.toggle_buttons(False)
-        self.progress.setValue(0)
+        if not self.queue.running and not self.queue.queued:
+            self.clear_finished_rows()
+        for input_path, output_path in zip(input_paths, output_paths):
+            job = Job(operation, input_path, output_path)
+            row = JobRow(job, self.queue)
+            self.rows[job] = row
+            self.job_list.insertWidget(self.job_list.count() - 1, row)
+            self.queue.add(job)
+        self.update_overall_progress()
 
-        self.worker = CompressionWorker(operation, input_path, output_path)
-        self.worker.progress_updated.connect(self.update_progress)
-        self.worker.finished.connect(self.on_operation_finished)
-        self.worker.error_happened.connect(self.show_error)
-        self.worker.start()
+    def clear_finished_rows(self):
+        for row in self.rows.values():
+            self.job_list.removeWidget(row)
+            row.deleteLater()
+        self.rows.clear()
+        self.queue.ended.clear()
 
-    @pyqtSlot(int)
-    def update_progress(self, value):
+    @pyqtSlot(object)
+    def on_job_started(self, job):
+        if job in self.rows:
+            self.rows[job].update_state()
+        self.update_overall_progress()
+
+    @pyqtSlot(object, int)
+    def update_progress(self, job, value):
+        self.rows[job].update_progress(value)
+        self.update_overall_progress()
+
+    @pyqtSlot(object)
+    def on_job_ended(self, job):
+        self.rows[job].update_state()
+        self.update_overall_progress()
+
+    def update_overall_progress(self):
+        if not self.rows:
+            return
+        ended = sum(1 for row in self.rows.values() if row.job.state in ("done", "failed", "cancelled"))
+        value = sum(100 if row.job.state in ("done", "failed", "cancelled") else row.progress.value()
+                    for row in self.rows.values()) // len(self.rows)
         self.progress.setValue(value)
         self.percentage_label.setText(f"{value}%")
-        if value == 100:
-            self.status_label.setText("Finalizing...")
+        self.status_label.setText(f"{ended} of {len(self.rows)} files finished")
 
     @pyqtSlot()
     def on_operation_finished(self):
-        self.toggle_buttons(True)
+        failed = [job for job in self.queue.ended if job.state == "failed"]
+        cancelled = sum(1 for job in self.queue.ended if job.state == "cancelled")
         self.progress.setValue(100)
         self.percentage_label.setText("100%")
-        self.status_label.setText("✅ Operation Completed Successfully!")
-        QMessageBox.information(self, "Success", "Operation completed successfully!")
+        if failed:
+            self.show_error("\n".join(f"{os.path.basename(job.input_path)}: {job.error}" for job in failed))
+        elif cancelled:
+            self.status_label.setText(f"Cancelled {cancelled} of {len(self.queue.ended)} files")
+        else:
+            self.status_label.setText("✅ Operation Completed Successfully!")
+            QMessageBox.information(self, "Success", "Operation completed successfully!")
 
     @pyqtSlot(str)
     def show_error(self, message):
-        self.toggle_buttons(True)
-        self.progress.setValue(0)
         self.percentage_label.setText("❌ Error")
         self.status_label.setText("Operation failed")
         QMessageBox.critical(self, "Error", f"Operation failed:\n{message}")
 
-    def toggle_buttons(self, enabled):
-        self.btn_compress.setEnabled(enabled)
-        self.btn_decompress.setEnabled(enabled)
+    def closeEvent(self, event):
+        self.queue.cancel_all()
+        for job in list(self.queue.running):
+            job.worker.wait()
+        super().closeEvent(event)
@@ -1,11 +1,20 @@
-from .UIApp import MainWindow
-from PyQt6.QtWidgets import QApplication
 import sys
 
+def __getattr__(name):
+    # The GUI pulls in PyQt6, so it is only imported when asked for; using the
+    # compression modules as a library never needs a display stack.
+    if name == "MainWindow":
+        from .UIApp import MainWindow
+        return MainWindow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def run():
     """
     Initialize and run the Huffman Compression application
     """
+    from PyQt6.QtWidgets import QApplication
+    from .UIApp import MainWindow
+
     app = QApplication([])
     window = MainWindow()
     window.show()
@@ -0,0 +1,5 @@
+import sys
+
+from .CommandLine import main
+
+sys.exit(main())
@@ -0,0 +1,115 @@
+import unittest
+import os
+import io
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.AsyncCoding import compress_async, decompress_async, shutdown_shared_executor
+from src.Container import MODE_BYTES, compress_stream
+from src.Stats import CodingStats
+from src.Transforms import Pipeline
+
+
+class ChunkedReader:
+    """Async source handing out data in small pieces."""
+
+    def __init__(self, data: bytes, chunk_size: int = 7):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.position = 0
+
+    async def read(self, size: int) -> bytes:
+        await asyncio.sleep(0)
+        chunk = self.data[self.position:self.position + min(size, self.chunk_size)]
+        self.position += len(chunk)
+        return chunk
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+class TestAsyncCoding(unittest.TestCase):
+    def setUp(self):
+        self.text = "".join(f"request {i} ü€ {'abc' * (i % 4)}\n" for i in range(400))
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_matches_sync_stream(self):
+        """Test async compression writes the same stream as compress_stream, split UTF-8 included"""
+        data = self.text.encode("utf-8")
+        expected = b"".join(compress_stream(io.StringIO(self.text), block_size=500))
+        compressed = asyncio.run(collect(compress_async(ChunkedReader(data), block_size=500, executor=self.executor)))
+        self.assertEqual(compressed, expected)
+
+        blocks = asyncio.run(collect(decompress_async(ChunkedReader(compressed, 5), executor=self.executor)))
+        self.assertEqual(blocks, data)
+
+    def test_async_iterable_and_options(self):
+        """Test async iterables in bytes mode, adaptive blocks, checksums and stats"""
+        data = bytes(range(256)) * 10 + b"\x00\xff" * 3000
+
+        async def pieces():
+            for start in range(0, len(data), 1000):
+                yield data[start:start + 1000]
+
+        stats = CodingStats("compress")
+        compressed = asyncio.run(collect(compress_async(pieces(), block_size=1500, mode=MODE_BYTES, adaptive=True,
+                                                        executor=self.executor, stats=stats, checksums=True)))
+        self.assertEqual(compressed, b"".join(compress_stream(io.BytesIO(data), block_size=1500, mode=MODE_BYTES,
+                                                              adaptive=True, checksums=True)))
+        self.assertEqual(stats.blocks, 6)
+        self.assertEqual(asyncio.run(collect(decompress_async(ChunkedReader(compressed), executor=self.executor))),
+                         data)
+
+        pipeline = Pipeline.parse("bwt,mtf,o1")
+        piped = asyncio.run(collect(compress_async(pieces(), block_size=1500, mode=MODE_BYTES,
+                                                   executor=self.executor, pipeline=pipeline)))
+        self.assertEqual(piped, b"".join(compress_stream(io.BytesIO(data), block_size=1500, mode=MODE_BYTES,
+                                                         pipeline=pipeline)))
+        self.assertEqual(asyncio.run(collect(decompress_async(ChunkedReader(piped), executor=self.executor))), data)
+
+        broken = compressed[:-60] + bytes([compressed[-60] ^ 1]) + compressed[-59:]
+        with self.assertRaises(ValueError):
+            asyncio.run(collect(decompress_async(ChunkedReader(broken), executor=self.executor)))
+
+    def test_backpressure(self):
+        """Test input is not read ahead of the blocks being encoded"""
+        data = self.text.encode("utf-8")
+        source = ChunkedReader(data, chunk_size=100)
+
+        async def first_chunks():
+            stream = compress_async(source, block_size=100, mode=MODE_BYTES, executor=self.executor, max_pending=2)
+            chunks = [await stream.__anext__() for _ in range(3)]
+            await stream.aclose()
+            return chunks
+
+        asyncio.run(first_chunks())
+        self.assertLessEqual(source.position, 400)
+
+    def test_concurrent_requests(self):
+        """Test many requests share the default process pool"""
+        self.addCleanup(shutdown_shared_executor)
+        payloads = [(self.text * (i + 1)).encode("utf-8") for i in range(4)]
+
+        async def roundtrip(data):
+            compressed = await collect(compress_async(ChunkedReader(data, 4096), block_size=2000))
+            return await collect(decompress_async(ChunkedReader(compressed, 4096)))
+
+        async def serve():
+            return await asyncio.gather(*(roundtrip(data) for data in payloads))
+
+        self.assertEqual(asyncio.run(serve()), payloads)
+
+    def test_invalid_streams(self):
+        """Test broken streams raise ValueError"""
+        compressed = b"".join(compress_stream(io.StringIO("some text" * 10)))
+        for broken in (b"", b"XYZ\x04\x00", compressed[:-20]):
+            with self.assertRaises(ValueError):
+                asyncio.run(collect(decompress_async(ChunkedReader(broken), executor=self.executor)))
+
+if __name__ == '__main__':
+    unittest.main()
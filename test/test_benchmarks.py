@@ -0,0 +1,58 @@
+import unittest
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from benchmarks.Benchmark import compare, run_suite
+from benchmarks.Corpus import CORPORA, parse_size, write_corpus
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parse_size(self):
+        """Test size suffixes are powers of 1024"""
+        self.assertEqual(parse_size("1K"), 1024)
+        self.assertEqual(parse_size("64m"), 64 << 20)
+        self.assertEqual(parse_size("1GB"), 1 << 30)
+        self.assertEqual(parse_size("100"), 100)
+
+    def test_corpora_are_reproducible(self):
+        """Test every corpus is the same for the same seed and fits the requested size"""
+        for name in CORPORA:
+            first = os.path.join(self.directory.name, name + "-1")
+            second = os.path.join(self.directory.name, name + "-2")
+            write_corpus(name, 5000, first)
+            write_corpus(name, 5000, second)
+            with open(first, "rb") as a, open(second, "rb") as b:
+                data = a.read()
+                self.assertEqual(data, b.read())
+            self.assertTrue(4996 <= len(data) <= 5000)
+
+    def test_suite_and_regressions(self):
+        """Test a run compares clean with itself and flags a slower run"""
+        results = run_suite(["english"], [2048], self.directory.name, repeats=1)
+        case = results["cases"][0]
+        self.assertLess(case["ratio"], 1)
+        self.assertGreater(case["compress_peak_bytes"], 0)
+        self.assertEqual(compare(results, results), [])
+
+        piped = run_suite(["logs"], [4096], self.directory.name, repeats=1, measure_memory=False,
+                          pipelines=["", "bwt,mtf,rle"])
+        plain_case, piped_case = piped["cases"]
+        self.assertEqual(piped_case["pipeline"], "bwt,mtf,rle")
+        self.assertLess(piped_case["ratio"], plain_case["ratio"])
+        self.assertEqual(compare(piped, results), [])
+
+        faster = {"cases": [dict(case, compress_mb_s=case["compress_mb_s"] * 2)]}
+        regressions = compare(results, faster, threshold=0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("compress_mb_s", regressions[0])
+
+if __name__ == "__main__":
+    unittest.main()
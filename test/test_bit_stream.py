@@ -0,0 +1,48 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.BitStream import BitReader, BitWriter
+
+class TestBitStream(unittest.TestCase):
+    def test_write_read_roundtrip(self):
+        """Test fields of mixed widths survive a write/read roundtrip"""
+        fields = [(1, 1), (0, 3), (0x1F, 5), (0x12345, 17), (0, 1), (0xFFFFFFFF, 32)] * 50
+        writer = BitWriter()
+        for value, length in fields:
+            writer.write(value, length)
+        bit_count = writer.bit_count
+
+        reader = BitReader(writer.getvalue(), bit_count)
+        self.assertEqual([reader.read(length) for _, length in fields], [v for v, _ in fields])
+        self.assertEqual(reader.remaining(), 0)
+
+    def test_write_symbols(self):
+        """Test bulk symbol writing matches single writes and pads with zeros"""
+        codes = {'A': (0, 1), 'B': (2, 2), 'C': (3, 2)}
+        text = "ABCAACB" * 300
+
+        bulk = BitWriter()
+        bulk.write_symbols(text, codes)
+        single = BitWriter()
+        for char in text:
+            single.write(*codes[char])
+
+        self.assertEqual(bulk.bit_count, single.bit_count)
+        self.assertEqual(bulk.getvalue(), single.getvalue())
+
+        writer = BitWriter()
+        writer.write_symbols("BA", codes)
+        self.assertEqual((writer.bit_count, bytes(writer.getvalue())), (3, b"\x80"))
+
+    def test_read_past_end(self):
+        """Test reading beyond the bit count raises ValueError"""
+        reader = BitReader(b"\xff", 5)
+        self.assertEqual(reader.read(4), 0xF)
+        with self.assertRaises(ValueError):
+            reader.read(2)
+
+if __name__ == '__main__':
+    unittest.main()
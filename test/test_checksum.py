@@ -0,0 +1,20 @@
+import unittest
+import os
+import zlib
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.Checksum import crc32_combine
+
+class TestChecksum(unittest.TestCase):
+    def test_combine_matches_zlib(self):
+        """Test combined checksums equal the checksum of the joined data"""
+        pieces = [b"", b"a", b"hello world", bytes(range(256)) * 40, os.urandom(12345)]
+        for first in pieces:
+            for second in pieces:
+                self.assertEqual(crc32_combine(zlib.crc32(first), zlib.crc32(second), len(second)),
+                                 zlib.crc32(first + second))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import itertools
+import os
+import io
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.HuffmanCoding import HuffmanCoding
+from src.Codebook import (canonical_codes, code_lengths, code_lengths_from_tree, deserialize_codebook,
+                          limited_code_lengths, read_varint, serialize_codebook, write_varint)
+from src.Container import compress_stream, decompress_stream
+from src.DecodeTable import DecodeTable
+from src.Stats import CodingStats
+
+class TestCodebook(unittest.TestCase):
+    def test_varint_roundtrip(self):
+        """Test LEB128 encoding of small and large values"""
+        for value in (0, 1, 127, 128, 300, 0x10FFFF, 2**40):
+            encoded = write_varint(value)
+            self.assertEqual(read_varint(encoded + b"\xff", 0), (value, len(encoded)))
+
+        with self.assertRaises(ValueError):
+            read_varint(b"\x80", 0)
+
+    def test_canonical_codes(self):
+        """Test canonical code assignment"""
+        codes = canonical_codes({'A': 1, 'B': 2, 'C': 3, 'D': 3})
+        self.assertEqual(codes, {'A': (0, 1), 'B': (2, 2), 'C': (6, 3), 'D': (7, 3)})
+
+        with self.assertRaises(ValueError):
+            canonical_codes({'A': 1, 'B': 1, 'C': 1})
+
+    def test_code_lengths_match_tree(self):
+        """Test lengths are taken from the depth of each leaf"""
+        huffman = HuffmanCoding()
+        huffman.text_from_file = "AABBCCC"
+        huffman._build_huffman_tree()
+        huffman._generate_codes_for_each_char()
+
+        lengths = code_lengths_from_tree(huffman.root)
+        self.assertEqual(lengths, {char: len(code) for char, code in huffman.codes.items()})
+
+    def test_code_lengths_from_frequencies(self):
+        """Test lengths computed from frequencies match the node-based tree"""
+        huffman = HuffmanCoding()
+        huffman.text_from_file = "AAAAAAAABBBBCCDEFFFFFGGG"
+        huffman._build_huffman_tree()
+
+        lengths = code_lengths(huffman.symbols_freq)
+        total = sum(huffman.symbols_freq[c] * l for c, l in lengths.items())
+        tree_lengths = code_lengths_from_tree(huffman.root)
+        self.assertEqual(total, sum(huffman.symbols_freq[c] * l for c, l in tree_lengths.items()))
+        self.assertEqual(code_lengths({'A': 5}), {'A': 1})
+
+    def test_serialize_deserialize_codebook(self):
+        """Test codebook roundtrip and header size"""
+        lengths = {ord(c): 2 + i % 5 for i, c in enumerate("etaoinshrdlucmfwyp€ü")}
+        data = serialize_codebook(lengths)
+        self.assertEqual(deserialize_codebook(data + b"rest"), (lengths, len(data)))
+
+        # A leaf of the old pre-order tree took 33 bits, an ASCII symbol here takes about a byte
+        ascii_lengths = {symbol: 4 + symbol % 6 for symbol in range(32, 127)}
+        self.assertLess(len(serialize_codebook(ascii_lengths)) * 8, 33 * len(ascii_lengths) / 3)
+
+    def fibonacci_freqs(self, count):
+        freqs = {}
+        a, b = 1, 1
+        for symbol in range(count):
+            freqs[symbol] = a
+            a, b = b, a + b
+        return freqs
+
+    def test_limited_code_lengths(self):
+        """Test package-merge respects the limit and keeps a complete prefix code"""
+        freqs = self.fibonacci_freqs(30)
+        self.assertEqual(max(code_lengths(freqs).values()), 29)
+        for max_length in (5, 11, 15):
+            lengths = limited_code_lengths(freqs, max_length)
+            self.assertEqual(max(lengths.values()), max_length)
+            self.assertEqual(sum(2 ** -length for length in lengths.values()), 1)
+
+        self.assertEqual(limited_code_lengths({"a": 5, "b": 1}, 4), code_lengths({"a": 5, "b": 1}))
+        with self.assertRaises(ValueError):
+            limited_code_lengths(freqs, 4)
+
+    def test_limited_code_lengths_are_optimal(self):
+        """Test package-merge matches the best lengths found by brute force"""
+        freqs = {0: 1, 1: 1, 2: 2, 3: 3, 4: 50, 5: 1000}
+        best = min(sum(length * freq for length, freq in zip(combo, freqs.values()))
+                   for combo in itertools.product(range(1, 4), repeat=len(freqs))
+                   if sum(2 ** -length for length in combo) <= 1)
+        lengths = limited_code_lengths(freqs, 3)
+        self.assertEqual(sum(lengths[symbol] * freq for symbol, freq in freqs.items()), best)
+
+    def test_limited_stream_decodes_in_two_lookups(self):
+        """Test a length-limited stream reports its ratio loss and needs at most two lookups per code"""
+        text = "".join(chr(65 + symbol) * freq for symbol, freq in self.fibonacci_freqs(22).items())
+        stats = CodingStats("compress")
+        stream = b"".join(compress_stream(io.StringIO(text), stats=stats, max_code_length=13))
+        self.assertEqual(stats.max_code_length, 13)
+        self.assertEqual(stats.limited_blocks, 1)
+        self.assertGreater(stats.limit_loss_bits, 0)
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))).decode("utf-8"), text)
+
+        lengths = limited_code_lengths(self.fibonacci_freqs(22), 13)
+        self.assertEqual(DecodeTable(canonical_codes(lengths), lambda s: bytes([s]), bits=7).max_lookups, 2)
+        with self.assertRaises(ValueError):
+            b"".join(compress_stream(io.StringIO(text), max_code_length=40))
+
+    def test_code_length_limit_below_alphabet_size(self):
+        """Test blocks with more distinct symbols than the limit can code get the fewest bits that fit them"""
+        text = "".join(chr(0x4E00 + symbol) * (1 + symbol % 3) for symbol in range(5000)) + "a" * 20000
+        stats = CodingStats("compress")
+        stream = b"".join(compress_stream(io.StringIO(text), stats=stats, max_code_length=11))
+        self.assertEqual(stats.max_code_length, 13)
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))).decode("utf-8"), text)
+
+if __name__ == '__main__':
+    unittest.main()
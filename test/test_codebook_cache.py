@@ -0,0 +1,58 @@
+import unittest
+import os
+import io
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.CodebookCache import (DEFAULT_MAX_CODEBOOKS, DEFAULT_MAX_TABLES, LRUCache, cache_info, clear_caches,
+                               configure_caches)
+from src.Container import compress_stream, decompress_stream
+from src.Stats import CodingStats
+
+class TestCodebookCache(unittest.TestCase):
+    def setUp(self):
+        clear_caches()
+        self.text = "".join(f"record {i % 10} ok\n" for i in range(400))
+
+    def tearDown(self):
+        configure_caches(DEFAULT_MAX_TABLES, DEFAULT_MAX_CODEBOOKS)
+        clear_caches()
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is dropped first"""
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get_or_build("c", lambda: 0), (3, True))
+        self.assertEqual(cache.info(), {"entries": 2, "max_entries": 2, "hits": 2, "misses": 1, "evictions": 1})
+
+    def test_repeated_blocks_hit(self):
+        """Test identical blocks reuse the codes and the decode table built for the first one"""
+        stats = CodingStats("compress")
+        cold = b"".join(compress_stream(io.StringIO(self.text * 3), len(self.text), stats=stats))
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 1))
+
+        stats = CodingStats("decompress")
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(cold), stats)).decode("utf-8"), self.text * 3)
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 1))
+
+        info = cache_info()
+        self.assertEqual(info["codebooks"]["hits"], 2)
+        self.assertEqual(info["decode_tables"]["hits"], 2)
+
+    def test_output_does_not_depend_on_cache(self):
+        """Test a warm cache writes exactly what a cold or disabled one does"""
+        warm = b"".join(compress_stream(io.StringIO(self.text), 500))
+        self.assertEqual(b"".join(compress_stream(io.StringIO(self.text), 500)), warm)
+
+        configure_caches(max_tables=0, max_codebooks=0)
+        stats = CodingStats("compress")
+        self.assertEqual(b"".join(compress_stream(io.StringIO(self.text), 500, stats=stats)), warm)
+        self.assertEqual(stats.cache_hits, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.CommandLine import expand_paths, main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        os.makedirs(os.path.join(self.root, "nested"))
+        self.files = {
+            os.path.join(self.root, "a.txt"): "command line ü€ text\n".encode("utf-8") * 200,
+            os.path.join(self.root, "nested", "b.bin"): bytes(range(256)) * 40,
+        }
+        for path, data in self.files.items():
+            with open(path, "wb") as file:
+                file.write(data)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_expand_paths(self):
+        """Test directories are walked and glob patterns expanded"""
+        self.assertEqual(expand_paths([self.root]), sorted(self.files))
+        self.assertEqual(expand_paths([os.path.join(self.root, "*.txt")]), [os.path.join(self.root, "a.txt")])
+        with self.assertRaises(FileNotFoundError):
+            expand_paths([os.path.join(self.root, "missing")])
+
+    def test_compress_verify_decompress(self):
+        """Test a batch roundtrip through the command line entry point"""
+        out = os.path.join(self.root, "out")
+        self.assertEqual(main(["-j", "1", "compress", "--checksum", self.root]), 0)
+        self.assertEqual(main(["-j", "1", "verify", self.root]), 0)
+        self.assertEqual(main(["-j", "1", "decompress", "-o", out, self.root]), 0)
+
+        for path, data in self.files.items():
+            with open(os.path.join(out, os.path.basename(path)), "rb") as file:
+                self.assertEqual(file.read(), data)
+
+    def test_pipeline_option(self):
+        """Test --pipeline compresses through the stages and rejects unknown ones"""
+        text = sorted(self.files)[0]
+        self.assertEqual(main(["-j", "1", "compress", "--pipeline", "bwt,mtf,rle", text]), 0)
+        os.remove(text)
+        self.assertEqual(main(["-j", "1", "decompress", text + ".huff"]), 0)
+        with open(text, "rb") as file:
+            self.assertEqual(file.read(), self.files[text])
+        with self.assertRaises(SystemExit):
+            main(["compress", "--pipeline", "zip", text])
+
+    def test_append(self):
+        """Test files appended to an archive come out after its data"""
+        text, binary = sorted(self.files)
+        archive = os.path.join(self.root, "joined.huff")
+        self.assertEqual(main(["-j", "1", "compress", "--mode", "bytes", text]), 0)
+        os.rename(text + ".huff", archive)
+        self.assertEqual(main(["-j", "1", "append", archive, binary]), 0)
+        self.assertEqual(main(["-j", "1", "decompress", archive]), 0)
+
+        with open(os.path.join(self.root, "joined"), "rb") as file:
+            self.assertEqual(file.read(), self.files[text] + self.files[binary])
+
+    def test_append_with_dictionary(self):
+        """Test files appended with a dictionary, without --new-codebooks, decode with it"""
+        text = os.path.join(self.root, "a.txt")
+        dictionary = os.path.join(self.root, "text.dict")
+        archive = text + ".huff"
+        self.assertEqual(main(["train", "-o", dictionary, text]), 0)
+        self.assertEqual(main(["-j", "1", "compress", "-D", dictionary, text]), 0)
+        self.assertEqual(main(["-j", "1", "append", "-D", dictionary, archive, text]), 0)
+        os.remove(text)
+        self.assertEqual(main(["-j", "1", "decompress", "-D", dictionary, archive]), 0)
+
+        with open(text, "rb") as file:
+            self.assertEqual(file.read(), self.files[text] * 2)
+
+    def test_failure_exit_code(self):
+        """Test a corrupted archive makes the command exit with 1"""
+        archive = os.path.join(self.root, "broken.huff")
+        with open(archive, "wb") as file:
+            file.write(b"not an archive")
+        self.assertEqual(main(["-j", "1", "verify", archive]), 1)
+
+    def test_library_does_not_import_gui(self):
+        """Test the compression modules load without PyQt6, and without NumPy until a large block needs it"""
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, src.HuffmanCoding, src.CommandLine; "
+                                   "print('PyQt6' in sys.modules, 'numpy' in sys.modules)"],
+            cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "False False")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+import unittest
+import os
+import io
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import random
+import zlib
+from src.Codebook import write_varint
+from src.Container import (BLOCK_HUFFMAN, BLOCK_REPEAT, BLOCK_STORED, MODE_BYTES, MODE_TEXT, BufferReader,
+                           byte_histogram, codebook_end, compress_stream, decompress_stream, decode_block, detect_mode,
+                           encode_block, encode_frame, read_frames, read_index, read_range, read_stream_header,
+                           read_stream_info, verify_stream)
+from src.Dictionary import train_dictionary
+from src.ParallelCoding import compress_parallel, decompress_parallel, verify_parallel
+
+class TestContainer(unittest.TestCase):
+    def test_block_roundtrip(self):
+        """Test a single block decodes to the UTF-8 bytes of its text"""
+        text = "Block of text ü€ with a tail\n" * 20
+        body, decoded_size = encode_block(text)
+        self.assertEqual(decoded_size, len(text.encode("utf-8")))
+        self.assertEqual(decode_block(body), text.encode("utf-8"))
+        self.assertEqual(decode_block(encode_block("x")[0]), b"x")
+
+    def test_stream_roundtrip(self):
+        """Test many small blocks stream back in order"""
+        text = "".join(f"line {i}: {'abc' * (i % 7)} €\n" for i in range(500))
+        compressed = b"".join(compress_stream(io.StringIO(text), block_size=100))
+
+        chunks = list(decompress_stream(io.BytesIO(compressed)))
+        self.assertEqual(len(chunks), (len(text) + 99) // 100)
+        self.assertEqual(b"".join(chunks), text.encode("utf-8"))
+
+    def test_buffer_reader(self):
+        """Test streams decode from zero-copy memoryview reads"""
+        text = "buffered stream €" * 300
+        compressed = b"".join(compress_stream(io.StringIO(text), block_size=500))
+
+        reader = BufferReader(compressed)
+        self.assertIsInstance(reader.read(4), memoryview)
+        reader.seek(0)
+        self.assertEqual(b"".join(decompress_stream(reader)), text.encode("utf-8"))
+        self.assertEqual(reader.seek(0, 2), len(compressed))
+
+    def test_empty_stream(self):
+        """Test an empty input gives a valid stream without blocks"""
+        compressed = b"".join(compress_stream(io.StringIO("")))
+        self.assertEqual(list(decompress_stream(io.BytesIO(compressed))), [])
+
+    def test_invalid_streams(self):
+        """Test broken streams raise ValueError"""
+        compressed = b"".join(compress_stream(io.StringIO("some text" * 10)))
+
+        _, frame_offset, frame_length = read_index(io.BytesIO(compressed))[0][-1]
+        end = frame_offset + frame_length  # offset of the end marker
+        for broken in (b"", b"XYZ\x03", b"HUF\x09", compressed[:end], compressed[:end - 5],
+                       compressed[:5] + b"\x07" + compressed[6:], b"HUF\x04"):
+            with self.assertRaises(ValueError):
+                list(decompress_stream(io.BytesIO(broken)))
+
+    def test_bytes_mode(self):
+        """Test arbitrary binary data, including invalid UTF-8, streams back unchanged"""
+        data = bytes(range(256)) * 20 + b"\xff\xfe\x00" * 500 + b"plain ascii" * 100
+        compressed = b"".join(compress_stream(io.BytesIO(data), block_size=1000, mode=MODE_BYTES))
+        self.assertEqual(compressed[4], 1)  # bytes flag
+
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(compressed))), data)
+
+    def test_byte_histogram(self):
+        """Test the histogram counts every byte value"""
+        histogram = byte_histogram(b"\x00\x00\xffab")
+        self.assertEqual(len(histogram), 256)
+        self.assertEqual((histogram[0], histogram[255], histogram[ord("a")], histogram[1]), (2, 1, 1, 0))
+
+    def test_detect_mode(self):
+        """Test UTF-8 files are detected as text and others as bytes"""
+        for content, mode in ((b"plain \xe2\x82\xac text", MODE_TEXT), (b"\x89PNG\r\n\x1a\n\xff\x00", MODE_BYTES)):
+            path = "test_detect.bin"
+            self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+            with open(path, "wb") as f:
+                f.write(content)
+            self.assertEqual(detect_mode(path), mode)
+
+    def test_block_index(self):
+        """Test the index lists every block with its offsets"""
+        text = "0123456789" * 100
+        compressed = b"".join(compress_stream(io.StringIO(text), block_size=300))
+
+        entries, total_size = read_index(io.BytesIO(compressed))
+        self.assertEqual(total_size, len(text))
+        self.assertEqual([decoded_offset for decoded_offset, _, _ in entries], [0, 300, 600, 900])
+        for _, frame_offset, frame_length in entries:
+            self.assertEqual(compressed[frame_offset], 1)
+        self.assertEqual(compressed[entries[-1][1] + entries[-1][2]], 0)  # end marker
+
+    def test_read_range(self):
+        """Test ranges inside, across and past blocks"""
+        text = "".join(f"log line {i:04d} €\n" for i in range(400))
+        data = text.encode("utf-8")
+        path = "test_range.huff"
+        self.addCleanup(os.remove, path)
+        with open(path, "wb") as f:
+            for chunk in compress_stream(io.StringIO(text), block_size=512):
+                f.write(chunk)
+
+        for start, length in ((0, 10), (500, 30), (511, 2), (1000, 4000), (len(data) - 3, 10), (len(data), 5)):
+            self.assertEqual(read_range(path, start, length), data[start:start + length])
+
+        with self.assertRaises(ValueError):
+            read_range(path, -1, 5)
+
+    def block_types(self, stream):
+        src = io.BytesIO(stream)
+        read_stream_header(src)
+        return [block_type for block_type, _ in read_frames(src)]
+
+    def test_incompressible_data_is_stored(self):
+        """Test random, already compressed and tiny inputs grow by no more than the frame overhead"""
+        rng = random.Random(5)
+        text = "".join(f"stored line {i} ü€\n" for i in range(2000))
+        # Huffman codes may still win on some blocks of zlib output, but never lose.
+        compressed = zlib.compress(text.encode("utf-8"), 9)
+        inputs = [rng.randbytes(5000), compressed, b"a", b"ab", "ü", "tiny"]
+        dictionary = train_dictionary([bytes(range(256))], MODE_BYTES)
+        for data in inputs:
+            mode = MODE_TEXT if isinstance(data, str) else MODE_BYTES
+            raw = data.encode("utf-8") if mode == MODE_TEXT else data
+            for options in ({}, {"checksums": True}, {"max_code_length": 9},
+                            {"dictionary": dictionary} if mode == MODE_BYTES else {"adaptive": True}):
+                with self.subTest(data=data[:8], options=options):
+                    source = io.StringIO if mode == MODE_TEXT else io.BytesIO
+                    stream = b"".join(compress_stream(source(data), 2000, mode, **options))
+                    empty = b"".join(compress_stream(source(data[:0]), 2000, mode, **options))
+                    if data is not compressed:
+                        self.assertEqual(set(self.block_types(stream)), {BLOCK_STORED})
+                    self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))), raw)
+
+                    entries, _ = read_index(io.BytesIO(stream))
+                    overhead = len(empty) + sum(1 + len(write_varint(length)) + 3 * len(write_varint(len(stream)))
+                                                for _, _, length in entries)
+                    overhead += 4 * len(entries) if options.get("checksums") else 0
+                    self.assertLessEqual(len(stream) - len(raw), overhead)
+
+        # Header, stored frame, end marker, index and trailer; no index entry for a single block.
+        for size in (1, 5, 100):
+            data = rng.randbytes(size)
+            stream = b"".join(compress_stream(io.BytesIO(data), mode=MODE_BYTES))
+            self.assertEqual(len(stream), 5 + (2 + size) + 1 + 2 + 2)
+            self.assertEqual(read_index(io.BytesIO(stream)), ([(0, 5, 2 + size)], size))
+
+        block_type, body, decoded_size = encode_frame(b"\x00", MODE_BYTES, dictionary)
+        self.assertEqual((block_type, bytes(body), decoded_size), (BLOCK_STORED, b"\x00", 1))
+        block_type, _, _ = encode_frame(b"\x00" * 100, MODE_BYTES)
+        self.assertEqual(block_type, BLOCK_HUFFMAN)
+
+        # Decoding stops at the recorded size rather than trimming or growing the output.
+        body, decoded_size = encode_block("recorded size " * 20)
+        offset = codebook_end(body)
+        shrunk = body[:offset] + write_varint(decoded_size - 1) + body[offset + len(write_varint(decoded_size)):]
+        with self.assertRaises(ValueError):
+            decode_block(shrunk)
+
+    def test_adaptive_blocks(self):
+        """Test adaptive mode reuses codebooks of similar blocks and stores random ones"""
+        text = "".join(f"GET /items/{i % 50} 200\n" for i in range(300))
+        stream = b"".join(compress_stream(io.StringIO(text), block_size=1000, adaptive=True))
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))).decode("utf-8"), text)
+        types = self.block_types(stream)
+        self.assertEqual(types[0], BLOCK_HUFFMAN)
+        self.assertIn(BLOCK_REPEAT, types)
+        self.assertLess(len(stream), len(b"".join(compress_stream(io.StringIO(text), block_size=1000))))
+
+        data = os.urandom(3000)
+        stream = b"".join(compress_stream(io.BytesIO(data), block_size=1000, mode=MODE_BYTES, adaptive=True))
+        self.assertEqual(self.block_types(stream), [BLOCK_STORED] * 3)
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))), data)
+
+    def test_adaptive_parallel_and_ranges(self):
+        """Test adaptive streams are identical in parallel and support random access"""
+        text = "".join(f"line {i} " + ("abc" if i % 200 < 100 else "xyz€") * 3 + "\n" for i in range(600))
+        data = text.encode("utf-8")
+        stream = b"".join(compress_stream(io.StringIO(text), block_size=700, adaptive=True))
+        parallel = b"".join(compress_parallel(io.StringIO(text), block_size=700, workers=2, adaptive=True))
+        self.assertEqual(parallel, stream)
+
+        path = "test_adaptive_range.huff"
+        self.addCleanup(os.remove, path)
+        with open(path, "wb") as f:
+            f.write(stream)
+        self.assertIn(BLOCK_REPEAT, self.block_types(stream))
+        for start, length in ((0, 50), (2000, 3000), (len(data) - 100, 100)):
+            self.assertEqual(read_range(path, start, length), data[start:start + length])
+
+    def test_checksums(self):
+        """Test streams with checksums roundtrip, verify and reject any changed payload byte"""
+        text = "".join(f"checked line {i} ü€\n" for i in range(300))
+        data = text.encode("utf-8")
+        stream = b"".join(compress_stream(io.StringIO(text), block_size=1000, adaptive=True, checksums=True))
+        self.assertEqual(read_stream_info(io.BytesIO(stream)), (MODE_TEXT, True, None))
+        self.assertEqual(b"".join(compress_parallel(io.StringIO(text), block_size=1000, workers=2, adaptive=True,
+                                                    checksums=True)), stream)
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))), data)
+        self.assertEqual(verify_stream(io.BytesIO(stream)), len(data))
+        self.assertEqual(verify_parallel(io.BytesIO(stream), workers=2), len(data))
+
+        entries, _ = read_index(io.BytesIO(stream))
+        _, frame_offset, frame_length = entries[1]
+        for position in (frame_offset + frame_length - 1, frame_offset + frame_length - 6,
+                         entries[-1][1] + entries[-1][2] + 2):  # block checksum, payload, stream checksum
+            broken = bytearray(stream)
+            broken[position] ^= 0x10
+            for check in (lambda src: b"".join(decompress_stream(src)), verify_stream,
+                          lambda src: b"".join(decompress_parallel(src, workers=2))):
+                with self.assertRaises(ValueError):
+                    check(io.BytesIO(bytes(broken)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.DecodeTable import DecodeTable
+
+def encode(codes, symbols):
+    """Packs the codes of `symbols` MSB-first, returns (bytes, bit count)"""
+    bits = "".join(format(codes[s][0], f"0{codes[s][1]}b") for s in symbols)
+    padded = bits + "0" * ((8 - len(bits) % 8) % 8)
+    return bytes(int(padded[i:i+8], 2) for i in range(0, len(padded), 8)), len(bits)
+
+class TestDecodeTable(unittest.TestCase):
+    def setUp(self):
+        # A -> 0, B -> 10, C -> 110, D -> 1110, ... a deep, skewed code
+        self.codes = {chr(ord('A') + i): ((1 << (i + 1)) - 2, i + 1) for i in range(20)}
+        self.codes['Z'] = ((1 << 20) - 1, 20)
+
+    def test_decode_short_and_long_codes(self):
+        """Test codes shorter and longer than the root window"""
+        text = "ABACADAZAEBTZZA" * 50
+        data, bit_count = encode(self.codes, text)
+
+        for bits in (1, 4, 12, 16):
+            table = DecodeTable(self.codes, lambda s: s.encode("utf-8"), bits=bits)
+            self.assertEqual(table.decode(data, bit_count), text.encode("utf-8"))
+
+    def test_multi_symbol_entries(self):
+        """Test one root lookup resolves several short codes"""
+        table = DecodeTable(self.codes, lambda s: s.encode("utf-8"), bits=8)
+        piece, size, used = table._entries[0]
+        self.assertEqual(piece, b"A" * 8)
+        self.assertEqual((size, used), (8, 8))
+
+    def test_multibyte_symbols(self):
+        """Test symbols decoding to several bytes"""
+        codes = {'€': (0, 1), 'ü': (2, 2), 'a': (3, 2)}
+        text = "€üa€€aü" * 100
+        data, bit_count = encode(codes, text)
+        table = DecodeTable(codes, lambda s: s.encode("utf-8"))
+        self.assertEqual(table.decode(data, bit_count).decode("utf-8"), text)
+
+    def test_progress_reporting(self):
+        """Test progress is reported per segment and reaches 100"""
+        codes = {'A': (0, 1), 'B': (1, 1)}
+        data, bit_count = encode(codes, "AB" * 400000)
+        progress = []
+        DecodeTable(codes, lambda s: s.encode("utf-8")).decode(data, bit_count, progress.append)
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(progress[-1], 100)
+
+    def test_invalid_data(self):
+        """Test truncated payloads and unknown codes raise ValueError"""
+        table = DecodeTable(self.codes, lambda s: s.encode("utf-8"))
+        data, bit_count = encode(self.codes, "AZ")
+        with self.assertRaises(ValueError):
+            table.decode(data, bit_count + 8)
+        with self.assertRaises(ValueError):
+            table.decode(data, bit_count - 1)
+
+        single = DecodeTable({'A': (0, 1)}, lambda s: s.encode("utf-8"))
+        with self.assertRaises(ValueError):
+            single.decode(b"\xff\xff", 16)
+
+        with self.assertRaises(ValueError):
+            DecodeTable({}, lambda s: s.encode("utf-8"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import os
+import io
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.CommandLine import main
+from src.Container import (BLOCK_DICTIONARY, BLOCK_HUFFMAN, MODE_BYTES, compress_stream, decompress_stream,
+                           encode_frame, read_frames, read_stream_header)
+from src.Dictionary import Dictionary, load_dictionary, save_dictionary, train_dictionary
+from src.HuffmanCoding import HuffmanCoding
+
+class TestDictionary(unittest.TestCase):
+    def setUp(self):
+        self.records = [f'{{"id": {i}, "name": "user{i % 97}", "ok": {str(i % 3 == 0).lower()}}}\n'
+                        for i in range(300)]
+        self.dictionary = train_dictionary(self.records[:100])
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def roundtrip(self, text, dictionary, block_size=1024):
+        stream = b"".join(compress_stream(io.StringIO(text), block_size, dictionary=dictionary))
+        decoded = b"".join(decompress_stream(io.BytesIO(stream), dictionaries={dictionary.dictionary_id: dictionary}))
+        self.assertEqual(decoded.decode("utf-8"), text)
+        return stream
+
+    def test_roundtrip_is_smaller_than_own_codebook(self):
+        """Test a small record coded with the dictionary beats one with its own codebook"""
+        record = self.records[250]
+        with_dictionary = self.roundtrip(record, self.dictionary)
+        without = b"".join(compress_stream(io.StringIO(record)))
+        self.assertLess(len(with_dictionary), len(without))
+
+    def test_escaped_symbols(self):
+        """Test symbols the dictionary never saw are escaped and restored"""
+        text = "€" + self.records[200] + "日本" + self.records[201] + "ü"
+        stream = self.roundtrip(text, self.dictionary)
+
+        src = io.BytesIO(stream)
+        read_stream_header(src)
+        self.assertEqual([block_type for block_type, _ in read_frames(src)], [BLOCK_DICTIONARY])
+
+    def test_falls_back_when_too_much_is_unseen(self):
+        """Test a block unlike the training data gets its own codebook"""
+        text = "".join(chr(0x4E00 + i) for i in range(500))
+        self.assertEqual(encode_frame(text, dictionary=self.dictionary)[0], BLOCK_HUFFMAN)
+        self.roundtrip(text, self.dictionary)
+
+    def test_bytes_mode_never_escapes(self):
+        """Test a bytes dictionary has a code for every byte value"""
+        dictionary = train_dictionary([b"aaab" * 50], mode=MODE_BYTES)
+        self.assertEqual(len(dictionary.lengths), 256)
+        data = bytes(range(256)) + b"aaab" * 20
+        stream = b"".join(compress_stream(io.BytesIO(data), mode=MODE_BYTES, dictionary=dictionary))
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream), dictionaries={dictionary.dictionary_id: dictionary})), data)
+
+    def test_save_and_load(self):
+        """Test a saved dictionary loads with the same ID and codes"""
+        path = os.path.join(self.directory.name, "records.hufd")
+        save_dictionary(self.dictionary, path)
+        loaded = load_dictionary(path)
+        self.assertEqual(loaded.dictionary_id, self.dictionary.dictionary_id)
+        self.assertEqual(loaded.codes, self.dictionary.codes)
+        with self.assertRaises(ValueError):
+            Dictionary.from_bytes(b"HUF\x04")
+
+    def test_missing_dictionary(self):
+        """Test decoding without the dictionary fails clearly"""
+        stream = b"".join(compress_stream(io.StringIO(self.records[0]), dictionary=self.dictionary))
+        with self.assertRaisesRegex(ValueError, "Dictionary"):
+            b"".join(decompress_stream(io.BytesIO(stream)))
+
+    def test_files_and_command_line(self):
+        """Test training, compressing and decompressing files through the command line"""
+        samples = os.path.join(self.directory.name, "samples")
+        records = os.path.join(self.directory.name, "records")
+        os.makedirs(samples)
+        os.makedirs(records)
+        for i, record in enumerate(self.records):
+            with open(os.path.join(samples if i < 100 else records, f"{i}.json"), "w", encoding="utf-8") as f:
+                f.write(record)
+
+        path = os.path.join(self.directory.name, "records.hufd")
+        out = os.path.join(self.directory.name, "out")
+        self.assertEqual(main(["train", "-o", path, samples]), 0)
+        self.assertEqual(main(["-j", "1", "compress", "-D", path, records]), 0)
+        self.assertEqual(main(["-j", "1", "verify", records]), 1)
+        self.assertEqual(main(["-j", "1", "decompress", "-D", path, "-o", out, records]), 0)
+
+        with open(os.path.join(out, "150.json"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), self.records[150])
+        HuffmanCoding().verify_data(os.path.join(records, "150.json.huff"), dictionaries=[path])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,16 @@
 import unittest
 import os
 import io
-from unittest.mock import patch
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
-from src.HuffmanCoding import HuffmanNode, HuffmanCoding
+from concurrent.futures import ThreadPoolExecutor
+from src.HuffmanCoding import (HuffmanNode, HuffmanCoding, compress_bytes, compress_file, decompress_bytes,
+                               decompress_file)
+from src.Container import BLOCK_REPEAT, MODE_BYTES, MODE_TEXT, read_index, read_range
+from src.BitStream import BitReader, BitWriter
+from src.Codebook import code_lengths
 
 class TestHuffmanCoding(unittest.TestCase):
     def setUp(self):
@@ -66,15 +70,40 @@ class TestHuffmanCoding(unittest.TestCase):
         self.huffman.text_from_file = "TEST"
         self.huffman._build_huffman_tree()
         
-        serialized = self.huffman._serialize_tree()
+        writer = BitWriter()
+        self.huffman._serialize_tree(writer)
+        bit_count = writer.bit_count
         original_root = self.huffman.root
-        self.huffman.root, _ = self.huffman._deserialize_tree(serialized)
+        self.huffman.root = self.huffman._deserialize_tree(BitReader(writer.getvalue(), bit_count))
         
         self.assertEqual(original_root.left_child.char, 
                         self.huffman.root.left_child.char)
         self.assertEqual(original_root.right_child.char, 
                         self.huffman.root.right_child.char)
 
+    def test_deep_and_wide_trees(self):
+        """Test trees deeper than the recursion limit and with large alphabets roundtrip"""
+        fibonacci = [1, 1]
+        while len(fibonacci) < 2 * sys.getrecursionlimit():
+            fibonacci.append(fibonacci[-1] + fibonacci[-2])
+        wide = {chr(0x4E00 + i): 1 + i % 7 for i in range(20000)}
+
+        for freqs in ({chr(0x100 + i): freq for i, freq in enumerate(fibonacci)}, wide):
+            huffman = HuffmanCoding()
+            huffman.text_from_file = ""
+            huffman.symbols_freq = dict(freqs)
+            huffman._build_huffman_tree()
+            huffman._generate_codes_for_each_char()
+            self.assertEqual(huffman.root.freq, sum(freqs.values()))
+            self.assertEqual(code_lengths(freqs), {char: len(code) for char, code in huffman.codes.items()})
+
+            writer = BitWriter()
+            huffman._serialize_tree(writer)
+            restored = HuffmanCoding()
+            restored.root = restored._deserialize_tree(BitReader(writer.getvalue(), writer.bit_count))
+            restored._generate_codes_for_each_char()
+            self.assertEqual(restored.codes, huffman.codes)
+
     def test_compress_decompress_roundtrip(self):
         """Test full compression/decompression cycle"""
         test_text = "Hello, World! "
@@ -94,6 +123,310 @@ class TestHuffmanCoding(unittest.TestCase):
         with open(output_file, 'r', encoding='utf-8') as f:
             self.assertEqual(f.read(), test_text)
 
+    def test_bytes_mode_roundtrip(self):
+        """Test non-UTF-8 files compress in bytes mode"""
+        test_data = bytes(range(256)) * 50 + b"\r\n\x00\xff" * 100
+        input_file = "test_input.bin"
+        compressed_file = "test_bin.huff"
+        output_file = "test_output.bin"
+        self.test_files.extend([input_file, compressed_file, output_file])
+
+        with open(input_file, 'wb') as f:
+            f.write(test_data)
+
+        self.huffman.compress_data(input_file, compressed_file, mode=MODE_BYTES)
+        self.huffman.decompress_data(compressed_file, output_file)
+
+        with open(output_file, 'rb') as f:
+            self.assertEqual(f.read(), test_data)
+
+    def test_line_endings_roundtrip(self):
+        """Test CRLF and lone CR line endings in text mode come back unchanged, also when appended"""
+        data = "".join(f"line {i} ü\r\n" if i % 3 else f"line {i}\r" for i in range(500)).encode("utf-8") + b"end\n"
+        input_file = "test_newlines.txt"
+        compressed_file = "test_newlines.huff"
+        output_file = "test_newlines_output.txt"
+        self.test_files.extend([input_file, compressed_file, output_file])
+        with open(input_file, 'wb') as f:
+            f.write(data)
+
+        self.huffman.compress_data(input_file, compressed_file, block_size=333, checksums=True)
+        self.huffman.append_data(input_file, compressed_file, block_size=333)
+        self.huffman.decompress_data(compressed_file, output_file)
+        with open(output_file, 'rb') as f:
+            self.assertEqual(f.read(), data + data)
+
+    def test_mmap_roundtrip(self):
+        """Test decompression straight from a memory-mapped archive"""
+        test_text = "".join(f"mapped {i} ü€\n" for i in range(2000))
+        input_file = "test_mmap_input.txt"
+        compressed_file = "test_mmap.huff"
+        output_file = "test_mmap_output.txt"
+        self.test_files.extend([input_file, compressed_file, output_file])
+
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write(test_text)
+
+        self.huffman.compress_data(input_file, compressed_file, block_size=1000)
+        for workers in (1, 2):
+            self.huffman.decompress_data(compressed_file, output_file, workers=workers, use_mmap=True)
+            with open(output_file, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), test_text)
+
+    def test_corrupted_mapped_archive(self):
+        """Test a corrupted archive raises ValueError when decoded from a memory map"""
+        input_file = "test_corrupt_input.txt"
+        compressed_file = "test_corrupt.huff"
+        output_file = "test_corrupt_output.txt"
+        self.test_files.extend([input_file, compressed_file, output_file])
+
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write("".join(f"corrupt {i}\n" for i in range(2000)))
+        self.huffman.compress_data(input_file, compressed_file, block_size=4000, checksums=True)
+        with open(compressed_file, 'r+b') as f:
+            f.seek(100)
+            byte = f.read(1)
+            f.seek(100)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+        with self.assertRaises(ValueError):
+            self.huffman.decompress_data(compressed_file, output_file, use_mmap=True)
+        with self.assertRaises(ValueError):
+            self.huffman.verify_data(compressed_file)
+
+    def test_append_roundtrip(self):
+        """Test appended files decompress after the archived data and reuse its codebook"""
+        first = "".join(f"first part {i} ü€\n" for i in range(1500))
+        second = "".join(f"second part {i} ü€\n" for i in range(1500))
+        input_file = "test_append_input.txt"
+        compressed_file = "test_append.huff"
+        output_file = "test_append_output.txt"
+        self.test_files.extend([input_file, compressed_file, output_file])
+
+        for workers, checksums in ((1, False), (2, True)):
+            with open(input_file, 'w', encoding='utf-8') as f:
+                f.write(first)
+            self.huffman.compress_data(input_file, compressed_file, block_size=4000, checksums=checksums)
+            with open(compressed_file, 'rb') as f:
+                archived_blocks = len(read_index(f)[0])
+            with open(input_file, 'w', encoding='utf-8') as f:
+                f.write(second)
+            self.huffman.append_data(input_file, compressed_file, block_size=4000, workers=workers)
+
+            self.huffman.decompress_data(compressed_file, output_file)
+            with open(output_file, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), first + second)
+            self.assertEqual(self.huffman.verify_data(compressed_file), len((first + second).encode("utf-8")))
+
+            with open(compressed_file, 'rb') as f:
+                entries, _ = read_index(f)
+                types = []
+                for _, frame_offset, _ in entries[archived_blocks:]:
+                    f.seek(frame_offset)
+                    types.append(f.read(1)[0])
+            self.assertIn(BLOCK_REPEAT, types)
+            boundary = len(first.encode("utf-8"))
+            self.assertEqual(read_range(compressed_file, boundary - 20, 40),
+                             (first + second).encode("utf-8")[boundary - 20:boundary + 20])
+
+    def test_failed_append_leaves_archive_unchanged(self):
+        """Test an append failing part way restores the archive byte for byte"""
+        input_file = "test_append_fail_input.txt"
+        compressed_file = "test_append_fail.huff"
+        self.test_files.extend([input_file, compressed_file])
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write("archived text ü€\n" * 500)
+        self.huffman.compress_data(input_file, compressed_file, block_size=1000, checksums=True)
+        with open(compressed_file, 'rb') as f:
+            archive = f.read()
+
+        with open(input_file, 'wb') as f:
+            f.write("valid text before the error\n".encode("utf-8") * 500 + b"\xff\xfe broken")
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                with self.assertRaises(UnicodeDecodeError):
+                    self.huffman.append_data(input_file, compressed_file, block_size=500, workers=workers)
+                with open(compressed_file, 'rb') as f:
+                    self.assertEqual(f.read(), archive)
+        self.assertGreater(self.huffman.verify_data(compressed_file), 0)
+
+    def test_append_bytes_mode(self):
+        """Test appending to a bytes mode archive, with new codebooks only"""
+        first = bytes(range(256)) * 20
+        second = b"\x00\x01\xff" * 3000
+        input_file = "test_append_input.bin"
+        compressed_file = "test_append_bin.huff"
+        output_file = "test_append_output.bin"
+        self.test_files.extend([input_file, compressed_file, output_file])
+
+        with open(input_file, 'wb') as f:
+            f.write(first)
+        self.huffman.compress_data(input_file, compressed_file, mode=MODE_BYTES)
+        with open(input_file, 'wb') as f:
+            f.write(second)
+        self.huffman.append_data(input_file, compressed_file, block_size=2000, adaptive=False)
+        self.huffman.decompress_data(compressed_file, output_file)
+
+        with open(output_file, 'rb') as f:
+            self.assertEqual(f.read(), first + second)
+
+    def test_pipeline_roundtrip(self):
+        """Test files compressed through a pipeline, in parallel and appended to, decompress"""
+        text = "".join(f"pipeline {i % 50} ü€\n" for i in range(3000))
+        input_file = "test_pipeline_input.txt"
+        compressed_file = "test_pipeline.huff"
+        output_file = "test_pipeline_output.txt"
+        self.test_files.extend([input_file, compressed_file, output_file])
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+        self.huffman.compress_data(input_file, compressed_file, block_size=8000, workers=2,
+                                   pipeline="bwt,mtf,rle", checksums=True)
+        plain_size = self.huffman.compress_data(input_file, output_file).output_bytes
+        self.assertLess(os.path.getsize(compressed_file), plain_size)
+        self.huffman.append_data(input_file, compressed_file, block_size=8000)
+
+        self.huffman.decompress_data(compressed_file, output_file, workers=2)
+        with open(output_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), text + text)
+        self.assertEqual(self.huffman.verify_data(compressed_file), 2 * len(text.encode("utf-8")))
+        self.assertEqual(read_range(compressed_file, 10, 30), (text + text).encode("utf-8")[10:40])
+
+    def test_parallel_roundtrip(self):
+        """Test compression and decompression with several worker processes"""
+        test_text = "".join(f"row {i} ü€\n" for i in range(3000))
+        input_file = "test_parallel_input.txt"
+        compressed_file = "test_parallel.huff"
+        output_file = "test_parallel_output.txt"
+        self.test_files.extend([input_file, compressed_file, output_file])
+
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write(test_text)
+
+        self.huffman.compress_data(input_file, compressed_file, block_size=2048, workers=2)
+        self.huffman.decompress_data(compressed_file, output_file, workers=2)
+
+        with open(output_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), test_text)
+
+    def test_decompress_legacy_format(self):
+        """Test files written with the pre-order tree header still decompress"""
+        test_text = "Legacy tree header ü€"
+        compressed_file = "test_legacy.huff"
+        output_file = "test_legacy_output.txt"
+        self.test_files.extend([compressed_file, output_file])
+
+        self.huffman.text_from_file = test_text
+        self.huffman._build_huffman_tree()
+        self.huffman._generate_codes_for_each_char()
+        tree_writer = BitWriter()
+        self.huffman._serialize_tree(tree_writer)
+        tree_length = tree_writer.bit_count
+        data_writer = BitWriter()
+        for char in test_text:
+            data_writer.write(int(self.huffman.codes[char], 2), len(self.huffman.codes[char]))
+        data_padding = (8 - data_writer.bit_count % 8) % 8
+
+        with open(compressed_file, 'wb') as f:
+            f.write(tree_length.to_bytes(4, 'big') +
+                    tree_writer.getvalue() +
+                    bytes([data_padding]) +
+                    data_writer.getvalue())
+
+        HuffmanCoding().decompress_data(compressed_file, output_file)
+        with open(output_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), test_text)
+
+    def test_in_memory_api(self):
+        """Test the module-level functions over bytes, str and file objects"""
+        text = "".join(f"in memory {i % 40} ü€\n" for i in range(2000))
+        data = bytes(range(256)) * 30
+        for options in ({}, {"adaptive": True}, {"checksums": True, "pipeline": "bwt,mtf,rle"},
+                        {"max_code_length": 9}, {"block_size": 500, "pipeline": "o1"}):
+            with self.subTest(options=options):
+                self.assertEqual(decompress_bytes(compress_bytes(text, **options)), text.encode("utf-8"))
+                self.assertEqual(decompress_bytes(compress_bytes(data, **options)), data)
+        self.assertEqual(decompress_bytes(compress_bytes(b"")), b"")
+        self.assertEqual(compress_bytes(text.encode("utf-8"), mode=MODE_TEXT), compress_bytes(text))
+
+        class Unseekable:
+            def __init__(self, data):
+                self.read = io.BytesIO(data).read
+
+        compressed = io.BytesIO()
+        stats = compress_file(Unseekable(text.encode("utf-8")), compressed, block_size=700, mode=MODE_TEXT)
+        self.assertEqual(compressed.getvalue(), compress_bytes(text, block_size=700))
+        self.assertEqual((stats.input_bytes, stats.output_bytes), (len(text.encode("utf-8")), compressed.tell()))
+        self.assertFalse(compressed.closed)
+
+        output = io.BytesIO()
+        stats = decompress_file(Unseekable(compressed.getvalue()), output)
+        self.assertEqual(output.getvalue(), text.encode("utf-8"))
+        self.assertEqual(stats.input_bytes, compressed.tell())
+
+        newlines = b"a\r\nb\rc\n" * 50
+        compressed = io.BytesIO()
+        compress_file(io.BytesIO(newlines), compressed, block_size=7, mode=MODE_TEXT)
+        output = io.BytesIO()
+        decompress_file(io.BytesIO(compressed.getvalue()), output)
+        self.assertEqual(output.getvalue(), newlines)
+        self.assertEqual(decompress_bytes(compress_bytes(newlines.decode("utf-8"), block_size=7)), newlines)
+        self.assertEqual(compressed.getvalue(), compress_bytes(newlines.decode("utf-8"), block_size=7))
+
+    def test_in_memory_api_is_reentrant(self):
+        """Test the module-level functions and a shared instance on a pool of threads"""
+        self.huffman.text_from_file = "threads"
+        self.huffman._build_huffman_tree()
+        self.huffman._generate_codes_for_each_char()
+        tree_writer = BitWriter()
+        self.huffman._serialize_tree(tree_writer)
+        data_writer = BitWriter()
+        for char in "threads":
+            data_writer.write(int(self.huffman.codes[char], 2), len(self.huffman.codes[char]))
+        legacy = (tree_writer.bit_count.to_bytes(4, 'big') + tree_writer.getvalue() +
+                  bytes([(8 - data_writer.bit_count % 8) % 8]) + data_writer.getvalue())
+        root = self.huffman.root
+
+        def roundtrip(index):
+            data = "".join(f"thread {index} line {i % (index + 3)} ü\n" for i in range(300 + index * 50))
+            options = [{}, {"adaptive": True}, {"pipeline": "bwt,mtf,o1"}, {"checksums": True}][index % 4]
+            compressed = compress_bytes(data, block_size=1000, **options)
+            return data.encode("utf-8"), decompress_bytes(compressed), decompress_bytes(legacy)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for expected, decoded, legacy_decoded in executor.map(roundtrip, range(32)):
+                self.assertEqual(decoded, expected)
+                self.assertEqual(legacy_decoded, b"threads")
+        self.assertIs(self.huffman.root, root)
+
+    def test_failure_leaves_no_partial_output(self):
+        """Test failed compression and decompression leave no partial file and keep an existing one"""
+        input_file = "test_partial_input.txt"
+        compressed_file = "test_partial.huff"
+        output_file = "test_partial_output.txt"
+        self.test_files.extend([input_file, compressed_file, output_file])
+        with open(input_file, 'wb') as f:
+            f.write("valid text\n".encode("utf-8") * 500 + b"\xff")
+
+        with self.assertRaises(UnicodeDecodeError):
+            self.huffman.compress_data(input_file, compressed_file, block_size=100)
+        self.assertFalse(os.path.exists(compressed_file))
+
+        with open(input_file, 'wb') as f:
+            f.write(b"valid text\n" * 500)
+        self.huffman.compress_data(input_file, compressed_file, block_size=100)
+        with open(compressed_file, 'rb') as f:
+            archive = f.read()
+        with open(compressed_file, 'wb') as f:
+            f.write(archive[:len(archive) // 2])
+        with open(output_file, 'wb') as f:
+            f.write(b"previous output")
+        with self.assertRaises(ValueError):
+            self.huffman.decompress_data(compressed_file, output_file)
+        with open(output_file, 'rb') as f:
+            self.assertEqual(f.read(), b"previous output")
+        self.assertEqual([name for name in os.listdir(".") if name.endswith(".part")], [])
+
     def test_edge_cases(self):
         """Test special cases and error handling"""
         # Empty file
@@ -117,9 +450,13 @@ class TestHuffmanCoding(unittest.TestCase):
         """Test progress callback functionality"""
         mock_callback = unittest.mock.Mock()
         test_text = "A" * 1000  # 1000 characters
-        
-        with patch('builtins.open', unittest.mock.mock_open(read_data=test_text)):
-            self.huffman.compress_data("dummy.txt", "dummy.huff", mock_callback)
+        input_file = "test_progress.txt"
+        self.test_files.extend([input_file, "dummy.huff"])
+
+        with open(input_file, 'w', encoding='utf-8') as f:
+            f.write(test_text)
+
+        self.huffman.compress_data(input_file, "dummy.huff", mock_callback, block_size=64)
             
         # Verify callback was called multiple times
         self.assertGreater(mock_callback.call_count, 10)
@@ -128,14 +465,5 @@ class TestHuffmanCoding(unittest.TestCase):
         args, _ = mock_callback.call_args
         self.assertEqual(args[0], 100)
 
-
-
-    def test_byte_conversion(self):
-        """Test bit-string to/from bytes conversion"""
-        test_bits = "10101010" * 3  # 24 bits
-        bytes_data = self.huffman._to_bytes(test_bits)
-        reconstructed = self.huffman._from_bytes(bytes_data)
-        self.assertEqual(reconstructed, test_bits)
-
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
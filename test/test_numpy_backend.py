@@ -0,0 +1,32 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src import NumpyBackend
+from src.Container import MODE_BYTES, MODE_TEXT, decode_block, encode_block
+
+@unittest.skipUnless(NumpyBackend.available(), "NumPy is not installed")
+class TestNumpyBackend(unittest.TestCase):
+    def setUp(self):
+        self.text = "".join(f"{i} numpy ü€ {'skew' * (i % 9)}\n" for i in range(3000))
+        self.data = bytes(range(256)) * 40 + b"\x00" * 9000 + self.text.encode("utf-8")
+
+    def test_histogram_matches_python(self):
+        """Test histograms match Counter in both modes"""
+        from collections import Counter
+        self.assertEqual(NumpyBackend.histogram(self.text, True), dict(Counter(self.text)))
+        self.assertEqual(NumpyBackend.histogram(self.data, False), dict(Counter(self.data)))
+
+    def test_output_is_byte_identical(self):
+        """Test the vectorized encoder writes the same blocks as BitWriter"""
+        for data, mode in ((self.text, MODE_TEXT), (self.data, MODE_BYTES), ("x" * 5000, MODE_TEXT)):
+            vectorized = encode_block(data, mode, use_numpy=True)
+            python = encode_block(data, mode, use_numpy=False)
+            self.assertEqual(vectorized, python)
+            expected = data.encode("utf-8") if mode == MODE_TEXT else data
+            self.assertEqual(decode_block(vectorized[0], mode), expected)
+
+if __name__ == '__main__':
+    unittest.main()
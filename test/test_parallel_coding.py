@@ -0,0 +1,29 @@
+import unittest
+import os
+import io
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.Container import compress_stream, decompress_stream
+from src.ParallelCoding import compress_parallel, decompress_parallel
+
+class TestParallelCoding(unittest.TestCase):
+    def setUp(self):
+        self.text = "".join(f"{i:05d} parallel block ü€ {'xyz' * (i % 5)}\n" for i in range(2000))
+
+    def test_output_matches_sequential(self):
+        """Test parallel compression writes exactly the sequential stream"""
+        sequential = b"".join(compress_stream(io.StringIO(self.text), block_size=4096))
+        parallel = b"".join(compress_parallel(io.StringIO(self.text), block_size=4096, workers=2))
+        self.assertEqual(parallel, sequential)
+
+    def test_roundtrip_keeps_order(self):
+        """Test blocks decoded in parallel come back in order"""
+        compressed = b"".join(compress_stream(io.StringIO(self.text), block_size=1000))
+        blocks = list(decompress_parallel(io.BytesIO(compressed), workers=3))
+        self.assertEqual(blocks, list(decompress_stream(io.BytesIO(compressed))))
+        self.assertEqual(b"".join(blocks), self.text.encode("utf-8"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+import threading
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.HuffmanCoding import HuffmanCoding
+from src.Progress import OperationCancelled, ThrottledProgress
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProgress(unittest.TestCase):
+    def test_throttled_by_time(self):
+        """Test values are forwarded at most once per interval, the final one always"""
+        clock = FakeClock()
+        forwarded = []
+        progress = ThrottledProgress(forwarded.append, interval=0.5, clock=clock)
+
+        for value in range(0, 60):
+            clock.now += 1 / 64
+            progress(value)
+        clock.now += 1
+        progress(60)
+        progress(60)
+        progress(100)
+        self.assertEqual(forwarded, [0, 32, 60, 100])
+
+    def test_cancel_stops_operation(self):
+        """Test a set cancel event stops compression at the next block"""
+        path = "test_cancel_input.txt"
+        output = "test_cancel.huff"
+        self.addCleanup(lambda: [os.remove(f) for f in (path, output) if os.path.exists(f)])
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("cancel me " * 5000)
+
+        cancel = threading.Event()
+        values = []
+
+        def report(value):
+            values.append(value)
+            cancel.set()
+
+        with self.assertRaises(OperationCancelled):
+            HuffmanCoding().compress_data(path, output, ThrottledProgress(report, cancel_event=cancel),
+                                          block_size=1000)
+        self.assertEqual(len(values), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import os
+import io
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.Container import MODE_BYTES, compress_stream, decompress_stream
+from src.HuffmanCoding import HuffmanCoding
+from src.Stats import COMPRESS_PHASES, DECOMPRESS_PHASES, CodingStats, StatsHook
+
+class RecordingHook(StatsHook):
+    def __init__(self):
+        self.blocks = []
+        self.finished = None
+
+    def on_block(self, stats):
+        self.blocks.append(stats)
+
+    def on_finish(self, stats):
+        self.finished = stats
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.text = "stats ü€ " * 3000
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.directory.name, "input.txt")
+        self.compressed_path = os.path.join(self.directory.name, "input.huff")
+        self.output_path = os.path.join(self.directory.name, "output.txt")
+        with open(self.input_path, "w", encoding="utf-8") as f:
+            f.write(self.text)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_compress_and_decompress_stats(self):
+        """Test both directions return matching counters and every phase"""
+        huffman = HuffmanCoding()
+        hook = RecordingHook()
+        compressed = huffman.compress_data(self.input_path, self.compressed_path, block_size=4096, stats_hook=hook)
+
+        self.assertEqual(set(compressed.phase_times), set(COMPRESS_PHASES))
+        self.assertEqual(compressed.input_bytes, len(self.text.encode("utf-8")))
+        self.assertEqual(compressed.output_bytes, os.path.getsize(self.compressed_path))
+        self.assertEqual(compressed.header_bytes + compressed.payload_bytes, compressed.output_bytes)
+        self.assertEqual(compressed.symbols, len(self.text))
+        self.assertEqual(compressed.distinct_symbols, len(set(self.text)))
+        self.assertEqual(compressed.blocks, len(hook.blocks))
+        self.assertIs(hook.finished, compressed)
+
+        decompressed = huffman.decompress_data(self.compressed_path, self.output_path)
+        self.assertEqual(set(decompressed.phase_times), set(DECOMPRESS_PHASES))
+        self.assertEqual(decompressed.output_bytes, compressed.input_bytes)
+        self.assertEqual(decompressed.symbols, compressed.symbols)
+        self.assertEqual(decompressed.payload_bytes, compressed.payload_bytes)
+        self.assertEqual(decompressed.max_code_length, compressed.max_code_length)
+
+    def test_parallel_stats_match_sequential(self):
+        """Test stats of blocks coded in worker processes come back to the caller"""
+        huffman = HuffmanCoding()
+        sequential = huffman.compress_data(self.input_path, self.compressed_path, block_size=4096)
+        parallel = huffman.compress_data(self.input_path, self.compressed_path, block_size=4096, workers=2)
+        for name in ("blocks", "symbols", "payload_bytes", "header_bytes", "max_code_length"):
+            self.assertEqual(getattr(parallel, name), getattr(sequential, name))
+
+        decompressed = huffman.decompress_data(self.compressed_path, self.output_path, workers=2)
+        self.assertEqual(decompressed.symbols, sequential.symbols)
+
+    def test_stream_stats(self):
+        """Test the stream functions fill the stats they are given"""
+        data = bytes(range(256)) * 20
+        stats = CodingStats("compress")
+        stream = b"".join(compress_stream(io.BytesIO(data), block_size=1000, mode=MODE_BYTES, stats=stats))
+        self.assertEqual(stats.blocks, 6)
+        self.assertEqual(stats.symbols, len(data))
+        self.assertEqual(stats.max_code_length, 8)
+
+        stats = CodingStats("decompress")
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream), stats)), data)
+        self.assertEqual(stats.symbols, len(data))
+        self.assertGreater(stats.phase_times["decode"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+import io
+import os
+import random
+import sys
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src import NumpyBackend, Transforms
+from src.Container import (BLOCK_CONTEXT, BLOCK_STORED, FLAG_PIPELINE, MAGIC, MODE_BYTES, MODE_TEXT, STREAM_VERSION,
+                           compress_stream, decode_context_block, decompress_stream, encode_context_block,
+                           read_frames, read_stream_info, verify_stream)
+from src.Transforms import STAGES, Pipeline, Stage, register_stage
+
+
+def _blocks():
+    rng = random.Random(7)
+    return [
+        b"",
+        b"x",
+        b"ab" * 500,
+        b"abc" * 333,
+        b"a" * 4,
+        b"a" * 5 + b"b",
+        b"a" * 259 + b"a" * 3,
+        b"q" * 1000 + b"r" * 260 + b"q",
+        # The byte after a 4-byte run, and the count byte, equal the run byte.
+        b"aaaa" + b"a" + b"aaaa" + bytes([97]) + b"b",
+        b"a" * (4 + 97) + b"b",
+        bytes(rng.randrange(4) for _ in range(6000)),
+        bytes(rng.randrange(256) for _ in range(3000)),
+        "".join(f"{i} transforms ü€\n" for i in range(400)).encode("utf-8"),
+    ]
+
+
+class TestTransforms(unittest.TestCase):
+    def test_stage_roundtrips(self):
+        """Test every stage, alone and chained, gives its input back"""
+        specs = ["rle", "mtf", "bwt", "bwt,mtf", "bwt,mtf,rle", "rle,bwt,mtf,rle"]
+        for spec in specs:
+            pipeline = Pipeline.parse(spec)
+            for block in _blocks():
+                with self.subTest(spec=spec, block=block[:12]):
+                    self.assertEqual(pipeline.inverse(pipeline.forward(block)), block)
+
+    def test_run_length_format(self):
+        """Test runs keep 4 bytes and a count of at most 255 more"""
+        rle = STAGES["rle"]
+        self.assertEqual(rle.forward(b"aaa"), b"aaa")
+        self.assertEqual(rle.forward(b"aaaa"), b"aaaa\x00")
+        self.assertEqual(rle.forward(b"a" * 260), b"aaaa\xff" + b"a")
+        self.assertEqual(rle.forward(b"a" * 263), b"aaaa\xffaaaa\x00")
+
+    def test_numpy_rotation_order_matches_python(self):
+        """Test the NumPy block sort gives the same rotations as the pure-Python one"""
+        if not NumpyBackend.available():
+            self.skipTest("NumPy is not installed")
+        for block in _blocks():
+            if not block:
+                continue
+            with self.subTest(block=block[:12]):
+                vectorized = NumpyBackend.rotation_order(block)
+                with patch.object(NumpyBackend, "MIN_SYMBOLS", len(block) + 1):
+                    python = Transforms._rotation_order(block)
+                rotations = [block[start:] + block[:start] for start in vectorized]
+                self.assertEqual(rotations, sorted(rotations))
+                self.assertEqual([block[start - 1] for start in vectorized], [block[start - 1] for start in python])
+
+    def test_pipeline_header(self):
+        """Test pipelines are parsed, written to and read back from stream headers"""
+        pipeline = Pipeline.parse("bwt, MTF,rle,o1")
+        self.assertEqual(str(pipeline), "bwt,mtf,rle,o1")
+        self.assertTrue(pipeline.context)
+        self.assertEqual(Pipeline.deserialize(pipeline.serialize()), (pipeline, len(pipeline.serialize())))
+
+        stream = b"".join(compress_stream(io.BytesIO(b"header " * 100), mode=MODE_BYTES, pipeline=pipeline))
+        self.assertEqual(read_stream_info(io.BytesIO(stream)), (MODE_BYTES, False, pipeline))
+
+        for spec in ("o1,bwt", "zip"):
+            with self.assertRaises(ValueError):
+                Pipeline.parse(spec)
+        unknown = MAGIC + bytes([STREAM_VERSION, FLAG_PIPELINE, 1, 99])
+        with self.assertRaises(ValueError):
+            read_stream_info(io.BytesIO(unknown))
+
+    def test_register_stage(self):
+        """Test custom stages must implement the Stage methods and use a free ID"""
+        class Reverse(Stage):
+            stage_id = 60
+            name = "reverse"
+
+            def forward(self, data):
+                return bytes(data[::-1])
+
+            def inverse(self, data):
+                return bytes(data[::-1])
+
+        class Incomplete(Stage):
+            stage_id = 61
+            name = "incomplete"
+
+        self.addCleanup(STAGES.pop, "reverse", None)
+        with self.assertRaises(TypeError):
+            Incomplete()
+        with self.assertRaises(TypeError):
+            register_stage(object())
+        with self.assertRaises(ValueError):
+            register_stage(type("Clash", (Reverse,), {"name": "clash", "stage_id": 1})())
+
+        register_stage(Reverse())
+        data = b"custom stage " * 50
+        stream = b"".join(compress_stream(io.BytesIO(data), mode=MODE_BYTES, pipeline=Pipeline.parse("reverse,rle")))
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))), data)
+
+    def test_context_blocks(self):
+        """Test order-1 context blocks round-trip on both encoder paths"""
+        for block in _blocks()[1:]:
+            for use_numpy in (False, NumpyBackend.available()):
+                with self.subTest(block=block[:12], use_numpy=use_numpy):
+                    body = encode_context_block(block, use_numpy=use_numpy)
+                    self.assertEqual(decode_context_block(body), block)
+        self.assertEqual(encode_context_block(_blocks()[-1], use_numpy=True),
+                         encode_context_block(_blocks()[-1], use_numpy=False))
+        with self.assertRaises(ValueError):
+            decode_context_block(encode_context_block(b"context " * 100)[:-3])
+
+    def test_stream_roundtrips(self):
+        """Test pipelines through whole streams, in text and bytes mode, with checksums"""
+        text = "".join(f"2024-01-{i % 28 + 1:02d} INFO GET /api/{i % 7} ü€\n" for i in range(3000))
+        for spec in ("rle", "mtf", "bwt", "o1", "bwt,mtf,rle", "bwt,mtf,o1"):
+            pipeline = Pipeline.parse(spec)
+            with self.subTest(spec=spec):
+                stream = b"".join(compress_stream(io.StringIO(text), 8000, MODE_TEXT, checksums=True,
+                                                  pipeline=pipeline))
+                self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))), text.encode("utf-8"))
+                self.assertEqual(verify_stream(io.BytesIO(stream)), len(text.encode("utf-8")))
+
+        src = io.BytesIO(stream)
+        read_stream_info(src)
+        self.assertIn(BLOCK_CONTEXT, [block_type for block_type, _ in read_frames(src)])
+
+    def test_incompressible_blocks_are_stored(self):
+        """Test blocks a pipeline would grow are stored raw"""
+        data = random.Random(3).randbytes(5000)
+        stream = b"".join(compress_stream(io.BytesIO(data), mode=MODE_BYTES, pipeline=Pipeline.parse("bwt,mtf,o1")))
+        src = io.BytesIO(stream)
+        read_stream_info(src)
+        self.assertEqual([block_type for block_type, _ in read_frames(src)], [BLOCK_STORED])
+        self.assertEqual(b"".join(decompress_stream(io.BytesIO(stream))), data)
+
+    def test_options_that_do_not_combine(self):
+        """Test a pipeline cannot be combined with adaptive blocks"""
+        with self.assertRaises(ValueError):
+            list(compress_stream(io.BytesIO(b"x"), mode=MODE_BYTES, adaptive=True, pipeline=Pipeline.parse("rle")))
+
+if __name__ == '__main__':
+    unittest.main()